@@ -1,7 +1,14 @@
 import streamlit as st
 import os
 import json
+import uuid
 from datetime import datetime
+from utils.admission import get_admission_controller, set_session
+from utils.api import call_gemini_api, is_api_error
+from utils.key_pool import get_key_pool
+from utils.batch import batch_owner, deliver_batch_results, get_batch_queue
+from utils.data import save_to_history
+from utils.results import begin_tool_run, get_result, result_reused, result_shown
 
 # Import tool functions directly
 # Content Tools
@@ -39,6 +46,9 @@ from tools.communication_tools import (
     render_song_generator
 )
 
+# Pipeline Tools
+from tools.pipeline_tools import render_reading_pack
+
 # Create the tool mapping dictionary
 tool_mapping = {
     # Content Tools
@@ -66,7 +76,10 @@ tool_mapping = {
     "Prompt Builder": render_prompt_builder,
     "Email Responder": render_email_responder,
     "Email Template Maker": render_email_template_maker,
-    "Song Generator": render_song_generator
+    "Song Generator": render_song_generator,
+    
+    # Pipeline Tools
+    "Reading Pack": render_reading_pack
 }
 
 # Page configuration
@@ -99,6 +112,33 @@ if 'theme' not in st.session_state:
     st.session_state['theme'] = 'light'
 if 'selected_tool' not in st.session_state:
     st.session_state['selected_tool'] = "Prompt Builder"  # Default tool
+if 'session_id' not in st.session_state:
+    st.session_state['session_id'] = uuid.uuid4().hex
+
+def queue_position_reporter():
+    """
+    Build the callback that shows this session its place in the model call queue.
+
+    The message appears where the waiting tool is rendering (under its spinner)
+    and is removed once the request has started.
+    """
+    shown = {}
+
+    def report(position, seconds):
+        if position is None:
+            if "message" in shown:
+                shown.pop("message").empty()
+            return
+        if "message" not in shown:
+            shown["message"] = st.empty()
+        shown["message"].info(f"⏳ Teacher Magic is busy: you are #{position} in line, ~{seconds:.0f}s")
+    return report
+
+# Model calls from this run queue fairly against other sessions' calls
+set_session(st.session_state['session_id'], queue_position_reporter())
+
+# Results shown during this run replace the selected tool's kept result
+begin_tool_run(st.session_state, st.session_state['selected_tool'])
 
 # Main title and toolbar
 title_col, spacer, about_col, help_col, theme_col = st.columns([6, 1, 1, 1, 1])
@@ -184,8 +224,34 @@ with st.sidebar:
         st.session_state['api_key_saved'] = True
         st.success("API Key saved for this session!")
     
+    if len(get_key_pool()) and not st.session_state['api_key']:
+        st.info("The school's API keys are in use. Enter your own key only if you would rather use it.")
+    
     if st.session_state['api_key_saved']:
         st.success("API Key is configured!")
+        
+        # Results of requests queued for the overnight batch run
+        delivered = deliver_batch_results(st.session_state)
+        if delivered:
+            st.success(f"{delivered} queued result{'s' if delivered != 1 else ''} added to your history.")
+        waiting = get_batch_queue().stats(batch_owner(st.session_state['api_key']))
+        if waiting["queued"] + waiting["submitted"]:
+            st.caption(f"{waiting['queued'] + waiting['submitted']} request(s) waiting for the batch run.")
+    
+    # Load on the shared model call queue
+    queue_stats = get_admission_controller().stats()
+    with st.expander(f"📊 Model queue: {queue_stats['active']}/{queue_stats['max_concurrent']} busy, "
+                     f"{queue_stats['waiting']} waiting"):
+        st.json(queue_stats)
+        if len(get_key_pool()):
+            st.markdown("**School API keys**")
+            st.dataframe(get_key_pool().stats(), hide_index=True)
+    
+    st.session_state['fresh_output'] = st.checkbox(
+        "Always generate fresh output",
+        value=st.session_state.get('fresh_output', False),
+        help="By default, a saved result is reused when a near-identical request was made before"
+    )
     
     st.markdown("---")
     
@@ -219,6 +285,9 @@ with st.sidebar:
             "Email Responder",
             "Email Template Maker",
             "Song Generator"
+        ],
+        "Resource Packs": [
+            "Reading Pack"
         ]
     }
     
@@ -281,8 +350,44 @@ with st.expander("📜 History & Export", expanded=False):
     else:
         st.info("No history yet. Use the tools above to generate content!")
 
+def render_last_result(tool):
+    """
+    Redraw the tool's last result when this rerun did not produce one, and offer to regenerate it.
+
+    Results are kept in session state, so switching tools, opening Help or any other
+    interaction never makes a teacher generate the same content again.
+    """
+    slot = get_result(st.session_state, tool)
+    if not slot:
+        return
+    items = slot["items"]
+    area = st.container()
+    regenerated = False
+    if len(items) == 1 and items[0]["prompt"]:
+        if result_reused(st.session_state):
+            st.info("Nothing has changed since your last result, so it is shown again without a new request. "
+                    "Press Regenerate for a new version.")
+        if st.button("🔄 Regenerate", key=f"regenerate_{tool}", help="Ask the AI for a new version of this result"):
+            with st.spinner("Regenerating..."):
+                result = call_gemini_api(items[0]["prompt"], st.session_state['api_key'], items[0]["config"])
+            if is_api_error(result):
+                st.error(result or "The AI model did not return a result.")
+            else:
+                items[0]["content"] = result
+                regenerated = True
+                
+                # Save to history, with the inputs of the result it replaces
+                inputs = next((item["inputs"] for item in st.session_state['history'] if item["tool"] == tool), {})
+                save_to_history(st.session_state, tool, inputs, result)
+    if regenerated or not result_shown(st.session_state):
+        with area:
+            for item in items:
+                st.markdown(f"### {item['title']}")
+                st.markdown(f"<div class='result-area'>{item['content']}</div>", unsafe_allow_html=True)
+
 # Render the selected tool
 if selected_tool in tool_mapping:
     tool_mapping[selected_tool]()
+    render_last_result(selected_tool)
 else:
     st.error(f"Tool '{selected_tool}' not found. Please select another tool.")
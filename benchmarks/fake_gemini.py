@@ -0,0 +1,247 @@
+# benchmarks/fake_gemini.py
+"""
+Deterministic stand-ins for the Gemini SDK client and the YouTube transcript API.
+
+The fakes are installed at the SDK boundary (``utils.api.genai.Client`` and
+``tools.assessment_tools.YouTubeTranscriptApi``) so that everything in
+``utils/api.py`` stays inside the measured path while no network is touched.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from unittest import mock
+
+WORDS = (
+    "students learn energy water plant cell river history number fraction story "
+    "reading writing science map climate light sound force motion habitat system "
+    "evidence explain compare describe predict measure observe analyse create evaluate"
+).split()
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour of the fake model backend."""
+    latency: float = 0.05          # Seconds before the first token is returned
+    token_latency: float = 0.0     # Additional seconds per generated token
+    output_tokens: int = 300       # Words generated for free-form prompts
+    chunk_tokens: int = 20         # Words per streamed chunk
+    calls: list = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, prompt, kind):
+        with self.lock:
+            self.calls.append({"kind": kind, "prompt_chars": len(prompt)})
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+
+
+def _prompt_text(contents):
+    """Flatten the ``contents`` argument of ``generate_content`` into a string."""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_prompt_text(item) for item in contents)
+    text = getattr(contents, "text", None)
+    if text is not None:
+        return text
+    parts = getattr(contents, "parts", None)
+    if parts:
+        return "\n".join(_prompt_text(part) for part in parts)
+    if isinstance(contents, dict):
+        return "\n".join(_prompt_text(part) for part in contents.get("parts", []))
+    return str(contents)
+
+
+def fake_response_text(prompt, config, variant=0):
+    """
+    Build the deterministic response for a prompt.
+
+    Prompts that ask for the repo's Q/A/Correct/Explanation/Concepts block format
+    get well-formed question blocks so that downstream parsers are exercised;
+    everything else gets ``config.output_tokens`` words of filler text.
+    """
+    seed = hashlib.sha256(f"{variant}:{prompt}".encode("utf-8")).hexdigest()
+    rng = random.Random(seed)
+
+    if "=== WORD: [word] ===" in prompt:
+        # Per-word vocabulary output: one headed section per requested word
+        match = re.search(r"(?:words|terms): (.+)$", prompt, re.MULTILINE)
+        words = [word.strip() for word in match.group(1).split(",")] if match else ["word"]
+        return "\n\n".join(f"=== WORD: {word} ===\n"
+                           + fake_response_text(prompt.replace("=== WORD: [word] ===", word), config,
+                                                f"{variant}:{word}")
+                           for word in words)
+
+    if "Correct:" in prompt and "Concepts:" in prompt:
+        match = re.search(r"\b(\d+)\s+(?:multiple-choice\s+)?questions", prompt)
+        count = int(match.group(1)) if match else 5
+        blocks = []
+        for i in range(count):
+            topic = " ".join(rng.choice(WORDS) for _ in range(4))
+            options = " | ".join(" ".join(rng.choice(WORDS) for _ in range(2)) for _ in range(4))
+            blocks.append(
+                f"Q: Which statement about {topic} is correct (item {i + 1})?\n"
+                f"A: {options}\n"
+                f"Correct: {'ABCD'[rng.randrange(4)]}\n"
+                f"Explanation: {' '.join(rng.choice(WORDS) for _ in range(12))}\n"
+                f"Concepts: {rng.choice(WORDS)}, {rng.choice(WORDS)}"
+            )
+        return "\n\n".join(blocks)
+
+    if "SUMMATIVE ASSESSMENT:" in prompt and "LESSON 1:" in prompt:
+        weeks = re.search(r"exactly (\d+) week", prompt)
+        lessons = re.search(r"exactly (\d+) lesson", prompt)
+        phrase = lambda n: " ".join(rng.choice(WORDS) for _ in range(n))
+        lines = [f"OVERVIEW: {phrase(20)}.", f"ESSENTIAL QUESTIONS: {phrase(6)}?; {phrase(6)}?",
+                 f"SUMMATIVE ASSESSMENT: {phrase(12)}."]
+        for week in range(1, int(weeks.group(1)) + 1 if weeks else 2):
+            lines += [f"WEEK {week}: {phrase(3)}", f"FOCUS: {phrase(10)}."]
+            lines += [f"LESSON {lesson}: {phrase(3)} | Objective: Students will {phrase(6)} | Student Action: {phrase(6)}"
+                      for lesson in range(1, int(lessons.group(1)) + 1 if lessons else 2)]
+        return "\n".join(lines)
+
+    if "personalised from the class roster" in prompt:
+        # Mail-merge template: use every placeholder offered, after a subject line
+        placeholders = re.findall(r"^\s*- (\{\{[^}]+\}\})", prompt, re.MULTILINE)
+        body = " ".join(f"{' '.join(rng.choice(WORDS) for _ in range(8))} {placeholder}."
+                        for placeholder in placeholders)
+        return f"Subject: {' '.join(rng.choice(WORDS) for _ in range(4))}\n\nDear family,\n\n{body}\n\nRegards"
+
+    words = [rng.choice(WORDS) for _ in range(config.output_tokens)]
+    lines = [" ".join(words[i:i + 15]) + "." for i in range(0, len(words), 15)]
+    return "\n".join(lines)
+
+
+class _FakeModels:
+    def __init__(self, config):
+        self._config = config
+
+    def _wait(self, tokens):
+        delay = self._config.latency + tokens * self._config.token_latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def generate_content(self, model=None, contents=None, config=None):
+        prompt = _prompt_text(contents)
+        self._config.record(prompt, "generate")
+        count = getattr(config, "candidate_count", None) or 1
+        texts = [fake_response_text(prompt, self._config, variant=i) for i in range(count)]
+        # Honour output caps (at roughly 0.75 words per token) and stop sequences
+        for stop in getattr(config, "stop_sequences", None) or []:
+            texts = [text.split(stop)[0] for text in texts]
+        max_tokens = getattr(config, "max_output_tokens", None)
+        if max_tokens:
+            texts = [" ".join(text.split(" ")[:int(max_tokens * 0.75)]) for text in texts]
+        self._wait(max(len(text.split()) for text in texts))
+        candidates = [
+            SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]),
+                            finish_reason="STOP", index=i)
+            for i, text in enumerate(texts)
+        ]
+        usage = SimpleNamespace(prompt_token_count=len(prompt.split()),
+                                candidates_token_count=sum(len(t.split()) for t in texts))
+        return SimpleNamespace(text=texts[0], candidates=candidates, usage_metadata=usage)
+
+    def generate_content_stream(self, model=None, contents=None, config=None):
+        prompt = _prompt_text(contents)
+        self._config.record(prompt, "stream")
+        text = fake_response_text(prompt, self._config)
+        if self._config.latency > 0:
+            time.sleep(self._config.latency)
+        # Split on whitespace but keep the separators so the stream re-joins exactly
+        pieces = re.findall(r"\S+\s*", text)
+        step = max(1, self._config.chunk_tokens)
+        for i in range(0, len(pieces), step):
+            chunk = "".join(pieces[i:i + step])
+            if self._config.token_latency > 0:
+                time.sleep(self._config.token_latency * len(pieces[i:i + step]))
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeGeminiClient:
+    """Drop-in replacement for ``google.genai.Client`` used by ``utils/api.py``."""
+
+    config = FakeConfig()
+
+    def __init__(self, api_key=None, **kwargs):
+        self.api_key = api_key
+        self.models = _FakeModels(self.config)
+
+
+class _FakeSegment:
+    def __init__(self, text, start, duration):
+        self.text = text
+        self.start = start
+        self.duration = duration
+
+
+class _FakeTranscript:
+    def __init__(self, video_id, language_code, segments):
+        self.video_id = video_id
+        self.language_code = language_code
+        self.is_generated = True
+        self._segments = segments
+
+    def fetch(self):
+        return [_FakeSegment(text, start, 4.0) for start, text in self._segments]
+
+
+class _FakeTranscriptList:
+    def __init__(self, video_id, segments):
+        self._transcripts = [_FakeTranscript(video_id, "en", segments)]
+
+    def __iter__(self):
+        return iter(self._transcripts)
+
+    def find_manually_created_transcript(self, language_codes):
+        return self.find_transcript(language_codes)
+
+    def find_generated_transcript(self, language_codes):
+        return self.find_transcript(language_codes)
+
+    def find_transcript(self, language_codes):
+        for transcript in self._transcripts:
+            if transcript.language_code in language_codes:
+                return transcript
+        from youtube_transcript_api import NoTranscriptFound
+        raise NoTranscriptFound(self._transcripts[0].video_id, language_codes, self)
+
+
+class FakeTranscriptApi:
+    """Offline replacement for ``YouTubeTranscriptApi`` with a synthetic lecture."""
+
+    segments = 600  # Roughly 40 minutes of four-second captions
+
+    def list(self, video_id):
+        rng = random.Random(video_id)
+        segments = [
+            (i * 4.0, " ".join(rng.choice(WORDS) for _ in range(10)))
+            for i in range(self.segments)
+        ]
+        return _FakeTranscriptList(video_id, segments)
+
+
+@contextmanager
+def fake_backend(config=None):
+    """
+    Install the fake Gemini client and transcript API for the duration of a block.
+
+    Args:
+        config (FakeConfig): Backend behaviour; a default config is used if omitted
+
+    Yields:
+        FakeConfig: The active configuration, whose ``calls`` list records every model call
+    """
+    config = config or FakeConfig()
+    client_cls = type("ConfiguredFakeGeminiClient", (FakeGeminiClient,), {"config": config})
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("utils.api.genai.Client", client_cls))
+        stack.enter_context(mock.patch("tools.assessment_tools.YouTubeTranscriptApi", FakeTranscriptApi))
+        yield config
@@ -0,0 +1,424 @@
+# benchmarks/load_test.py
+"""
+Multi-session load test simulating a staff room of concurrent teachers.
+
+The app is started with ``streamlit run`` exactly as it is deployed, and each
+simulated teacher is a websocket client speaking Streamlit's own protocol: it
+saves an API key, picks tools from the sidebar and submits their forms, as the
+browser would. Model calls go over HTTP to the stub model server. The app server,
+the stub server and the clients run in separate processes, so the memory and
+thread counts reported are those of the app server alone.
+
+Requires the ``websockets`` package (pip install websockets).
+
+Usage (from the repository root):
+
+    python -m benchmarks.load_test --sessions 40 --actions 5
+    python -m benchmarks.load_test --sessions 1 10 40 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.run_benchmarks import TOOL_CASES  # noqa: E402
+
+# Relative frequency of each tool in a typical staff-room session. YouTube Video
+# Questions is left out: the app server would fetch real transcripts from YouTube.
+TOOL_MIX = {
+    "Lesson Plan Generator": 20,
+    "MCQ Generator": 18,
+    "Email Responder": 15,
+    "DOK Questions": 6,
+    "Text Generator": 6,
+    "Vocabulary Focus": 6,
+    "Text Rewriter": 5,
+    "Unit Plan Generator": 4,
+    "HOT Questions": 4,
+    "Email Template Maker": 3,
+    "Text Dependent Questions": 3,
+    "Academic Content": 2,
+    "Text Proofreader": 2,
+    "Standards Unpacker": 1,
+    "IEP Goal Responder": 1,
+    "Song Generator": 1,
+    "Image Generator": 1,
+}
+
+API_KEY_LABEL = "Enter your Gemini API Key:"
+SAVE_KEY_LABEL = "Save API Key"
+TOOL_RADIO_LABEL = "Select a Tool:"
+
+
+def process_status(pid):
+    """
+    Resident memory (MiB) and thread count of a process.
+
+    Returns:
+        tuple: (rss_mib, threads), with None for values that cannot be read
+    """
+    try:
+        rss, threads = None, None
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith("Threads:"):
+                    threads = int(line.split()[1])
+        return rss, threads
+    except OSError:
+        pass
+    try:
+        import psutil
+        process = psutil.Process(pid)
+        return process.memory_info().rss / (1024 * 1024), process.num_threads()
+    except (ImportError, Exception):
+        return None, None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _summarise(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p90_ms": round(percentile(latencies, 90), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1),
+        "mean_ms": round(statistics.mean(latencies), 1),
+    }
+
+
+class AppSession:
+    """
+    One browser tab's worth of Streamlit session, driven over the websocket.
+
+    Only the parts of the protocol the tools use are implemented: script reruns
+    with widget values, and reading back the elements of the finished page.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.elements = []
+        self._cached = {}  # Message hash -> message, for ref_hash replies
+
+    async def rerun(self, widget_states=(), timeout=120):
+        """
+        Rerun the script with the given widget values and wait for the page to finish.
+
+        Args:
+            widget_states (list): WidgetState messages to send
+            timeout (float): Seconds to wait for the run to finish
+
+        Returns:
+            list: The page's Element messages, in render order
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.widget_states.widgets.extend(widget_states)
+        await self.websocket.send(message.SerializeToString())
+        return await asyncio.wait_for(self._read_until_finished(ForwardMsg), timeout)
+
+    async def _read_until_finished(self, forward_msg_class):
+        elements = []
+        while True:
+            message = forward_msg_class()
+            message.ParseFromString(await self.websocket.recv())
+            if message.WhichOneof("type") == "ref_hash":
+                message = self._cached[message.ref_hash]
+            elif message.hash:
+                self._cached[message.hash] = message
+
+            kind = message.WhichOneof("type")
+            if kind == "new_session":
+                elements = []
+            elif kind == "delta" and message.delta.WhichOneof("type") == "new_element":
+                elements.append(message.delta.new_element)
+            elif kind == "script_finished":
+                # A run cut short by st.rerun() is followed by another run
+                if message.script_finished != forward_msg_class.FINISHED_EARLY_FOR_RERUN:
+                    self.elements = elements
+                    return elements
+
+    def find(self, kind, label):
+        """Return the first widget of a type (e.g. "button") with the given label."""
+        for element in self.elements:
+            if element.WhichOneof("type") == kind and getattr(element, kind).label == label:
+                return getattr(element, kind)
+        raise KeyError(f"No {kind} labelled '{label}' on the page")
+
+    def errors(self):
+        """Exception and error messages shown on the page."""
+        from streamlit.proto.Alert_pb2 import Alert
+
+        messages = []
+        for element in self.elements:
+            kind = element.WhichOneof("type")
+            if kind == "exception":
+                messages.append(f"{element.exception.type}: {element.exception.message}")
+            elif kind == "alert" and element.alert.format == Alert.ERROR:
+                messages.append(element.alert.body)
+        return messages
+
+
+def form_states(session, inputs, submit_label):
+    """Widget states for filling in a tool's text fields and pressing its submit button."""
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    states = []
+    remaining = dict(inputs)
+    for element in session.elements:
+        kind = element.WhichOneof("type")
+        if kind in ("text_input", "text_area") and getattr(element, kind).label in remaining:
+            widget = getattr(element, kind)
+            states.append(WidgetState(id=widget.id, string_value=remaining.pop(widget.label)))
+    if remaining:
+        raise KeyError(f"Widgets not found on page: {', '.join(remaining)}")
+    states.append(WidgetState(id=session.find("button", submit_label).id, trigger_value=True))
+    return states
+
+
+async def run_session(app_url, index, actions, seed, timeout, think_time, samples, errors):
+    """Simulate one teacher: open the app, save a key and submit a sequence of tools."""
+    import websockets
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    rng = random.Random(seed + index)
+    tools, weights = zip(*TOOL_MIX.items())
+    ws_url = app_url.replace("http", "ws", 1) + "/_stcore/stream"
+    try:
+        async with websockets.connect(ws_url, subprotocols=["streamlit"], max_size=None,
+                                      open_timeout=timeout) as websocket:
+            session = AppSession(websocket)
+            await session.rerun(timeout=timeout)
+            await session.rerun([
+                WidgetState(id=session.find("text_input", API_KEY_LABEL).id, string_value=f"load-test-key-{index}"),
+                WidgetState(id=session.find("button", SAVE_KEY_LABEL).id, trigger_value=True),
+            ], timeout=timeout)
+            for _ in range(actions):
+                tool = rng.choices(tools, weights)[0]
+                case = TOOL_CASES[tool]
+                await session.rerun([WidgetState(id=session.find("radio", TOOL_RADIO_LABEL).id,
+                                                 string_value=tool)], timeout=timeout)
+                states = form_states(session, case["inputs"], case["submit"])
+                start = time.perf_counter()
+                await session.rerun(states, timeout=timeout)
+                samples.append((tool, (time.perf_counter() - start) * 1000))
+                for message in session.errors():
+                    errors.append(f"session {index}: {tool}: {message}")
+                if think_time:
+                    await asyncio.sleep(rng.uniform(0, think_time))
+    except Exception as e:
+        errors.append(f"session {index}: {type(e).__name__}: {e}")
+
+
+async def _run_sessions(app_url, sessions, actions, seed, timeout, think_time, ramp_up, samples, errors):
+    tasks = []
+    for i in range(sessions):
+        tasks.append(asyncio.create_task(
+            run_session(app_url, i, actions, seed, timeout, think_time, samples, errors)))
+        if ramp_up and sessions > 1:
+            await asyncio.sleep(ramp_up / (sessions - 1))
+    await asyncio.gather(*tasks)
+
+
+def run_load(app_url, server_pid, sessions, actions, seed=1, timeout=120, think_time=0.0, ramp_up=0.0):
+    """
+    Run one load level against a running app server.
+
+    Args:
+        app_url (str): Base URL of the Streamlit server
+        server_pid (int): Process ID of the Streamlit server, for memory and thread sampling
+        sessions (int): Number of concurrent teacher sessions
+        actions (int): Tool submissions per session
+        seed (int): Random seed for the tool mix
+        timeout (float): Seconds to wait for a single script run
+        think_time (float): Maximum random pause between a session's actions in seconds
+        ramp_up (float): Seconds over which session start times are spread
+
+    Returns:
+        dict: Throughput, latency percentiles, server memory and thread statistics
+    """
+    samples, errors = [], []
+    rss_before, threads_before = process_status(server_pid)
+    peaks = {"rss": rss_before or 0.0, "threads": threads_before or 0}
+    stop = threading.Event()
+
+    def monitor():
+        while not stop.is_set():
+            rss, threads = process_status(server_pid)
+            peaks["rss"] = max(peaks["rss"], rss or 0.0)
+            peaks["threads"] = max(peaks["threads"], threads or 0)
+            time.sleep(0.05)
+
+    monitor_thread = threading.Thread(target=monitor, daemon=True)
+    monitor_thread.start()
+    start = time.perf_counter()
+    asyncio.run(_run_sessions(app_url, sessions, actions, seed, timeout, think_time, ramp_up, samples, errors))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    monitor_thread.join()
+    rss_after, threads_after = process_status(server_pid)
+
+    per_tool = {}
+    for tool, latency in samples:
+        per_tool.setdefault(tool, []).append(latency)
+
+    def rounded(value, digits=1):
+        return round(value, digits) if value is not None else None
+
+    return {
+        "sessions": sessions,
+        "actions_per_session": actions,
+        "completed": len(samples),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(samples) / elapsed, 2) if elapsed else None,
+        "latency": _summarise([latency for _, latency in samples]) if samples else None,
+        "latency_by_tool": {tool: _summarise(values) for tool, values in sorted(per_tool.items())},
+        "server_rss_before_mib": rounded(rss_before),
+        "server_rss_after_mib": rounded(rss_after),
+        "server_rss_peak_mib": rounded(peaks["rss"]),
+        "rss_growth_per_session_mib": (round((rss_after - rss_before) / sessions, 2)
+                                       if rss_before is not None and rss_after is not None else None),
+        "server_threads_before": threads_before,
+        "server_threads_peak": peaks["threads"] or None,
+    }
+
+
+def _wait_for(url, process, name, wait=30):
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} did not start ({url})")
+
+
+def start_stub_server(port, latency, output_tokens):
+    """Start the stub model server in a subprocess and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_model_server", "--port", str(port),
+         "--latency", str(latency), "--output-tokens", str(output_tokens)],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_for(f"{url}/healthz", process, "Stub model server", wait=15)
+    return process, url
+
+
+def start_app_server(port, model_url, cache_dir):
+    """Start the app with ``streamlit run`` in a subprocess and wait until it answers."""
+    env = dict(os.environ, GEMINI_API_BASE_URL=model_url, TEACHER_MAGIC_CACHE_DIR=cache_dir)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless", "true",
+         "--server.port", str(port), "--server.address", "127.0.0.1",
+         "--browser.gatherUsageStats", "false", "--server.fileWatcherType", "none"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_for(f"{url}/_stcore/health", process, "Streamlit server")
+    return process, url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent session load test for Teacher Magic")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[40],
+                        help="Concurrent sessions; pass several values to sweep load levels")
+    parser.add_argument("--actions", type=int, default=5, help="Tool submissions per session")
+    parser.add_argument("--latency", type=float, default=0.8, help="Stub model latency in seconds")
+    parser.add_argument("--output-tokens", type=int, default=300, help="Stub output length in words")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max pause between actions in seconds")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which sessions start")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the stub model server")
+    parser.add_argument("--app-port", type=int, default=8599, help="Port for the Streamlit server")
+    parser.add_argument("--server-url", help="Use an already running stub server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for a single script run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args(argv)
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        parser.error("the load test needs the websockets package (pip install websockets)")
+
+    processes = []
+    levels = []
+    try:
+        if args.server_url:
+            model_url = args.server_url
+        else:
+            stub, model_url = start_stub_server(args.port, args.latency, args.output_tokens)
+            processes.append(stub)
+        # A fresh cache directory so cached responses from earlier runs do not skew latencies
+        cache_dir = tempfile.mkdtemp(prefix="teacher_magic_load_")
+        app, app_url = start_app_server(args.app_port, model_url, cache_dir)
+        processes.append(app)
+        # Load the app once so module imports are not counted as per-session memory
+        run_load(app_url, app.pid, 1, 0, timeout=args.timeout)
+
+        for sessions in args.sessions:
+            result = run_load(app_url, app.pid, sessions, args.actions, seed=args.seed, timeout=args.timeout,
+                              think_time=args.think_time, ramp_up=args.ramp_up)
+            levels.append(result)
+            latency = result["latency"] or {}
+            print(f"{sessions:>4} sessions | {result['completed']:>4} submits in {result['elapsed_s']:>7.1f}s | "
+                  f"{result['throughput_per_s']:>6.2f}/s | p50 {latency.get('p50_ms')} ms | "
+                  f"p95 {latency.get('p95_ms')} ms | p99 {latency.get('p99_ms')} ms | "
+                  f"server RSS {result['server_rss_after_mib']} MiB "
+                  f"(+{result['rss_growth_per_session_mib']} MiB/session) | "
+                  f"threads peak {result['server_threads_peak']} | errors {len(result['errors'])}")
+            for error in result["errors"][:5]:
+                print(f"       {error}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "model_latency": args.latency,
+            "output_tokens": args.output_tokens,
+            "tool_mix": TOOL_MIX,
+        },
+        "levels": levels,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 1 if any(level["errors"] for level in levels) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
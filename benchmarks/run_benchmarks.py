@@ -0,0 +1,318 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark suite for the Teacher Magic tools.
+
+Every tool in ``app.py`` is driven through Streamlit's AppTest with a fake Gemini
+backend, measuring:
+
+- rerun_ms:  time for an idle script rerun with the tool selected
+- submit_ms: end-to-end time of filling the form and pressing its submit button
+- peak_kib:  peak Python memory allocated during the submit run (tracemalloc)
+
+Usage (from the repository root):
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Keep shared caches (transcripts, responses) out of the developer's own cache directory
+os.environ.setdefault("TEACHER_MAGIC_CACHE_DIR", tempfile.mkdtemp(prefix="teacher_magic_bench_"))
+
+from benchmarks.fake_gemini import FakeConfig, fake_backend  # noqa: E402
+
+# Form inputs (by widget label) and submit button label for each tool
+TOOL_CASES = {
+    "Prompt Builder": {
+        "inputs": {"AI Role (e.g., science teacher, language tutor)": "science teacher",
+                   "Desired Outcome (e.g., lesson plan, quiz, explanation)": "a quiz",
+                   "Target Audience (e.g., 5th grade students, ESL learners)": "Year 5 students"},
+        "submit": "Build Prompt",
+    },
+    "Text Generator": {
+        "inputs": {"Topic": "Water Cycle",
+                   "Target Vocabulary (comma-separated)": "evaporation, condensation"},
+        "submit": "Generate Text",
+    },
+    "Text Rewriter": {
+        "inputs": {"Original Text": "The water cycle describes how water moves between the land, "
+                                    "the oceans and the atmosphere. " * 10},
+        "submit": "Rewrite Text",
+    },
+    "Academic Content": {
+        "inputs": {"Topic": "Photosynthesis"},
+        "submit": "Generate Academic Content",
+    },
+    "Lesson Plan Generator": {
+        "inputs": {"Lesson Objective": "Students will understand the water cycle",
+                   "Student Action": "create a diagram explaining each step"},
+        "submit": "Generate Lesson Plan",
+    },
+    "Unit Plan Generator": {
+        "inputs": {"Unit Title": "Understanding Ecosystems",
+                   "Learning Objectives/Standards": "Describe food chains\nExplain adaptation"},
+        "submit": "Generate Unit Plan",
+    },
+    "Image Generator": {
+        "inputs": {"Subject/Concept": "water cycle"},
+        "submit": "Generate Image Prompt",
+    },
+    "MCQ Generator": {
+        "inputs": {"Main Topic": "Photosynthesis",
+                   "Key Words (comma-separated)": "chlorophyll, sunlight, glucose"},
+        "submit": "Generate MCQs",
+    },
+    "HOT Questions": {
+        "inputs": {"Lesson Objective": "Understand the causes of climate change"},
+        "submit": "Generate HOT Questions",
+    },
+    "Text Dependent Questions": {
+        "inputs": {"Passage/Text": "Rivers shape the land around them by erosion and deposition. " * 8},
+        "submit": "Generate Text-Dependent Questions",
+    },
+    "DOK Questions": {
+        "inputs": {"Topic/Content": "Fractions"},
+        "submit": "Generate DOK Questions",
+    },
+    "YouTube Video Questions": {
+        "inputs": {"YouTube Video URL": "https://www.youtube.com/watch?v=abcdefghijk"},
+        "submit": "Generate Video Questions from Transcript",
+    },
+    "Vocabulary Focus": {
+        "inputs": {"Enter vocabulary words (comma-separated)": "photosynthesis, ecosystem, habitat"},
+        "submit": "Generate Vocabulary Resources",
+    },
+    "Text Proofreader": {
+        "inputs": {"Text to Proofread": "My freind and me goes to the park yesterday. " * 10},
+        "submit": "Proofread Text",
+    },
+    "IEP Goal Responder": {
+        "inputs": {"Student Needs/Challenges": "Struggles with decoding multi-syllable words."},
+        "submit": "Generate IEP Goals",
+    },
+    "Standards Unpacker": {
+        "inputs": {"Standard Text": "Interpret the product of fractions as scaling."},
+        "submit": "Unpack Standard",
+    },
+    "Email Responder": {
+        "inputs": {"Original Email/Context": "Dear teacher, my son says the homework is too hard."},
+        "submit": "Generate Email Response",
+    },
+    "Email Template Maker": {
+        "inputs": {"Key Information to Include": "Sports day on Friday 12 June, bring a water bottle."},
+        "submit": "Generate Email Template",
+    },
+    "Song Generator": {
+        "inputs": {"Educational Topic": "Water Cycle"},
+        "submit": "Generate Educational Song",
+    },
+    "Reading Pack": {
+        "inputs": {"Topic": "Water Cycle"},
+        "submit": "Generate Reading Pack",
+    },
+}
+
+METRICS = ("rerun_ms", "submit_ms", "peak_kib")
+
+
+def quiet_streamlit_logs():
+    """Silence the bare-mode ScriptRunContext warning AppTest triggers on every run."""
+    # A filter rather than a log level: Streamlit resets its loggers' levels whenever config is reloaded
+    logger = logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context")
+    if not any(isinstance(f, _MissingContextFilter) for f in logger.filters):
+        logger.addFilter(_MissingContextFilter())
+
+
+class _MissingContextFilter(logging.Filter):
+    def filter(self, record):
+        return "missing ScriptRunContext" not in record.getMessage()
+
+
+def fill_inputs(at, inputs):
+    """Set text widgets on the page by label."""
+    remaining = dict(inputs)
+    for widget in list(at.text_input) + list(at.text_area):
+        if widget.label in remaining:
+            widget.set_value(remaining.pop(widget.label))
+    if remaining:
+        raise KeyError(f"Widgets not found on page: {', '.join(remaining)}")
+
+
+def click_submit(at, label):
+    for button in at.button:
+        if button.label == label:
+            button.click()
+            return
+    raise KeyError(f"Submit button '{label}' not found")
+
+
+def benchmark_tool(tool, case, config, repeat, timeout):
+    """
+    Benchmark a single tool.
+
+    Args:
+        tool (str): Tool name as shown in the sidebar
+        case (dict): Inputs and submit label from TOOL_CASES
+        config (FakeConfig): The active fake backend configuration
+        repeat (int): Number of measured iterations
+        timeout (float): AppTest timeout for a single script run in seconds
+
+    Returns:
+        dict: Median timings, peak memory and model call counts for the tool
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rerun_times, submit_times, peaks, calls = [], [], [], []
+    for _ in range(repeat):
+        at = AppTest.from_file(os.path.join(REPO_ROOT, "app.py"), default_timeout=timeout)
+        at.session_state["api_key"] = "benchmark-key"
+        at.session_state["api_key_saved"] = True
+        at.session_state["selected_tool"] = tool
+        at.run()
+
+        start = time.perf_counter()
+        at.run()
+        rerun_times.append((time.perf_counter() - start) * 1000)
+
+        fill_inputs(at, case["inputs"])
+        click_submit(at, case["submit"])
+        config.reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+        at.run()
+        submit_times.append((time.perf_counter() - start) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+        calls.append(len(config.calls))
+
+        if at.exception:
+            raise RuntimeError(f"{tool} raised: {at.exception[0].value}")
+
+    return {
+        "rerun_ms": round(statistics.median(rerun_times), 2),
+        "submit_ms": round(statistics.median(submit_times), 2),
+        "peak_kib": round(max(peaks), 1),
+        "model_calls": max(calls),
+    }
+
+
+def run_suite(tools, config, repeat=3, timeout=60):
+    """Run the benchmark for the given tools and return a JSON-serialisable report."""
+    os.chdir(REPO_ROOT)  # app.py loads styles.css relative to the working directory
+    quiet_streamlit_logs()
+    results = {}
+    with fake_backend(config):
+        for tool in tools:
+            results[tool] = benchmark_tool(tool, TOOL_CASES[tool], config, repeat, timeout)
+            print(f"{tool:<28} rerun {results[tool]['rerun_ms']:>8.1f} ms | "
+                  f"submit {results[tool]['submit_ms']:>8.1f} ms | "
+                  f"peak {results[tool]['peak_kib']:>9.1f} KiB | "
+                  f"calls {results[tool]['model_calls']}")
+
+    import streamlit
+    return {
+        "meta": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "repeat": repeat,
+            "latency": config.latency,
+            "token_latency": config.token_latency,
+            "output_tokens": config.output_tokens,
+        },
+        "results": results,
+    }
+
+
+def compare_reports(current, baseline, threshold=0.2, min_delta_ms=5.0):
+    """
+    Compare a report against a stored baseline.
+
+    Args:
+        current (dict): Report produced by run_suite
+        baseline (dict): Previously stored report
+        threshold (float): Relative increase that counts as a regression (0.2 = 20%)
+        min_delta_ms (float): Absolute timing increase ignored as noise
+
+    Returns:
+        list: One dict per regressed (tool, metric) pair
+    """
+    regressions = []
+    for tool, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(tool)
+        if not base:
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            if metric.endswith("_ms") and new - old < min_delta_ms:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append({"tool": tool, "metric": metric, "baseline": old,
+                                    "current": new, "change_pct": round((new / old - 1) * 100, 1)})
+        if metrics.get("model_calls", 0) > base.get("model_calls", 0):
+            regressions.append({"tool": tool, "metric": "model_calls", "baseline": base.get("model_calls", 0),
+                                "current": metrics["model_calls"], "change_pct": None})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Teacher Magic benchmarks")
+    parser.add_argument("--tools", nargs="*", default=list(TOOL_CASES), help="Tools to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Measured iterations per tool")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Fake seconds per output token")
+    parser.add_argument("--output-tokens", type=int, default=300, help="Fake output length in words")
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest timeout per run in seconds")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--save-baseline", help="Write the JSON report as the new baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative regression threshold")
+    args = parser.parse_args(argv)
+
+    unknown = [tool for tool in args.tools if tool not in TOOL_CASES]
+    if unknown:
+        parser.error(f"Unknown tools: {', '.join(unknown)}")
+
+    config = FakeConfig(latency=args.latency, token_latency=args.token_latency,
+                        output_tokens=args.output_tokens)
+    report = run_suite(args.tools, config, repeat=args.repeat, timeout=args.timeout)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, threshold=args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for item in regressions:
+                change = f"+{item['change_pct']}%" if item["change_pct"] is not None else "more calls"
+                print(f"  {item['tool']}: {item['metric']} {item['baseline']} -> {item['current']} ({change})")
+            return 1
+        print(f"\nNo regressions against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
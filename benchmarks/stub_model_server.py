@@ -0,0 +1,150 @@
+# benchmarks/stub_model_server.py
+"""
+Stub Gemini REST server for load testing.
+
+Serves ``generateContent`` and ``streamGenerateContent`` with the same
+deterministic responses as the in-process fake, so the app can be run against it
+by setting ``GEMINI_API_BASE_URL=http://127.0.0.1:<port>``.
+
+Usage:
+
+    python -m benchmarks.stub_model_server --port 8765 --latency 0.8
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_gemini import FakeConfig, fake_response_text  # noqa: E402
+
+ROUTE = re.compile(r"^/[^/]+/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)")
+
+
+def _prompt_from_body(body):
+    texts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def _candidate(text, index=0):
+    return {"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": index}
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    """Request handler; the server's ``config`` attribute holds the FakeConfig."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep load test output readable
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok", "calls": len(self.server.config.calls)})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+    def do_POST(self):
+        match = ROUTE.match(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not match:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+
+        config = self.server.config
+        prompt = _prompt_from_body(body)
+        generation_config = body.get("generationConfig", {})
+
+        if match.group("method") == "generateContent":
+            config.record(prompt, "generate")
+            count = generation_config.get("candidateCount", 1)
+            texts = [fake_response_text(prompt, config, variant=i) for i in range(count)]
+            time.sleep(config.latency + config.token_latency * max(len(t.split()) for t in texts))
+            self._send_json(200, {
+                "candidates": [_candidate(text, i) for i, text in enumerate(texts)],
+                "usageMetadata": {"promptTokenCount": len(prompt.split()),
+                                  "candidatesTokenCount": sum(len(t.split()) for t in texts)},
+            })
+            return
+
+        # Server-sent events, as requested by the SDK with alt=sse
+        config.record(prompt, "stream")
+        text = fake_response_text(prompt, config)
+        time.sleep(config.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        pieces = re.findall(r"\S+\s*", text)
+        step = max(1, config.chunk_tokens)
+        for i in range(0, len(pieces), step):
+            chunk = "".join(pieces[i:i + step])
+            time.sleep(config.token_latency * len(pieces[i:i + step]))
+            event = json.dumps({"candidates": [_candidate(chunk)]})
+            self.wfile.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """
+    Start the stub server on a background thread.
+
+    Args:
+        config (FakeConfig): Backend behaviour
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free port
+
+    Returns:
+        ThreadingHTTPServer: The running server; its URL is ``http://host:server.server_port``
+    """
+    server = ThreadingHTTPServer((host, port), StubModelHandler)
+    server.daemon_threads = True
+    server.config = config or FakeConfig()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub Gemini REST server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.8, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per output token")
+    parser.add_argument("--output-tokens", type=int, default=300, help="Output length in words")
+    args = parser.parse_args(argv)
+
+    config = FakeConfig(latency=args.latency, token_latency=args.token_latency, output_tokens=args.output_tokens)
+    server = ThreadingHTTPServer((args.host, args.port), StubModelHandler)
+    server.daemon_threads = True
+    server.config = config
+    print(f"Stub model server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
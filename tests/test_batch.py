@@ -0,0 +1,55 @@
+# tests/test_batch.py
+import os
+import pytest
+import utils.question_bank
+from benchmarks.fake_gemini import FakeConfig, fake_backend
+from utils.batch import BatchQueue, LocalBatchBackend, batch_owner
+
+MCQ_PROMPT = "Write 3 multiple-choice questions on plants. Use Q:, A:, Correct:, Explanation: and Concepts: lines."
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEACHER_MAGIC_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("TEACHER_MAGIC_QUESTION_BANK", str(tmp_path / "question_bank.sqlite3"))
+    monkeypatch.setattr(utils.question_bank, "_bank", None)
+    with fake_backend(FakeConfig(latency=0.0, output_tokens=20)) as config:
+        yield BatchQueue(str(tmp_path / "batch_queue.sqlite3"), backend=LocalBatchBackend()), config
+
+def test_requests_go_from_queued_to_delivered_once(queue):
+    batch, config = queue
+    alice, bob = batch_owner("key-a"), batch_owner("key-b")
+    batch.add(alice, "Text Generator", "Write about rivers.", {"topic": "rivers"})
+    batch.add(alice, "MCQ Generator", MCQ_PROMPT, {"topic": "plants"},
+              {"question_bank": "mcq", "topic": "Plants", "language": "English"})
+    batch.add(bob, "Text Generator", "Write about volcanoes.", {"topic": "volcanoes"})
+    assert batch.stats()["queued"] == 3
+
+    job, count = batch.submit("key")
+    assert job and count == 3
+    assert batch.stats()["submitted"] == 3
+    assert batch.submit("key") == (None, 0)
+
+    summary = batch.poll("key")
+    assert summary == {"finished": 1, "done": 3, "failed": 0, "banked": 3, "running": 0}
+    assert batch.stats()["done"] == 3
+    assert utils.question_bank.get_question_bank().stats() == {"mcq": 3}
+    assert batch.poll("key")["finished"] == 0
+
+    delivered = batch.take_results(alice)
+    assert [(item["tool"], item["inputs"], item["status"]) for item in delivered] == [
+        ("Text Generator", {"topic": "rivers"}, "done"), ("MCQ Generator", {"topic": "plants"}, "done")]
+    assert all(item["result"] for item in delivered)
+    assert batch.take_results(alice) == []
+    assert [item["inputs"] for item in batch.take_results(bob)] == [{"topic": "volcanoes"}]
+    assert batch.take_results(bob) == []
+    assert len(config.calls) == 3
+
+def test_missing_results_fail_the_job_requests(queue):
+    batch, _ = queue
+    owner = batch_owner("key-a")
+    batch.add(owner, "Text Generator", "Write about rivers.", {"topic": "rivers"})
+    job, _ = batch.submit("key")
+    os.remove(job + ".results")  # The local backend's job name is its job file
+    assert batch.poll("key")["failed"] == 1
+    [item] = batch.take_results(owner)
+    assert item["status"] == "failed" and "results file missing" in item["result"]
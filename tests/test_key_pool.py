@@ -0,0 +1,36 @@
+# tests/test_key_pool.py
+import time
+import pytest
+from utils.key_pool import KeyPool, NoKeyAvailable
+
+def test_calls_are_spread_by_remaining_quota():
+    pool = KeyPool([("key-a", 2), ("key-b", 4)], max_wait=0)
+    keys = [pool.acquire() for _ in range(6)]
+    assert keys.count("key-a") == 2 and keys.count("key-b") == 4
+
+def test_a_saturated_pool_refuses_instead_of_overrunning_a_key():
+    pool = KeyPool([("key-a", 1), ("key-b", 1)], max_wait=0)
+    pool.acquire()
+    pool.acquire()
+    with pytest.raises(NoKeyAvailable, match="quota"):
+        pool.acquire()
+    assert all(row["used_last_minute"] == 1 for row in pool.stats())
+
+def test_a_saturated_pool_waits_for_quota_to_free_up():
+    pool = KeyPool([("key-a", 1)], max_wait=2)
+    pool.acquire()
+    pool.release("key-a")
+    pool._keys["key-a"]["recent"][0] -= 59.8  # The call was made almost a minute ago
+    start = time.monotonic()
+    assert pool.acquire() == "key-a"
+    assert 0.1 < time.monotonic() - start < 1.5
+
+def test_rate_limited_keys_are_left_out():
+    pool = KeyPool([("key-a", 10), ("key-b", 10)], max_wait=0)
+    key = pool.acquire()
+    pool.release(key, Exception("429 RESOURCE_EXHAUSTED. Please retry in 30s."))
+    other = pool.acquire()
+    assert other != key
+    pool.release(other, Exception("400 API key not valid"))
+    with pytest.raises(NoKeyAvailable, match="busy or unavailable"):
+        pool.acquire()
@@ -0,0 +1,52 @@
+# tests/test_question_bank.py
+from utils.question_bank import QuestionBank
+
+def question(text, concepts=()):
+    return {"question": text, "block": f"Q: {text}", "concepts": list(concepts)}
+
+def make_bank(tmp_path):
+    return QuestionBank(str(tmp_path / "question_bank.sqlite3"))
+
+def test_repeated_questions_are_stored_once(tmp_path):
+    bank = make_bank(tmp_path)
+    questions = [question("What is evaporation?"), question("What is condensation?")]
+    assert bank.add_questions("mcq", questions, "Water cycle", "English", reading_age=10) == 2
+    assert bank.add_questions("mcq", questions, "The water cycle", "English", reading_age=10) == 0
+    assert bank.stats() == {"mcq": 2}
+
+def test_questions_are_found_by_topic_concept_or_words(tmp_path):
+    bank = make_bank(tmp_path)
+    bank.add_questions("mcq", [question("What is evaporation?")], "Water cycle", "English")
+    bank.add_questions("mcq", [question("Why do clouds form?", ["condensation"])], "Weather", "English")
+    bank.add_questions("mcq", [question("How do rivers shape valleys?")], "Rivers and erosion", "English")
+
+    assert [q["question"] for q in bank.find_questions("mcq", "the water cycle", 5, "English")] == \
+        ["What is evaporation?"]
+    assert [q["question"] for q in bank.find_questions("mcq", "Condensation", 5, "English")] == \
+        ["Why do clouds form?"]
+    assert [q["question"] for q in bank.find_questions("mcq", "erosion", 5, "English")] == \
+        ["How do rivers shape valleys?"]
+
+def test_filters_must_match(tmp_path):
+    bank = make_bank(tmp_path)
+    bank.add_questions("mcq", [question("What is evaporation?")], "Water cycle", "English", reading_age=10)
+    assert bank.find_questions("mcq", "Water cycle", 5, "English", reading_age=11)
+    assert not bank.find_questions("mcq", "Water cycle", 5, "English", reading_age=12)
+    assert not bank.find_questions("mcq", "Water cycle", 5, "Bahasa Melayu")
+    assert not bank.find_questions("dok", "Water cycle", 5, "English")
+
+def test_least_used_questions_come_first(tmp_path):
+    bank = make_bank(tmp_path)
+    bank.add_questions("mcq", [question("What is evaporation?"), question("What is condensation?")],
+                       "Water cycle", "English")
+    first = bank.find_questions("mcq", "Water cycle", 1, "English")
+    bank.mark_used([first[0]["id"]])
+    second = bank.find_questions("mcq", "Water cycle", 1, "English")
+    assert second[0]["id"] != first[0]["id"]
+
+def test_excluded_questions_are_skipped(tmp_path):
+    bank = make_bank(tmp_path)
+    bank.add_questions("mcq", [question("What is evaporation?"), question("What is condensation?")],
+                       "Water cycle", "English")
+    found = bank.find_questions("mcq", "Water cycle", 5, "English", exclude=lambda text: "evaporation" in text)
+    assert [q["question"] for q in found] == ["What is condensation?"]
@@ -0,0 +1,36 @@
+# tests/test_questions.py
+from utils.questions import collapse_near_duplicates
+from utils.similarity import QuestionSimilarityIndex
+
+HOT = """Q: How would the water cycle change if the oceans were twice as salty?
+Stems:
+1) If the oceans were saltier, evaporation would...
+2) One consequence for rainfall could be...
+3) I think this matters because..."""
+
+def mcq(question):
+    return f"Q: {question}\nA: one | two | three | four\nCorrect: A\nExplanation: Because."
+
+def test_duplicate_hot_question_is_flagged_not_removed():
+    index = QuestionSimilarityIndex()
+    collapse_near_duplicates(index, HOT)
+    review = collapse_near_duplicates(index, HOT)
+    assert review["duplicates"] and not review["removed"]
+    assert review["text"] == HOT
+
+def test_duplicate_mcq_blocks_are_removed():
+    index = QuestionSimilarityIndex()
+    first = mcq("What process turns liquid water into water vapour in the water cycle?")
+    second = mcq("Which layer of the atmosphere contains most of the clouds and weather?")
+    collapse_near_duplicates(index, first)
+    review = collapse_near_duplicates(index, first + "\n\n" + second)
+    assert review["removed"] and len(review["duplicates"]) == 1
+    assert review["text"] == second
+
+def test_output_of_only_duplicates_is_never_emptied():
+    index = QuestionSimilarityIndex()
+    text = mcq("What process turns liquid water into water vapour in the water cycle?")
+    collapse_near_duplicates(index, text)
+    review = collapse_near_duplicates(index, text)
+    assert review["duplicates"] and not review["removed"]
+    assert review["text"] == text
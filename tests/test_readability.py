@@ -0,0 +1,36 @@
+# tests/test_readability.py
+import pytest
+from utils.readability import SENTENCE_LENGTH_RANGE, check_readability, lexile_targets, target_ranges
+
+@pytest.mark.parametrize("lexile_score, grades, reading_ease", [
+    (400, (1, 4), (80, 100)),
+    (800, (5, 8), (60, 80)),
+    (1200, (9, 12), (45, 65)),
+])
+def test_lexile_targets_are_realistic(lexile_score, grades, reading_ease):
+    targets = lexile_targets(lexile_score)
+    low, high = SENTENCE_LENGTH_RANGE
+    assert low <= targets["avg_sentence_length"] <= high
+    assert 1.1 <= targets["syllables_per_word"] <= 1.8
+    assert grades[0] <= targets["grade"] <= grades[1]
+    assert reading_ease[0] <= targets["reading_ease"] <= reading_ease[1]
+
+def test_lexile_targets_are_consistent():
+    # A text that hits the sentence and word length targets meets the reading ease check
+    for lexile_score in range(200, 1650, 50):
+        targets = lexile_targets(lexile_score)
+        sentence_length, syllables = targets["avg_sentence_length"], targets["syllables_per_word"]
+        metrics = {"words": 300, "reading_ease": 206.835 - 1.015 * sentence_length - 84.6 * syllables}
+        assert not check_readability(metrics, target_ranges(targets, ["reading_ease"]))
+
+def test_lexile_targets_rise_with_score():
+    scores = [lexile_targets(lexile_score) for lexile_score in (400, 800, 1200, 1600)]
+    for easier, harder in zip(scores, scores[1:]):
+        assert easier["avg_sentence_length"] <= harder["avg_sentence_length"]
+        assert easier["reading_ease"] > harder["reading_ease"]
+        assert easier["grade"] < harder["grade"]
+
+def test_only_scores_with_a_tolerance_are_checked():
+    ranges = target_ranges(lexile_targets(800))
+    assert set(ranges) == {"reading_ease", "grade"}
+    assert set(target_ranges(lexile_targets(800), ["reading_ease"])) == {"reading_ease"}
@@ -0,0 +1,63 @@
+# tests/test_semantic_cache.py
+import time
+from utils.semantic_cache import SemanticCache, tokenize
+
+FIELDS = {"grade_level": "Grade 5", "subject": "Science", "language": "English"}
+
+def make_cache(tmp_path, **kwargs):
+    return SemanticCache(str(tmp_path / "semantic_cache.sqlite3"), **kwargs)
+
+def test_question_words_are_kept():
+    assert tokenize("How do plants grow?") == ["how", "plants", "grow"]
+    assert "why" in tokenize("Why is the sky blue")
+
+def test_lookup_matches_a_rewording_above_the_threshold(tmp_path):
+    cache = make_cache(tmp_path)
+    entry_id = cache.add("Lesson Plan Generator", FIELDS, {"topic": "Photosynthesis in green plants"}, "Plan A")
+    match = cache.lookup("Lesson Plan Generator", {**FIELDS, "subject": " science "},
+                         {"topic": "photosynthesis  in Green Plants."})
+    assert match["id"] == entry_id and match["result"] == "Plan A"
+    assert match["score"] > 0.99
+
+def test_lookup_misses_below_the_threshold(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.add("Lesson Plan Generator", FIELDS, {"topic": "Photosynthesis in green plants"}, "Plan A")
+    assert cache.lookup("Lesson Plan Generator", FIELDS, {"topic": "Photosynthesis in desert animals"}) is None
+    assert cache.lookup("Lesson Plan Generator", {**FIELDS, "grade_level": "Grade 6"},
+                        {"topic": "Photosynthesis in green plants"}) is None
+
+def test_why_and_how_requests_do_not_match(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.add("Text Generator", FIELDS, {"topic": "Why plants need light"}, "Why text")
+    assert cache.lookup("Text Generator", FIELDS, {"topic": "How plants need light"}) is None
+    assert cache.lookup("Text Generator", FIELDS, {"topic": "why plants need light"})["result"] == "Why text"
+
+def test_expired_entries_are_not_reused_and_are_deleted_on_write(tmp_path):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.add("Text Generator", FIELDS, {"topic": "Volcanoes"}, "Old")
+    cache._connection().execute("UPDATE entries SET created = created - 120")
+    assert cache.lookup("Text Generator", FIELDS, {"topic": "Volcanoes"}) is None
+    cache.add("Text Generator", FIELDS, {"topic": "Earthquakes"}, "New")
+    assert cache.stats()["entries"] == 1
+    features = cache._connection().execute("SELECT COUNT(DISTINCT entry_id) FROM features").fetchone()[0]
+    assert features == 1
+
+def test_evict_trims_the_oldest_entries_to_90_percent_of_the_cap(tmp_path):
+    cache = make_cache(tmp_path, max_entries=20)
+    for i in range(20):
+        cache.add("Text Generator", FIELDS, {"topic": f"topic number {i}"}, str(i))
+    assert cache.stats()["entries"] == 20
+    cache.add("Text Generator", FIELDS, {"topic": "topic number 20"}, "20")
+    conn = cache._connection()
+    assert cache.stats()["entries"] == 18
+    kept = [int(row[0]) for row in conn.execute("SELECT result FROM entries ORDER BY id")]
+    assert kept == list(range(3, 21))
+    assert conn.execute("SELECT COUNT(DISTINCT entry_id) FROM features").fetchone()[0] == 18
+
+def test_evict_is_a_no_op_under_the_cap(tmp_path):
+    cache = make_cache(tmp_path, max_entries=20)
+    now = time.time()
+    for i in range(5):
+        cache.add("Text Generator", FIELDS, {"topic": f"topic number {i}"}, str(i))
+    cache._evict(cache._connection(), now)
+    assert cache.stats()["entries"] == 5
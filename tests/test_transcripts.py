@@ -0,0 +1,24 @@
+# tests/test_transcripts.py
+import pytest
+from utils.transcripts import SegmentIndex, select_relevant_passages
+
+def make_index(count=200):
+    topics = ["photosynthesis in leaves", "volcanoes and lava", "the water cycle", "ancient rome"]
+    return SegmentIndex([[i * 4.0, 4.0, f"Segment {i} talks about {topics[i % len(topics)]} in some detail."]
+                         for i in range(count)])
+
+@pytest.mark.parametrize("budget_chars", [300, 1000, 2500, 6000])
+def test_formatted_passages_stay_within_the_budget(budget_chars):
+    index = make_index()
+    bounds, selected = select_relevant_passages(index, "photosynthesis volcanoes", budget_chars, passage_chars=200)
+    assert selected
+    assert len(index.format_passages(bounds, selected)) <= budget_chars
+
+def test_whole_transcript_is_kept_when_it_fits_once_formatted():
+    index = make_index(20)
+    bounds = index.passages(200)
+    formatted = index.format_passages(bounds)
+    _, selected = select_relevant_passages(index, "volcanoes", len(formatted), passage_chars=200)
+    assert selected == list(range(len(bounds) - 1))
+    _, selected = select_relevant_passages(index, "volcanoes", len(formatted) - 1, passage_chars=200)
+    assert len(selected) < len(bounds) - 1
@@ -1,14 +1,191 @@
 # tools/assessment_tools.py
 import streamlit as st
 import re
-from utils.api import call_gemini_api
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from utils.api import (MODEL_NAME, call_gemini_api, call_gemini_api_concurrent, generation_config, is_api_error,
+                       stream_gemini_api)
+from utils.batch import batch_owner, get_batch_queue
 from utils.data import load_educational_data, save_to_history
+from utils.results import record_result, reuse_last_result
+from utils.cache import get_cache, make_key
+from utils.question_bank import get_question_bank
+from utils.questions import (QuestionStreamParser, build_replacement_prompt, collapse_near_duplicates,
+                             get_question_index, is_complete_mcq, parse_dok_blocks, parse_question_blocks,
+                             question_index_path)
+from utils.transcripts import SegmentIndex, format_timestamp, select_relevant_passages, split_into_chunks
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
 
-def display_result(title, content):
-    """Display the result in a formatted area."""
+def display_result(title, content, prompt=None, config=None):
+    """Display the result in a formatted area and keep it for later reruns."""
     st.markdown(f"### {title}")
     st.markdown(f"<div class='result-area'>{content}</div>", unsafe_allow_html=True)
+    record_result(st.session_state, title, content, prompt, config)
+
+def review_duplicates(tool, prompt, result, avoid=(), offer_replacements=True):
+    """
+    Collapse or flag questions that nearly repeat ones generated earlier in the session.
+
+    When duplicates are found, what is needed to fetch replacements is kept in
+    session state for render_replacement_button.
+
+    Args:
+        tool (str): Name of the tool that generated the result
+        prompt (str): The prompt that produced the result
+        result (str): The model output
+        avoid (list): Questions from earlier rounds the replacements must also differ from
+        offer_replacements (bool): Whether to offer replacements through render_replacement_button
+
+    Returns:
+        str: The result to display, with duplicate questions removed where possible
+    """
+    if is_api_error(result):
+        return result
+    review = collapse_near_duplicates(get_question_index(st.session_state), result,
+                                      question_index_path(st.session_state))
+    pending = st.session_state.setdefault('pending_replacements', {})
+    pending.pop(tool, None)
+
+    duplicates = review["duplicates"]
+    if duplicates:
+        action = "Removed" if review["removed"] else "Found"
+        st.warning(f"{action} {len(duplicates)} near-duplicate question(s) of questions generated earlier:\n\n"
+                   + "\n".join(f"- {question}" for question, _ in duplicates))
+    if duplicates and offer_replacements:
+        pending[tool] = {
+            "prompt": prompt,
+            "count": len(duplicates),
+            "avoid": list(dict.fromkeys([*avoid, *review["questions"], *(earlier for _, earlier in duplicates)])),
+        }
+    return review["text"]
+
+def render_replacement_button(tool, title, profile=None):
+    """
+    Offer to generate only as many new questions as were dropped as duplicates.
+
+    Args:
+        tool (str): Name of the tool, as passed to review_duplicates
+        title (str): Heading for the replacement questions
+        profile (str): Tool whose generation profile and history name to use, when
+            tool names a part of it (e.g. one DOK level)
+    """
+    pending = st.session_state.get('pending_replacements', {}).get(tool)
+    if not pending:
+        return
+    count = pending["count"]
+    if st.button(f"Generate {count} replacement question{'s' if count != 1 else ''}", key=f"replace_{tool}"):
+        with st.spinner("Generating replacement questions..."):
+            prompt = build_replacement_prompt(pending["prompt"], count, pending["avoid"])
+            result = call_gemini_api(prompt, st.session_state['api_key'], generation_config(profile or tool, items=count))
+
+            if result:
+                result = review_duplicates(tool, pending["prompt"], result, pending["avoid"])
+                display_result(title, result)
+
+                # Save to history
+                save_to_history(st.session_state, profile or tool, {"replacements": count}, result)
+
+def show_question_preview(preview, blocks):
+    """Show the questions that have streamed in so far, replacing the previous preview."""
+    preview.markdown("<div class='result-area'>" + "\n\n".join(block["raw"] for block in blocks) + "</div>",
+                     unsafe_allow_html=True)
+
+def stream_mcqs(tool, prompt, count, avoid=()):
+    """
+    Generate MCQs in the Q: block format, showing each question as soon as it has arrived.
+
+    The stream is ended once count questions have been parsed, so surplus output
+    is not generated. Questions that came back malformed (or were never sent,
+    if the stream ended early) are regenerated on their own, in one follow-up
+    request, rather than the whole set.
+
+    Args:
+        tool (str): Name of the tool, for its generation profile
+        prompt (str): The generation prompt
+        count (int): Number of questions wanted
+        avoid (list): Existing questions (e.g. from the question bank) the new ones must differ from
+
+    Returns:
+        str: The complete questions as Q: blocks; the raw output if none could be
+        parsed, or an error message if the request failed
+    """
+    api_key = st.session_state['api_key']
+    preview = st.empty()
+    parser = QuestionStreamParser(until=lambda blocks: len(blocks) >= count)
+    error = None
+    request = build_replacement_prompt(prompt, count, avoid) if avoid else prompt
+    stream = stream_gemini_api(request, api_key, generation_config(tool, items=count))
+    try:
+        for chunk in stream:
+            if is_api_error(chunk):
+                error = chunk
+                break
+            if any(is_complete_mcq(block) for block in parser.feed(chunk)):
+                show_question_preview(preview, [block for block in parser.blocks if is_complete_mcq(block)])
+            if parser.done:
+                break
+    finally:
+        stream.close()
+    parser.close()
+
+    complete = [block for block in parser.blocks if is_complete_mcq(block)]
+    if not complete:
+        preview.empty()
+        return error or parser.text
+    missing = count - len(complete)
+    if missing > 0:
+        retry = build_replacement_prompt(prompt, missing, [*avoid, *(block["question"] for block in complete)])
+        result = call_gemini_api(retry, api_key, generation_config(tool, items=missing))
+        if not is_api_error(result):
+            regenerated = [block for block in parse_question_blocks(result) if is_complete_mcq(block)][:missing]
+            complete += regenerated
+            if regenerated:
+                st.info(f"Regenerated {len(regenerated)} question{'s' if len(regenerated) != 1 else ''} "
+                        "that came back incomplete.")
+    preview.empty()
+    return "\n\n".join(block["raw"] for block in complete)
+
+def queue_for_tonight(tool, requests):
+    """
+    Defer requests to the next batch run instead of generating them now.
+
+    Batch jobs are cheaper and do not use the real-time quota; the results are
+    added to the teacher's history (and to the question bank) after the run.
+
+    Args:
+        tool (str): Name of the tool
+        requests (list): (prompt, inputs, target) per request; target as for utils.batch.apply_target
+    """
+    if not st.session_state['api_key']:
+        # Queued results are returned to the key they were queued under
+        st.error("Queueing for tonight needs your own Gemini API key, so that the results can be returned to you. "
+                 "Enter it in the sidebar, or untick 'Queue for tonight'.")
+        return
+    queue = get_batch_queue()
+    owner = batch_owner(st.session_state['api_key'])
+    for prompt, inputs, target in requests:
+        queue.add(owner, tool, prompt, inputs, target)
+    st.success(f"Queued {len(requests)} request{'s' if len(requests) != 1 else ''} for tonight's batch run. "
+               "The questions will be added to the question bank and to your history once it has run.")
+
+def find_banked_questions(kind, topic, count, **filters):
+    """
+    Find questions in the question bank that this session has not seen yet.
+
+    Args:
+        kind (str): "mcq" or "dok"
+        topic (str): The requested topic
+        count (int): Maximum number of questions
+        **filters: Language, reading age, grade, subject, level and keywords, as for
+            QuestionBank.find_questions
+
+    Returns:
+        list: Bank entries with "id", "question", "block" and "level"
+    """
+    index = get_question_index(st.session_state)
+    return get_question_bank().find_questions(kind, topic, count, exclude=lambda text: bool(index.query(text)),
+                                              **filters)
 
 # Tool 1: MCQ Generator
 def render_mcq_generator():
@@ -22,6 +199,10 @@ def render_mcq_generator():
         
         num_questions = st.slider("Number of Questions", min_value=3, max_value=10, value=5)
         reading_age = st.slider("Reading Age", min_value=6, max_value=18, value=10)
+        use_bank = st.checkbox("Reuse questions from the question bank", value=True,
+                               help="Questions generated before for the same topic are reused, and only the rest are generated")
+        queue_tonight = st.checkbox("Queue for tonight", help="Generate in tonight's batch run, at lower cost; "
+                                    "the questions are added to the question bank and your history afterwards")
         
         submit_button = st.form_submit_button(label="Generate MCQs")
     
@@ -49,10 +230,41 @@ def render_mcq_generator():
                 - Use age-appropriate language for reading age {reading_age}.
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                if queue_tonight:
+                    queue_for_tonight("MCQ Generator", [(prompt, {"topic": topic, "keywords": keywords,
+                                                                  "num_questions": num_questions,
+                                                                  "reading_age": reading_age},
+                                                         {"question_bank": "mcq", "topic": topic, "language": "English",
+                                                          "reading_age": reading_age})])
+                    return
+                
+                # Serve what we can from the question bank and generate only the shortfall
+                banked = []
+                if use_bank:
+                    banked = find_banked_questions("mcq", topic, num_questions, language="English",
+                                                   reading_age=reading_age, keywords=keywords.split(","))
+                needed = num_questions - len(banked)
+                
+                result = ""
+                if needed:
+                    result = stream_mcqs("MCQ Generator", prompt, needed, [q["question"] for q in banked])
+                    if not is_api_error(result):
+                        get_question_bank().add_questions(
+                            "mcq",
+                            [{"question": block["question"], "block": block["raw"], "concepts": block["concepts"]}
+                             for block in parse_question_blocks(result) if is_complete_mcq(block)],
+                            topic, "English", reading_age=reading_age)
+                
+                if banked and (not needed or not is_api_error(result)):
+                    get_question_bank().mark_used([q["id"] for q in banked])
+                    st.info(f"{len(banked)} of {num_questions} questions reused from the question bank.")
+                    result = "\n\n".join([q["block"] for q in banked] + ([result] if result else []))
                 
                 if result:
-                    display_result("Generated Questions", result)
+                    result = review_duplicates("MCQ Generator", prompt, result)
+                    # Only a result generated in full answers the prompt, so only that one can be regenerated
+                    display_result("Generated Questions", result, None if banked else prompt,
+                                   generation_config("MCQ Generator", items=num_questions))
                     
                     # Save to history
                     save_to_history(st.session_state, "MCQ Generator", 
@@ -60,6 +272,8 @@ def render_mcq_generator():
                                     "num_questions": num_questions, "reading_age": reading_age}, 
                                    result)
 
+    render_replacement_button("MCQ Generator", "Replacement Questions")
+
 # Tool 2: HOT Questions
 def render_hot_questions():
     """Render the Higher-Order Thinking Questions tool."""
@@ -136,9 +350,10 @@ def render_hot_questions():
                 3) <Sentence Stem 3>
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                result = call_gemini_api(prompt, st.session_state['api_key'], generation_config("HOT Questions", items=1))
                 
                 if result:
+                    result = review_duplicates("HOT Questions", prompt, result)
                     display_result("Generated HOT Question", result)
                     
                     # Save to history
@@ -147,6 +362,8 @@ def render_hot_questions():
                                     "subject": subject, "complexity": complexity, "language": language}, 
                                    result)
 
+    render_replacement_button("HOT Questions", "Replacement HOT Question")
+
 # Tool 3: Text Dependent Questions
 def render_text_dependent_questions():
     """Render the Text Dependent Questions tool."""
@@ -203,10 +420,12 @@ def render_text_dependent_questions():
                 Explanation: [Brief explanation]
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                config = generation_config("Text Dependent Questions", items=num_questions)
+                result = reuse_last_result(st.session_state, prompt) or call_gemini_api(
+                    prompt, st.session_state['api_key'], config)
                 
                 if result:
-                    display_result("Generated Text-Dependent Questions", result)
+                    display_result("Generated Text-Dependent Questions", result, prompt, config)
                     
                     # Save to history
                     save_to_history(st.session_state, "Text Dependent Questions", 
@@ -216,6 +435,88 @@ def render_text_dependent_questions():
                                    result)
 
 # Tool 4: DOK Questions
+DOK_LEVEL_DESCRIPTIONS = {
+    "Level 1: Recall": "Recall of information, basic facts, definitions, simple procedures",
+    "Level 2: Skills/Concepts": "Use information, conceptual knowledge, follow procedures, two or more steps",
+    "Level 3: Strategic Thinking": "Reasoning, planning, using evidence, complex thinking, justification",
+    "Level 4: Extended Thinking": "Complex reasoning, planning, developing, thinking, connecting ideas across content",
+}
+DOK_LEVELS = list(DOK_LEVEL_DESCRIPTIONS)
+DOK_QUESTIONS_PER_LEVEL = 2
+
+def build_dok_level_prompt(settings, level, count):
+    """
+    Build the prompt for the questions of a single DOK level.
+
+    Args:
+        settings (dict): Topic, subject, grade_level, language and standards from the form
+        level (str): One of DOK_LEVELS
+        count (int): Number of questions to generate
+
+    Returns:
+        str: The prompt
+    """
+    return f"""
+    Create {count} Depth of Knowledge (DOK) question{"s" if count != 1 else ""} in {settings['language']} about {settings['topic']} for {settings['grade_level']} students in {settings['subject']}.
+    
+    {f"Target these standards/objectives: {settings['standards']}" if settings['standards'] else ""}
+    
+    Every question must be at {level} ({DOK_LEVEL_DESCRIPTIONS[level]}).
+    
+    For each question:
+    1. Write a clear, focused question appropriate for this DOK level
+    2. Provide sample answer(s) or success criteria
+    3. Include a brief explanation of why this question reflects its DOK level
+    
+    Format each question exactly like this:
+    DOK Level: {level}
+    Question: [The question]
+    Sample Answer: [Sample answer(s) or success criteria]
+    Explanation: [Why this question reflects its DOK level]
+    Concepts: [Comma-separated main ideas or key words]
+    """
+
+def bank_dok_questions(result, settings):
+    """Store the questions of a DOK result in the question bank."""
+    get_question_bank().add_questions(
+        "dok",
+        [{"question": block["question"], "block": block["raw"], "concepts": block["concepts"],
+          "level": DOK_LEVELS[block["level"] - 1]}
+         for block in parse_dok_blocks(result) if block["level"]],
+        settings["topic"], settings["language"], grade=settings["grade_level"], subject=settings["subject"])
+
+def dok_level_tool(level):
+    """Name under which duplicate replacements are offered for one DOK level."""
+    return f"DOK Questions ({level})"
+
+def regenerate_dok_level(run, level):
+    """
+    Regenerate (or retry) the questions of one DOK level of the last run.
+
+    Args:
+        run (dict): The run kept in session state by render_dok_questions
+        level (str): The level to regenerate
+    """
+    entry = run["levels"][level]
+    prompt = entry["prompt"]
+    if not entry["error"]:
+        avoid = [block["question"] for block in parse_dok_blocks(entry["text"])]
+        if avoid:
+            prompt = build_replacement_prompt(prompt, DOK_QUESTIONS_PER_LEVEL, avoid)
+
+    result = call_gemini_api(prompt, st.session_state['api_key'],
+                             generation_config("DOK Questions", items=DOK_QUESTIONS_PER_LEVEL))
+    if not result:
+        return
+    if is_api_error(result):
+        entry.update(text=result, error=True)
+        return
+
+    bank_dok_questions(result, run["settings"])
+    text = review_duplicates(dok_level_tool(level), prompt, result)
+    entry.update(text=text, error=False)
+    save_to_history(st.session_state, "DOK Questions", {**run["inputs"], "dok_levels": level}, text)
+
 def render_dok_questions():
     """Render the Depth of Knowledge Questions tool."""
     st.markdown("<div class='sub-header'>🔍 Depth of Knowledge (DOK) Questions</div>", unsafe_allow_html=True)
@@ -234,141 +535,556 @@ def render_dok_questions():
         
         with col2:
             dok_levels = st.multiselect("DOK Levels", 
-                                      options=["Level 1: Recall", "Level 2: Skills/Concepts", 
-                                               "Level 3: Strategic Thinking", "Level 4: Extended Thinking"],
+                                      options=DOK_LEVELS,
                                       default=["Level 1: Recall", "Level 2: Skills/Concepts", "Level 3: Strategic Thinking"])
             language = st.selectbox("Language", options=["English", "Bahasa Melayu"])
         
         standards = st.text_area("Standards/Learning Objectives (Optional)", 
                               placeholder="List any specific standards or learning objectives to target")
+        use_bank = st.checkbox("Reuse questions from the question bank", value=True,
+                               help="Questions generated before for the same topic are reused, and only the rest are generated")
+        queue_tonight = st.checkbox("Queue for tonight", help="Generate in tonight's batch run, at lower cost; "
+                                    "the questions are added to the question bank and your history afterwards")
         
         submit_button = st.form_submit_button(label="Generate DOK Questions")
     
     if submit_button:
         if not topic:
             st.error("Please enter a topic/content.")
+        elif not dok_levels:
+            st.error("Please select at least one DOK level.")
+        elif queue_tonight:
+            settings = {"topic": topic, "subject": subject, "grade_level": grade_level,
+                        "language": language, "standards": standards}
+            queue_for_tonight("DOK Questions", [
+                (build_dok_level_prompt(settings, level, DOK_QUESTIONS_PER_LEVEL),
+                 {"topic": topic, "subject": subject, "grade_level": grade_level, "dok_level": level},
+                 {"question_bank": "dok", "topic": topic, "language": language, "grade": grade_level,
+                  "subject": subject, "level": level})
+                for level in dok_levels])
         else:
             with st.spinner("Generating DOK questions..."):
-                # Join DOK levels with commas
-                dok_levels_str = ", ".join(dok_levels)
+                settings = {"topic": topic, "subject": subject, "grade_level": grade_level,
+                            "language": language, "standards": standards}
+                run = {
+                    "settings": settings,
+                    "inputs": {"topic": topic, "subject": subject, "grade_level": grade_level,
+                               "dok_levels": ", ".join(dok_levels)},
+                    "levels": {},
+                }
+                st.session_state['dok_run'] = run
                 
-                prompt = f"""
-                Create Depth of Knowledge (DOK) questions in {language} about {topic} for {grade_level} students in {subject}.
-                
-                {f"Target these standards/objectives: {standards}" if standards else ""}
-                
-                Generate 2 questions for each of these DOK levels: {dok_levels_str}
-                
-                For each question:
-                1. Clearly indicate the DOK level
-                2. Write a clear, focused question appropriate for that DOK level
-                3. Provide sample answer(s) or success criteria
-                4. Include a brief explanation of why this question reflects its DOK level
+                # One slot per level, in the order selected, filled as each level completes
+                slots = {level: st.container() for level in dok_levels}
                 
-                DOK Level Descriptions:
-                - Level 1 (Recall): Recall of information, basic facts, definitions, simple procedures
-                - Level 2 (Skills/Concepts): Use information, conceptual knowledge, follow procedures, two or more steps
-                - Level 3 (Strategic Thinking): Reasoning, planning, using evidence, complex thinking, justification
-                - Level 4 (Extended Thinking): Complex reasoning, planning, developing, thinking, connecting ideas across content
+                def finish_level(level, result, banked):
+                    entry = run["levels"][level]
+                    with slots[level]:
+                        if result and is_api_error(result):
+                            entry.update(text=result, error=True)
+                            st.error(f"{level}: {result}")
+                            return
+                        if result:
+                            bank_dok_questions(result, settings)
+                        text = "\n\n".join([q["block"] for q in banked] + ([result] if result else []))
+                        text = review_duplicates(dok_level_tool(level), entry["prompt"], text)
+                        entry.update(text=text, error=False)
+                        display_result(level, text)
                 
-                Format each question clearly with headings for the DOK level, question, sample answer, and explanation.
-                """
+                # Serve what we can from the question bank and generate only the shortfall of each level
+                requests, banked_by_level = [], {}
+                reused = 0
+                for level in dok_levels:
+                    banked = []
+                    if use_bank:
+                        banked = find_banked_questions("dok", topic, DOK_QUESTIONS_PER_LEVEL, language=language,
+                                                       grade=grade_level, subject=subject, level=level)
+                    banked_by_level[level] = banked
+                    run["levels"][level] = {"prompt": build_dok_level_prompt(settings, level, DOK_QUESTIONS_PER_LEVEL),
+                                            "text": "", "error": False}
+                    needed = DOK_QUESTIONS_PER_LEVEL - len(banked)
+                    if banked:
+                        get_question_bank().mark_used([q["id"] for q in banked])
+                        reused += len(banked)
+                    if not needed:
+                        finish_level(level, "", banked)
+                    elif banked:
+                        requests.append((level, build_replacement_prompt(build_dok_level_prompt(settings, level, needed),
+                                                                         needed, [q["question"] for q in banked])))
+                    else:
+                        requests.append((level, run["levels"][level]["prompt"]))
+                if reused:
+                    st.info(f"{reused} of {DOK_QUESTIONS_PER_LEVEL * len(dok_levels)} questions reused from the question bank.")
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                # Levels are generated concurrently, so the total wait is close to the slowest level. They are
+                # not cached: earlier questions are reused through the question bank, which skips those the
+                # session has seen, so submitting again gives new questions
+                prompts = [prompt for _, prompt in requests]
+                for i, result in call_gemini_api_concurrent(
+                        prompts, st.session_state['api_key'], max_workers=len(prompts),
+                        config=generation_config("DOK Questions", items=DOK_QUESTIONS_PER_LEVEL)):
+                    level = requests[i][0]
+                    finish_level(level, result, banked_by_level[level])
                 
-                if result:
-                    display_result("Generated DOK Questions", result)
-                    
-                    # Save to history
-                    save_to_history(st.session_state, "DOK Questions", 
-                                   {"topic": topic, "subject": subject, 
-                                    "grade_level": grade_level, "dok_levels": dok_levels_str}, 
-                                   result)
+                # Save to history
+                save_to_history(st.session_state, "DOK Questions", run["inputs"],
+                               "\n\n".join(f"### {level}\n{entry['text']}" for level, entry in run["levels"].items()))
+    
+    run = st.session_state.get('dok_run')
+    if run:
+        if not submit_button:
+            for level, entry in run["levels"].items():
+                if entry["error"]:
+                    st.error(f"{level}: {entry['text']}")
+                else:
+                    display_result(level, entry["text"])
+        
+        # Any level can be regenerated, or retried after an error, on its own
+        columns = st.columns(len(run["levels"]))
+        for column, (level, entry) in zip(columns, run["levels"].items()):
+            with column:
+                label = f"Retry {level}" if entry["error"] else f"Regenerate {level}"
+                if st.button(label, key=f"dok_regenerate_{level}"):
+                    with st.spinner(f"Generating {level} questions..."):
+                        regenerate_dok_level(run, level)
+                    st.rerun()
+        for level in run["levels"]:
+            render_replacement_button(dok_level_tool(level), f"Replacement {level} Questions", profile="DOK Questions")
+
+# One precompiled pattern covers watch, youtu.be, embed, v and shorts URLs
+VIDEO_ID_PATTERN = re.compile(
+    r'(?:https?:\/\/)?(?:www\.|m\.)?'
+    r'(?:youtube\.com\/(?:watch\?(?:[^\s#]*?&)?v=|embed\/|v\/|shorts\/)|youtu\.be\/)'
+    r'([a-zA-Z0-9_-]{11})'
+)
+PLAYLIST_ID_PATTERN = re.compile(r'[?&]list=([a-zA-Z0-9_-]+)')
+# Only the playlist's own entries, not the recommended or sidebar videos on the same page
+PLAYLIST_VIDEO_PATTERN = re.compile(r'"playlistVideoRenderer":\{"videoId":"([a-zA-Z0-9_-]{11})"')
 
-# Helper function to get video ID from URL (keep as is)
+# Helper function to get video ID from URL
 def get_video_id(url):
-    # ... (same code as before) ...
+    """Extract the 11-character video ID from a YouTube URL."""
     if not url:
         return None
-    patterns = [
-        r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/watch\?v=([a-zA-Z0-9_-]{11})',
-        r'(?:https?:\/\/)?(?:www\.)?youtu\.be\/([a-zA-Z0-9_-]{11})',
-        r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/embed\/([a-zA-Z0-9_-]{11})',
-        r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/v\/([a-zA-Z0-9_-]{11})',
-        r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/shorts\/([a-zA-Z0-9_-]{11})'
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def extract_video_ids(text):
+    """
+    Extract every video ID from pasted text, in order and without duplicates.
+
+    Args:
+        text (str): One or more YouTube URLs separated by whitespace or newlines
+
+    Returns:
+        list: Video IDs
+    """
+    return list(dict.fromkeys(VIDEO_ID_PATTERN.findall(text or "")))
+
+# Transcripts rarely change, so they are shared across sessions in an on-disk cache.
+# Negative results (transcripts disabled, none available) are cached for a shorter time.
+TRANSCRIPT_TTL = 30 * 24 * 3600
+NEGATIVE_TRANSCRIPT_TTL = 24 * 3600
+transcript_cache = get_cache("transcripts", ttl=TRANSCRIPT_TTL, max_bytes=200 * 1024 * 1024)
+
+def choose_transcript_language(languages, desired_language_code):
+    """
+    Pick the transcript to use from the list of available ones.
+
+    Preference order: manual transcript in the desired language, generated transcript
+    in the desired language, then any generated transcript, then any manual one.
+
+    Args:
+        languages (list): Dicts with "code" and "generated" keys, in YouTube's order
+        desired_language_code (str): Language code requested by the teacher
+
+    Returns:
+        dict: The chosen entry from ``languages``, or None if there are none
+    """
+    for generated in (False, True):
+        for language in languages:
+            if language["code"] == desired_language_code and language["generated"] == generated:
+                return language
+    for generated in (True, False):
+        for language in languages:
+            if language["generated"] == generated:
+                return language
     return None
 
-# Helper function to get transcript (MODIFIED)
-def get_transcript(video_id, desired_language_code='en'):
-    """Fetches YouTube transcript for a given video ID."""
+def list_transcripts(video_id):
+    """List a video's transcripts with either the 1.x instance API or the older class method."""
+    if hasattr(YouTubeTranscriptApi, "list_transcripts"):
+        return YouTubeTranscriptApi.list_transcripts(video_id)
+    return YouTubeTranscriptApi().list(video_id)
+
+def get_transcript_segments(video_id, desired_language_code='en'):
+    """
+    Fetch the timed segments of a YouTube transcript, using the shared transcript cache.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID
+        desired_language_code (str): Preferred transcript language
+
+    Returns:
+        tuple: (segments, language_code, error) where segments is a list of
+        [start, duration, text] lists, or None with an error message
+    """
     if not video_id:
-        return None, "Invalid video URL provided."
+        return None, None, "Invalid video URL provided."
     try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        transcript_list = None
+        listing_key = make_key("languages", video_id)
+        listing = transcript_cache.get(listing_key)
+        if listing is None:
+            try:
+                transcript_list = list_transcripts(video_id)
+                listing = {"languages": [{"code": t.language_code, "generated": t.is_generated}
+                                         for t in transcript_list],
+                           "error": None}
+            except TranscriptsDisabled:
+                listing = {"languages": [], "error": "Transcripts are disabled for this video."}
+            negative = listing["error"] or not listing["languages"]
+            transcript_cache.set(listing_key, listing, ttl=NEGATIVE_TRANSCRIPT_TTL if negative else None)
 
-        transcript = None
-        available_langs = [] # Store available language codes
+        if listing["error"]:
+            return None, None, listing["error"]
 
-        # Try finding the exact transcript first
-        try:
-            transcript = transcript_list.find_manually_created_transcript([desired_language_code])
-        except NoTranscriptFound:
-            try:
-                transcript = transcript_list.find_generated_transcript([desired_language_code])
-            except NoTranscriptFound:
-                 # If specific language not found, find *any* available transcript
-                 st.warning(f"Transcript in '{desired_language_code}' not found. Trying any available language.")
-                 # Get available language codes safely
-                 available_langs = [t.language_code for t in transcript_list]
-                 if available_langs:
-                     try:
-                        # Try any generated first
-                        transcript = transcript_list.find_generated_transcript(available_langs)
-                     except NoTranscriptFound:
-                         try:
-                            # Try any manual as last resort
-                            transcript = transcript_list.find_manually_created_transcript(available_langs)
-                         except NoTranscriptFound:
-                             pass # transcript remains None if nothing found
-                 
-        # Check if any transcript was actually found
-        if transcript is None:
-             raise NoTranscriptFound(f"No transcript found for this video in any available language.")
-
-        # Fetch the transcript data (list of segments)
-        fetched_segments = transcript.fetch()
-
-        # *** THE FIX IS HERE ***
-        # Use attribute access .text instead of key access ['text']
-        transcript_text = " ".join([entry.text for entry in fetched_segments])
-
-        return transcript_text, None # Return transcript and no error
+        language = choose_transcript_language(listing["languages"], desired_language_code)
+        if language is None:
+            return None, None, "No transcript found for this video in any available language."
+
+        segments_key = make_key("segments", video_id, language["code"], language["generated"])
+        segments = transcript_cache.get(segments_key)
+        if segments is None:
+            if transcript_list is None:
+                transcript_list = list_transcripts(video_id)
+            if language["generated"]:
+                transcript = transcript_list.find_generated_transcript([language["code"]])
+            else:
+                transcript = transcript_list.find_manually_created_transcript([language["code"]])
+            segments = [[entry.start, entry.duration, entry.text] for entry in transcript.fetch()]
+            transcript_cache.set(segments_key, segments)
+
+        return segments, language["code"], None
 
     except TranscriptsDisabled:
-        return None, "Transcripts are disabled for this video."
-    except NoTranscriptFound as e: # Catch the specific exception raised above too
-         return None, str(e) # Return the informative message
+        transcript_cache.set(make_key("languages", video_id),
+                             {"languages": [], "error": "Transcripts are disabled for this video."},
+                             ttl=NEGATIVE_TRANSCRIPT_TTL)
+        return None, None, "Transcripts are disabled for this video."
+    except NoTranscriptFound:
+        return None, None, "No transcript found for this video in any available language."
+    except Exception as e:
+        # Network issues, API changes etc. are not cached so the next submit retries
+        return None, None, f"An unexpected error occurred while fetching the transcript: {type(e).__name__}"
+
+def get_playlist_video_ids(playlist_id):
+    """
+    Get the video IDs of a public playlist (the first page, up to 100 videos).
+
+    Only the page's playlist entries are read, in playlist order. If none can be
+    read (a private playlist, or a change to YouTube's page), an error asks for the
+    video URLs instead.
+
+    Args:
+        playlist_id (str): The playlist ID from the list= URL parameter
+
+    Returns:
+        tuple: (video_ids, error)
+    """
+    playlist_key = make_key("playlist_items", playlist_id)
+    cached = transcript_cache.get(playlist_key)
+    if cached is not None:
+        return cached, None
+    try:
+        request = urllib.request.Request(f"https://www.youtube.com/playlist?list={playlist_id}",
+                                         headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "en"})
+        with urllib.request.urlopen(request, timeout=15) as response:
+            html = response.read().decode("utf-8", errors="replace")
     except Exception as e:
-        # Catch other potential errors (network issues, API changes etc.)
-        # Log the full error for debugging if needed: print(f"Unexpected error: {e}")
-        return None, f"An unexpected error occurred while fetching the transcript: {type(e).__name__}" # Return type of error
+        return None, f"Could not load the playlist: {type(e).__name__}"
+    video_ids = list(dict.fromkeys(PLAYLIST_VIDEO_PATTERN.findall(html)))
+    if not video_ids:
+        return None, ("Could not read the videos of this playlist. Please check that it is public, "
+                      "or paste the video URLs instead, one per line.")
+    transcript_cache.set(playlist_key, video_ids, ttl=NEGATIVE_TRANSCRIPT_TTL)
+    return video_ids, None
+
+# Transcripts longer than this are processed section by section rather than in one prompt
+MAX_TRANSCRIPT_CHARS = 15000
+TRANSCRIPT_CHUNK_CHARS = 12000
+TRANSCRIPT_CHUNK_OVERLAP = 800
+MAX_PARALLEL_CHUNKS = 6
+
+# Batch mode limits
+MAX_BATCH_VIDEOS = 20
+MAX_PARALLEL_VIDEOS = 4
+
+def extract_transcript_notes(segments, api_key, on_progress=None):
+    """
+    Extract key points from each section of a long transcript in parallel.
+
+    Section notes depend only on the transcript text, so they are cached and reused
+    when the teacher changes the question settings for the same video.
+
+    Args:
+        segments (list): [start, duration, text] lists for the whole transcript
+        api_key (str): The API key for Gemini
+        on_progress (callable): Called with (done, total) as sections complete
+
+    Returns:
+        tuple: (notes, error) where notes are the merged notes in video order
+    """
+    chunks = split_into_chunks(segments, TRANSCRIPT_CHUNK_CHARS, TRANSCRIPT_CHUNK_OVERLAP)
+    prompts = []
+    cache_keys = []
+    for chunk in chunks:
+        prompts.append(f"""
+        Below is one section of a YouTube video transcript, from {format_timestamp(chunk['start'])} to {format_timestamp(chunk['end'])}.
+        Extract the key points a teacher would want to ask students about: main ideas, facts, definitions,
+        examples, explanations, arguments and any conclusions. Keep the speaker's specific details and terminology.
 
-# Tool 5: YouTube Video Questions (keep render function as is)
+        Respond with 5-12 concise bullet points in the same language as the transcript. Do not add information
+        that is not in the transcript.
+
+        Transcript section:
+        ```
+        {chunk['text']}
+        ```
+        """)
+        cache_keys.append(make_key("transcript_chunk_notes", MODEL_NAME, chunk["text"]))
+
+    notes = [None] * len(chunks)
+    for done, (index, result) in enumerate(call_gemini_api_concurrent(prompts, api_key, MAX_PARALLEL_CHUNKS, cache_keys), 1):
+        notes[index] = result
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    failed = [i for i, result in enumerate(notes) if is_api_error(result)]
+    if failed:
+        return None, f"Could not process {len(failed)} of {len(chunks)} sections of the transcript. {notes[failed[0]] or ''}"
+
+    return "\n\n".join(
+        f"[{format_timestamp(chunk['start'])} - {format_timestamp(chunk['end'])}]\n{result.strip()}"
+        for chunk, result in zip(chunks, notes)
+    ), None
+
+def build_transcript_source(segments, learning_objectives, focus_str, api_key, on_progress=None):
+    """
+    Choose what part of the transcript goes into the question prompt.
+
+    Short transcripts are used whole. Long ones are reduced to the passages most
+    relevant to the learning objectives, or summarised section by section.
+
+    Args:
+        segments (list): [start, duration, text] lists for the whole transcript
+        learning_objectives (str): The teacher's learning objectives, may be empty
+        focus_str (str): Selected question focus types
+        api_key (str): The API key for Gemini
+        on_progress (callable): Progress callback for section summaries
+
+    Returns:
+        tuple: (source_label, source_text, notices, error) where notices is a list
+        of (level, message) pairs to show the teacher
+    """
+    transcript_index = SegmentIndex(segments)
+    if not transcript_index.text.strip():
+        return None, None, [], "Fetched transcript appears to be empty."
+
+    notices = []
+    selected_passages = []
+    full_transcript = transcript_index.format_passages(transcript_index.passages())
+    if learning_objectives and len(full_transcript) > MAX_TRANSCRIPT_CHARS:
+        # Keep only the parts of the video that match the objectives, within the prompt budget
+        passage_bounds, selected_passages = select_relevant_passages(
+            transcript_index, f"{learning_objectives} {focus_str}", MAX_TRANSCRIPT_CHARS)
+        if selected_passages:
+            notices.append(("info", f"Using the {len(selected_passages)} parts of the video most relevant to your learning objectives."))
+        else:
+            notices.append(("warning", "No part of the transcript matched the learning objectives, so the whole video will be used."))
+
+    if selected_passages:
+        return ("Transcript Excerpts Most Relevant to the Learning Objectives (timestamped, in video order)",
+                transcript_index.format_passages(passage_bounds, selected_passages), notices, None)
+
+    if len(full_transcript) > MAX_TRANSCRIPT_CHARS:
+        # Long videos: extract key points from each section in parallel, then
+        # write the questions from the merged notes instead of truncating
+        transcript_notes, error = extract_transcript_notes(segments, api_key, on_progress)
+        return ("Key Points Extracted From Each Section of the Video (timestamped, in order)",
+                transcript_notes, notices, error)
+
+    return "Video Transcript (timestamped)", full_transcript, notices, None
+
+def build_video_questions_prompt(source_label, source_text, num_questions, language, grade_level,
+                                 focus_str, learning_objectives):
+    """Build the question-writing prompt for one video."""
+    return f"""
+            You are an expert educational content creator. Based **strictly** on the following YouTube video content, create {num_questions} questions in **{language}** suitable for **{grade_level}** students.
+
+            **{source_label}:**
+            ```
+            {source_text}
+            ```
+
+            **Instructions:**
+            1.  Focus on these question types: **{focus_str}**. Ensure a mix if multiple types are selected.
+            2.  Generate questions **directly related to the content, examples, and information presented in the transcript**. Do NOT use external knowledge.
+            3.  {f"Align questions with these Learning Objectives if provided: {learning_objectives}" if learning_objectives else "Focus on understanding the key points of the transcript."}
+            4.  For each question:
+                *   Clearly indicate the intended **Question Type** (e.g., Comprehension, Analysis).
+                *   Write a clear, concise question in **{language}**.
+                *   Provide a **Sample Answer** or **Key Points** expected in a good response, based *only* on the transcript.
+                *   Give the **Timestamp** (from the [m:ss] markers) of the part of the video the question is based on.
+            5.  Consider including a mix of questions suitable for different points (e.g., recalling facts, analyzing arguments, summarizing sections). Suggest if a question is best for 'During Viewing' or 'After Viewing' based on its nature.
+
+            **Output Format:**
+            Present each question clearly numbered, with its type, the timestamp, the question itself, and the sample answer/key points.
+            Example:
+            1.  **Type:** Comprehension (After Viewing)
+                **Timestamp:** 3:45
+                **Question:** According to the video transcript, what are the three main stages discussed?
+                **Answer Key Points:** The transcript mentions Stage A, Stage B, and Stage C as the main stages.
+            """
+
+def generate_video_questions(video_id, settings, api_key, on_stage=None):
+    """
+    Run the whole pipeline for one video: transcript, source selection, questions.
+
+    Safe to run on a worker thread; it does not touch Streamlit elements.
+
+    Args:
+        video_id (str): The YouTube video ID
+        settings (dict): Form settings (language, transcript_lang_code, grade_level,
+            focus_str, num_questions, learning_objectives)
+        api_key (str): The API key for Gemini
+        on_stage (callable): Called with a short status message as each stage starts
+
+    Returns:
+        dict: video_id, result, error, notices, transcript_length and transcript_chars_used
+    """
+    outcome = {"video_id": video_id, "result": None, "error": None, "notices": [],
+               "transcript_length": 0, "transcript_chars_used": 0}
+    if on_stage:
+        on_stage("Fetching transcript...")
+    segments, language_code, error = get_transcript_segments(video_id, settings["transcript_lang_code"])
+    if error:
+        outcome["error"] = f"Failed to get transcript: {error}"
+        return outcome
+    if language_code != settings["transcript_lang_code"]:
+        outcome["notices"].append(("warning", f"Transcript in '{settings['transcript_lang_code']}' not found. "
+                                              f"Using the '{language_code}' transcript instead."))
+
+    if on_stage:
+        on_stage("Reading transcript...")
+    source_label, source_text, notices, error = build_transcript_source(
+        segments, settings["learning_objectives"], settings["focus_str"], api_key)
+    outcome["notices"].extend(notices)
+    if error:
+        outcome["error"] = error
+        return outcome
+
+    if on_stage:
+        on_stage("Writing questions...")
+    prompt = build_video_questions_prompt(source_label, source_text, settings["num_questions"], settings["language"],
+                                          settings["grade_level"], settings["focus_str"], settings["learning_objectives"])
+    result = call_gemini_api(prompt, api_key, generation_config("YouTube Video Questions", items=settings["num_questions"]))
+    if is_api_error(result):
+        outcome["error"] = result or "The AI model did not return a result."
+        return outcome
+    outcome["result"] = result
+    outcome["transcript_length"] = sum(len(segment[2]) + 1 for segment in segments)
+    outcome["transcript_chars_used"] = len(source_text)
+    return outcome
+
+def save_video_questions_to_history(video_url, settings, outcome):
+    """Save one video's questions to history."""
+    save_to_history(st.session_state, "YouTube Video Questions",
+                   {"video_url": video_url,
+                    "grade_level": settings["grade_level"], "question_focus": settings["focus_str"],
+                    "num_questions": settings["num_questions"], "transcript_used": True,
+                    "transcript_length": outcome["transcript_length"],
+                    "transcript_chars_used": outcome["transcript_chars_used"]},
+                   outcome["result"])
+
+def render_youtube_batch(video_input, settings, api_key):
+    """Generate question sets for a playlist or several videos concurrently."""
+    video_ids = extract_video_ids(video_input)
+    playlist_match = PLAYLIST_ID_PATTERN.search(video_input)
+    if playlist_match:
+        with st.spinner("Loading playlist..."):
+            playlist_ids, error = get_playlist_video_ids(playlist_match.group(1))
+        if error and not video_ids:
+            st.error(error)
+            return
+        if error:
+            st.warning(error)
+        else:
+            video_ids = list(dict.fromkeys(video_ids + playlist_ids))
+
+    if not video_ids:
+        st.error("Could not find any valid YouTube video URLs. Please check the links.")
+        return
+    if len(video_ids) > MAX_BATCH_VIDEOS:
+        st.warning(f"Only the first {MAX_BATCH_VIDEOS} of {len(video_ids)} videos will be processed.")
+        video_ids = video_ids[:MAX_BATCH_VIDEOS]
+
+    progress = st.progress(0.0, text=f"Processing {len(video_ids)} videos...")
+    slots = {video_id: st.empty() for video_id in video_ids}
+    stages = {video_id: "Waiting..." for video_id in video_ids}
+    shown = {}
+    succeeded = 0
+
+    # Workers only record their stage; all Streamlit calls happen on this thread
+    def stage_recorder(video_id):
+        return lambda message: stages.__setitem__(video_id, message)
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_VIDEOS) as executor:
+        pending = {executor.submit(copy_context().run, generate_video_questions, video_id, settings, api_key,
+                                   stage_recorder(video_id)): video_id
+                   for video_id in video_ids}
+        while pending:
+            finished, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in finished:
+                video_id = pending.pop(future)
+                outcome = future.result()
+                video_url = f"https://www.youtube.com/watch?v={video_id}"
+                with slots[video_id].container():
+                    if outcome["error"]:
+                        st.error(f"**{video_url}**: {outcome['error']}")
+                    else:
+                        succeeded += 1
+                        for level, message in outcome["notices"]:
+                            getattr(st, level)(message)
+                        display_result(f"Questions for {video_url}", outcome["result"])
+                        save_video_questions_to_history(video_url, settings, outcome)
+            for video_id in pending.values():
+                if shown.get(video_id) != stages[video_id]:
+                    shown[video_id] = stages[video_id]
+                    slots[video_id].markdown(f"⏳ **https://www.youtube.com/watch?v={video_id}** — {stages[video_id]}")
+            done = len(video_ids) - len(pending)
+            progress.progress(done / len(video_ids), text=f"Finished {done} of {len(video_ids)} videos...")
+
+    progress.empty()
+    st.success(f"Generated questions for {succeeded} of {len(video_ids)} videos.")
+
+# Tool 5: YouTube Video Questions
 def render_youtube_video_questions():
-    # ... (rest of your render_youtube_video_questions function remains the same) ...
-    # It correctly calls the modified get_transcript function.
+    """Render the YouTube Video Questions tool."""
     st.markdown("<div class='sub-header'>🎥 YouTube Video Questions</div>", unsafe_allow_html=True)
     st.markdown("Generates questions **based on the actual transcript** of a YouTube video.")
 
+    mode = st.radio("Mode", options=["Single video", "Batch (playlist or several videos)"], horizontal=True)
+    batch_mode = mode != "Single video"
+
     with st.form(key="youtube_questions_form"):
-        video_url = st.text_input("YouTube Video URL", placeholder="e.g., https://www.youtube.com/watch?v=...")
-        # Video topic is less critical now, but can provide context if transcript fails
-        # video_topic = st.text_input("Video Topic/Title (Optional Fallback)", placeholder="e.g., Photosynthesis Explained")
+        if batch_mode:
+            video_input = st.text_area("YouTube Playlist URL or Video URLs (one per line)",
+                                       placeholder="e.g., https://www.youtube.com/playlist?list=...\n"
+                                                   "or one https://www.youtube.com/watch?v=... per line",
+                                       height=150)
+        else:
+            video_input = st.text_input("YouTube Video URL", placeholder="e.g., https://www.youtube.com/watch?v=...")
 
         col1, col2 = st.columns(2)
 
@@ -391,75 +1107,65 @@ def render_youtube_video_questions():
         submit_button = st.form_submit_button(label="Generate Video Questions from Transcript")
 
     if submit_button:
-        if not video_url:
+        if not video_input or not video_input.strip():
             st.error("Please enter a YouTube Video URL.")
             return # Stop processing
 
-        video_id = get_video_id(video_url)
+        settings = {"language": language, "transcript_lang_code": transcript_lang_code,
+                    "grade_level": grade_level, "focus_str": ", ".join(question_focus),
+                    "num_questions": num_questions, "learning_objectives": learning_objectives}
+        api_key = st.session_state.get('api_key')
+
+        if batch_mode:
+            render_youtube_batch(video_input, settings, api_key)
+            return
+
+        video_id = get_video_id(video_input)
         if not video_id:
             st.error("Could not extract a valid Video ID from the URL. Please check the link.")
             return # Stop processing
 
         with st.spinner(f"Fetching transcript for video ID: {video_id}..."):
-            transcript_text, error_msg = get_transcript(video_id, transcript_lang_code)
+            segments, language_code, error_msg = get_transcript_segments(video_id, transcript_lang_code)
 
         if error_msg:
             st.error(f"Failed to get transcript: {error_msg}")
             st.warning("Cannot generate questions based on video content without a transcript.")
             return # Stop processing
 
-        if not transcript_text:
-             st.error("Fetched transcript appears to be empty.")
-             return # Stop processing
-
-        # --- Transcript Fetched Successfully ---
-        with st.spinner("Transcript found! Generating questions based on video content..."):
-            focus_str = ", ".join(question_focus)
-
-            MAX_TRANSCRIPT_CHARS = 15000 # Example limit
-            if len(transcript_text) > MAX_TRANSCRIPT_CHARS:
-                st.warning(f"Transcript is very long ({len(transcript_text)} chars). Truncating to {MAX_TRANSCRIPT_CHARS} characters for analysis.")
-                transcript_text = transcript_text[:MAX_TRANSCRIPT_CHARS]
-
-            prompt = f"""
-            You are an expert educational content creator. Based **strictly** on the following YouTube video transcript, create {num_questions} questions in **{language}** suitable for **{grade_level}** students.
+        if language_code != transcript_lang_code:
+            st.warning(f"Transcript in '{transcript_lang_code}' not found. Using the '{language_code}' transcript instead.")
 
-            **Video Transcript:**
-            ```
-            {transcript_text}
-            ```
+        progress = st.empty()
+        def show_progress(done, total):
+            progress.progress(done / total, text=f"Read {done} of {total} sections of the video...")
 
-            **Instructions:**
-            1.  Focus on these question types: **{focus_str}**. Ensure a mix if multiple types are selected.
-            2.  Generate questions **directly related to the content, examples, and information presented in the transcript**. Do NOT use external knowledge.
-            3.  {f"Align questions with these Learning Objectives if provided: {learning_objectives}" if learning_objectives else "Focus on understanding the key points of the transcript."}
-            4.  For each question:
-                *   Clearly indicate the intended **Question Type** (e.g., Comprehension, Analysis).
-                *   Write a clear, concise question in **{language}**.
-                *   Provide a **Sample Answer** or **Key Points** expected in a good response, based *only* on the transcript.
-            5.  Consider including a mix of questions suitable for different points (e.g., recalling facts, analyzing arguments, summarizing sections). Suggest if a question is best for 'During Viewing' or 'After Viewing' based on its nature.
+        source_label, source_text, notices, error_msg = build_transcript_source(
+            segments, learning_objectives, settings["focus_str"], api_key, show_progress)
+        progress.empty()
+        for level, message in notices:
+            getattr(st, level)(message)
+        if error_msg:
+            st.error(error_msg)
+            return # Stop processing
 
-            **Output Format:**
-            Present each question clearly numbered, with its type, the question itself, and the sample answer/key points.
-            Example:
-            1.  **Type:** Comprehension (After Viewing)
-                **Question:** According to the video transcript, what are the three main stages discussed?
-                **Answer Key Points:** The transcript mentions Stage A, Stage B, and Stage C as the main stages.
-            """
+        # --- Transcript Fetched Successfully ---
+        with st.spinner("Transcript found! Generating questions based on video content..."):
+            prompt = build_video_questions_prompt(source_label, source_text, num_questions, language, grade_level,
+                                                  settings["focus_str"], learning_objectives)
 
             try:
-                 # Assuming call_gemini_api and display_result are defined elsewhere
-                 result = call_gemini_api(prompt, st.session_state.get('api_key')) 
-
-                 if result:
-                     display_result("Generated Video Questions (from Transcript)", result) 
-                     # Assuming save_to_history is defined elsewhere
-                     save_to_history(st.session_state, "YouTube Video Questions",
-                                    {"video_url": video_url,
-                                     "grade_level": grade_level, "question_focus": focus_str,
-                                     "num_questions": num_questions, "transcript_used": True,
-                                     "transcript_length": len(transcript_text)},
-                                    result)
+                 config = generation_config("YouTube Video Questions", items=num_questions)
+                 result = reuse_last_result(st.session_state, prompt) or call_gemini_api(prompt, api_key, config)
+
+                 if result and is_api_error(result):
+                     st.error(result)
+                 elif result:
+                     display_result("Generated Video Questions (from Transcript)", result, prompt, config)
+                     save_video_questions_to_history(video_input, settings,
+                                                     {"result": result,
+                                                      "transcript_length": sum(len(segment[2]) + 1 for segment in segments),
+                                                      "transcript_chars_used": len(source_text)})
                  else:
                       st.error("The AI model did not return a result.")
 
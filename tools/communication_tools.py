@@ -1,12 +1,80 @@
 # tools/communication_tools.py
 import streamlit as st
-from utils.api import call_gemini_api
+from utils.api import (MODEL_NAME, call_gemini_api, call_gemini_api_concurrent, call_gemini_api_variants,
+                       generation_config, is_api_error)
+from utils.cache import make_key
 from utils.data import save_to_history
+from utils.results import clear_result, record_result, reuse_last_result
+from utils.mail_merge import (CUSTOM_WORDING_COLUMN, build_bundle, merge_rows, read_roster,
+                              validate_template)
+from utils.semantic_cache import describe_reuse, find_similar_result, remember_result
 
-def display_result(title, content):
-    """Display the result in a formatted area."""
+def display_result(title, content, prompt=None, config=None):
+    """Display the result in a formatted area and keep it for later reruns."""
     st.markdown(f"### {title}")
     st.markdown(f"<div class='result-area'>{content}</div>", unsafe_allow_html=True)
+    record_result(st.session_state, title, content, prompt, config)
+
+def generate_variants(tool, prompt, count, inputs, remember=None, config=None):
+    """
+    Generate alternative results for one request and keep them for render_variants.
+
+    Nothing is saved to history until the teacher picks a variant.
+
+    Args:
+        tool (str): Name of the tool
+        prompt (str): The prompt to send to the model
+        count (int): Number of variants to generate
+        inputs (dict): Inputs to record in history with the chosen variant
+        remember (tuple): Optional (fields, texts) under which the chosen variant is
+            added to the near-match cache
+        config (types.GenerateContentConfig): Generation settings, from generation_config
+
+    Returns:
+        list: The variants generated (a single error message if none could be)
+    """
+    results = call_gemini_api_variants(prompt, st.session_state['api_key'], count, config)
+    clear_result(st.session_state, tool)
+    variants = st.session_state.setdefault('variants', {})
+    variants.pop(tool, None)
+    if results and not is_api_error(results[0]):
+        variants[tool] = {"inputs": inputs, "results": results, "chosen": None, "remember": remember}
+    return results
+
+def render_variants(tool, title):
+    """
+    Show a tool's variants side by side and record the one the teacher picks.
+
+    Args:
+        tool (str): Name of the tool, as passed to generate_variants
+        title (str): Heading for the variants
+    """
+    entry = st.session_state.get('variants', {}).get(tool)
+    if not entry:
+        return
+    results = entry["results"]
+    st.markdown(f"### {title}")
+    if entry["chosen"] is None:
+        st.caption(f"{len(results)} variants generated in one request. Pick the one you want to keep.")
+    for row in range(0, len(results), 3):
+        columns = st.columns(min(3, len(results) - row))
+        for column, i in zip(columns, range(row, len(results))):
+            with column:
+                chosen = entry["chosen"] == i
+                st.markdown(f"**Variant {i + 1}{' ✅' if chosen else ''}**")
+                st.markdown(f"<div class='result-area'>{results[i]}</div>", unsafe_allow_html=True)
+                if entry["chosen"] is None and st.button(f"Use variant {i + 1}", key=f"choose_variant_{tool}_{i}"):
+                    entry["chosen"] = i
+                    if entry["remember"]:
+                        remember_result(tool, *entry["remember"], results[i])
+
+                    # Save to history
+                    save_to_history(st.session_state, tool,
+                                    {**entry["inputs"], "variant": f"{i + 1} of {len(results)}"},
+                                    results[i])
+                    st.rerun()
+    if entry["chosen"] is not None:
+        st.success(f"Variant {entry['chosen'] + 1} saved to history.")
 
 # Tool 1: Prompt Builder
 def render_prompt_builder():
@@ -52,11 +120,9 @@ def render_prompt_builder():
             
             display_result("Your AI Prompt", final_prompt)
             
-            # Add copy button
-            st.text("")
-            if st.button("Copy to Clipboard"):
-                st.code(final_prompt)
-                st.success("Prompt copied to clipboard! (Use Ctrl+C)")
+            # Code blocks have a copy button, so copying needs no rerun
+            st.code(final_prompt, language=None)
+            st.caption("Use the copy icon in the corner of the box above to copy the prompt.")
             
             # Save to history
             save_to_history(st.session_state, "Prompt Builder", 
@@ -99,6 +165,9 @@ def render_email_responder():
                                placeholder="List specific points you want to address in your response...",
                                height=100)
         
+        variant_count = st.slider("Drafts to Compare", min_value=1, max_value=4, value=1,
+                                  help="Generate several drafts in one request and pick the best one")
+        
         submit_button = st.form_submit_button(label="Generate Email Response")
     
     if submit_button:
@@ -134,17 +203,166 @@ def render_email_responder():
                 Format the email with appropriate spacing and structure.
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                inputs = {"email_scenario": email_scenario, 
+                          "email_content": email_content[:100] + "..." if len(email_content) > 100 else email_content, 
+                          "response_tone": response_tone, "response_length": response_length}
                 
-                if result:
-                    display_result("Generated Email Response", result)
+                if variant_count > 1:
+                    results = generate_variants("Email Responder", prompt, variant_count, inputs,
+                                                config=generation_config("Email Responder", response_length))
+                    if results and is_api_error(results[0]):
+                        st.error(results[0])
+                else:
+                    st.session_state.get('variants', {}).pop("Email Responder", None)
+                    config = generation_config("Email Responder", response_length)
+                    result = reuse_last_result(st.session_state, prompt) or call_gemini_api(
+                        prompt, st.session_state['api_key'], config)
                     
-                    # Save to history
-                    save_to_history(st.session_state, "Email Responder", 
-                                   {"email_scenario": email_scenario, 
-                                    "email_content": email_content[:100] + "..." if len(email_content) > 100 else email_content, 
-                                    "response_tone": response_tone, "response_length": response_length}, 
-                                   result)
+                    if result:
+                        display_result("Generated Email Response", result, prompt, config)
+                        
+                        # Save to history
+                        save_to_history(st.session_state, "Email Responder", inputs, result)
+    
+    render_variants("Email Responder", "Email Response Drafts")
+
+def build_email_template_prompt(email_type, language, grade_level, subject_area, communication_style, key_information):
+    """Build the Email Template Maker prompt."""
+    return f"""
+                Create a {email_type} email in {language} for {grade_level} {subject_area} class using a {communication_style} communication style.
+                
+                Include the following key information:
+                {key_information}
+                
+                Guidelines:
+                1. Create a clear, attention-grabbing subject line
+                2. Use an appropriate greeting/introduction
+                3. Present information in a well-organized, easy-to-scan format
+                4. Include all necessary details (who, what, when, where, why, how)
+                5. Specify any actions recipients need to take and deadlines
+                6. Include contact information for questions or clarifications
+                7. End with an appropriate closing
+                
+                Format the email with appropriate spacing, bullet points, and structure for easy reading.
+                """
+
+def build_mail_merge_prompt(base_prompt, columns, sample, problems=()):
+    """
+    Turn an Email Template Maker prompt into a request for a mail-merge template.
+
+    Args:
+        base_prompt (str): The prompt from build_email_template_prompt
+        columns (dict): Placeholder type by roster column, from read_roster
+        sample (dict): One roster row, to show the model what the values look like
+        problems (list): Problems with a previous attempt, to be fixed
+
+    Returns:
+        str: The prompt
+    """
+    placeholders = "\n".join(
+        (f"- {{{{{name}}}}}" if value_type == "text" else f"- {{{{{name}:{value_type}}}}}")
+        + f" (e.g. {sample.get(name, '')})"
+        for name, value_type in columns.items() if name != CUSTOM_WORDING_COLUMN)
+    fixes = ("\n\nA previous attempt had these problems, which must be fixed:\n"
+             + "\n".join(f"- {problem}" for problem in problems)) if problems else ""
+    return f"""{base_prompt}
+                This email will be sent to every student's family, personalised from the class roster.
+                Write it as a template, using these placeholders exactly as written wherever a
+                student's details belong:
+                {placeholders}
+                
+                Use no other placeholders or brackets. Start with a "Subject:" line. Write only the
+                template, with no notes before or after it.{fixes}
+                """
+
+def build_custom_wording_prompt(email, note, language):
+    """Build the prompt that rewords one merged email following the teacher's note."""
+    return f"""
+                Revise this email in {language} following the teacher's note. Keep the facts, names,
+                numbers and dates, the "Subject:" line and the overall structure; change only the
+                wording the note calls for.
+                
+                Teacher's note: {note}
+                
+                Email:
+                ---
+                {email}
+                ---
+                
+                Return only the revised email.
+                """
+
+def render_mail_merge_result():
+    """Show the last mail merge: the template, any problems, a preview and the download."""
+    merge = st.session_state.get('mail_merge')
+    if not merge:
+        return
+    display_result("Mail-Merge Template", merge["template"])
+    if merge["problems"]:
+        st.error("The template could not be used for the mail merge:\n\n"
+                 + "\n".join(f"- {problem}" for problem in merge["problems"]))
+        return
+    emails = merge["emails"]
+    st.success(f"Merged {len(emails)} emails from one template; {merge['customised']} reworded individually"
+               + (f", {merge['failed']} of them failed and kept the template wording" if merge["failed"] else "") + ".")
+    with st.expander("Preview"):
+        for email in emails[:3]:
+            st.markdown(f"<div class='result-area'>{email}</div>", unsafe_allow_html=True)
+    st.download_button("Download Emails (ZIP)", data=merge["bundle"], file_name="mail_merge_emails.zip",
+                       mime="application/zip", key="mail_merge_download")
+
+def run_mail_merge(base_prompt, roster, language, inputs):
+    """
+    Generate one template for the class and merge it with every roster row.
+
+    The model writes the template once; it is validated against the roster (and
+    regenerated once if its placeholders are wrong), then filled in locally. Only
+    rows with a custom_wording note are sent back to the model.
+
+    Args:
+        base_prompt (str): The Email Template Maker prompt
+        roster (bytes): The uploaded roster CSV
+        language (str): Language of the emails
+        inputs (dict): Inputs to record in history
+    """
+    st.session_state.pop('mail_merge', None)
+    columns, rows = read_roster(roster)
+    if not rows or not any(name != CUSTOM_WORDING_COLUMN for name in columns):
+        st.error("The roster needs a heading row and at least one student row.")
+        return
+
+    api_key = st.session_state['api_key']
+    problems = []
+    for _ in range(2):
+        template = call_gemini_api(build_mail_merge_prompt(base_prompt, columns, rows[0], problems), api_key,
+                                   generation_config("Email Template Maker"))
+        if is_api_error(template):
+            st.error(template or "No response from the model.")
+            return
+        problems = validate_template(template, columns)
+        if not problems:
+            break
+
+    merge = {"template": template, "problems": problems, "emails": [], "customised": 0, "failed": 0, "bundle": None}
+    if not problems:
+        emails = merge_rows(template, rows)
+        custom = [i for i, row in enumerate(rows) if row.get(CUSTOM_WORDING_COLUMN)]
+        prompts = [build_custom_wording_prompt(emails[i], rows[i][CUSTOM_WORDING_COLUMN], language) for i in custom]
+        cache_keys = [make_key("mail_merge_custom", MODEL_NAME, prompt) for prompt in prompts]
+        for index, result in call_gemini_api_concurrent(prompts, api_key, cache_keys=cache_keys,
+                                                        config=generation_config("Email Template Maker")):
+            if is_api_error(result):
+                merge["failed"] += 1
+            else:
+                emails[custom[index]] = result.strip()
+        label_column = next((name for name in ("student_name", "name", "parent_name") if name in columns),
+                            next((name for name, value_type in columns.items() if value_type == "text"), None))
+        merge.update(emails=emails, customised=len(custom), bundle=build_bundle(rows, emails, label_column))
+
+        # Save to history
+        save_to_history(st.session_state, "Email Template Maker (Mail Merge)",
+                        {**inputs, "rows": len(rows), "customised": len(custom)}, template)
+    st.session_state['mail_merge'] = merge
 
 # Tool 3: Email Template Maker
 def render_email_template_maker():
@@ -175,42 +393,44 @@ def render_email_template_maker():
                                      placeholder="List the important details, dates, requirements, etc. to include...",
                                      height=150)
         
+        with st.expander("Mail merge: one email per student"):
+            mail_merge = st.checkbox("Personalise the email for every student in a class roster")
+            roster_file = st.file_uploader("Class Roster (CSV)", type=["csv"],
+                                           help="One row per student, with a heading row (e.g. Student Name, "
+                                                "Parent Name, Mark, Comment). Add a Custom Wording column with a "
+                                                "note for students whose email needs rewording; only those are "
+                                                "sent back to the AI.")
+        
         submit_button = st.form_submit_button(label="Generate Email Template")
     
     if submit_button:
         if not key_information:
             st.error("Please provide key information to include in the email.")
+        elif mail_merge and roster_file is None:
+            st.error("Please upload a class roster for the mail merge.")
         else:
             with st.spinner("Generating email template..."):
-                prompt = f"""
-                Create a {email_type} email in {language} for {grade_level} {subject_area} class using a {communication_style} communication style.
-                
-                Include the following key information:
-                {key_information}
+                prompt = build_email_template_prompt(email_type, language, grade_level, subject_area,
+                                                     communication_style, key_information)
+                inputs = {"email_type": email_type, "grade_level": grade_level, 
+                          "subject_area": subject_area, "communication_style": communication_style,
+                          "key_information": key_information[:100] + "..." if len(key_information) > 100 else key_information}
                 
-                Guidelines:
-                1. Create a clear, attention-grabbing subject line
-                2. Use an appropriate greeting/introduction
-                3. Present information in a well-organized, easy-to-scan format
-                4. Include all necessary details (who, what, when, where, why, how)
-                5. Specify any actions recipients need to take and deadlines
-                6. Include contact information for questions or clarifications
-                7. End with an appropriate closing
-                
-                Format the email with appropriate spacing, bullet points, and structure for easy reading.
-                """
-                
-                result = call_gemini_api(prompt, st.session_state['api_key'])
-                
-                if result:
-                    display_result("Generated Email Template", result)
+                if mail_merge:
+                    run_mail_merge(prompt, roster_file.getvalue(), language, inputs)
+                else:
+                    st.session_state.pop('mail_merge', None)
+                    config = generation_config("Email Template Maker")
+                    result = reuse_last_result(st.session_state, prompt) or call_gemini_api(
+                        prompt, st.session_state['api_key'], config)
                     
-                    # Save to history
-                    save_to_history(st.session_state, "Email Template Maker", 
-                                   {"email_type": email_type, "grade_level": grade_level, 
-                                    "subject_area": subject_area, "communication_style": communication_style,
-                                    "key_information": key_information[:100] + "..." if len(key_information) > 100 else key_information}, 
-                                   result)
+                    if result:
+                        display_result("Generated Email Template", result, prompt, config)
+                        
+                        # Save to history
+                        save_to_history(st.session_state, "Email Template Maker", inputs, result)
+    
+    render_mail_merge_result()
 
 # Tool 4: Song Generator
 def render_song_generator():
@@ -243,6 +463,9 @@ def render_song_generator():
         melody_note = st.text_input("Melody Note (Optional)", 
                                  placeholder="e.g., 'Sung to the tune of Twinkle Twinkle' or 'Original melody'")
         
+        variant_count = st.slider("Versions to Compare", min_value=1, max_value=4, value=1,
+                                  help="Generate several versions in one request and pick the best one")
+        
         submit_button = st.form_submit_button(label="Generate Educational Song")
     
     if submit_button:
@@ -273,14 +496,35 @@ def render_song_generator():
                 4. Brief explanation of how the song addresses key learning objectives
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                fields = {"grade_level": grade_level, "song_style": song_style, "song_length": song_length,
+                          "language": language}
+                texts = {"topic": topic, "key_concepts": key_concepts, "melody_note": melody_note}
+                inputs = {"topic": topic, "grade_level": grade_level, 
+                          "song_style": song_style, "song_length": song_length,
+                          "key_concepts": key_concepts}
                 
-                if result:
-                    display_result("Generated Educational Song", result)
+                if variant_count > 1:
+                    # Asking for alternatives means a saved near-match is not what the teacher wants
+                    results = generate_variants("Song Generator", prompt, variant_count, inputs, (fields, texts),
+                                                generation_config("Song Generator", song_length))
+                    if results and is_api_error(results[0]):
+                        st.error(results[0])
+                else:
+                    st.session_state.get('variants', {}).pop("Song Generator", None)
+                    config = generation_config("Song Generator", song_length)
+                    match = find_similar_result(st.session_state, "Song Generator", fields, texts)
+                    if match:
+                        result = match["result"]
+                    else:
+                        result = call_gemini_api(prompt, st.session_state['api_key'], config)
+                        remember_result("Song Generator", fields, texts, result)
                     
-                    # Save to history
-                    save_to_history(st.session_state, "Song Generator", 
-                                   {"topic": topic, "grade_level": grade_level, 
-                                    "song_style": song_style, "song_length": song_length,
-                                    "key_concepts": key_concepts}, 
-                                   result)
+                    if result:
+                        display_result("Generated Educational Song", result, prompt, config)
+                        if match:
+                            st.info(describe_reuse(match))
+                        
+                        # Save to history
+                        save_to_history(st.session_state, "Song Generator", inputs, result)
+    
+    render_variants("Song Generator", "Song Versions")
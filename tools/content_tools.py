@@ -1,13 +1,80 @@
 # tools/content_tools.py
+from functools import partial
 import streamlit as st
-import math
-from utils.api import call_gemini_api
+from utils.api import MODEL_NAME, call_gemini_api, call_gemini_api_concurrent, generation_config, is_api_error
+from utils.cache import make_key
 from utils.data import load_educational_data, save_to_history
+from utils.results import record_result
+from utils.pipeline import Pipeline, PipelineStep
+from utils.semantic_cache import describe_reuse, find_similar_result, remember_result
+from utils.readability import (TOLERANCES, analyse_text, check_readability, describe_deviations, format_metrics,
+                               lexile_targets, readability_distance, target_ranges)
+from utils.unit_plan import parse_unit_outline
 
-def display_result(title, content):
-    """Display the result in a formatted area."""
+def display_result(title, content, prompt=None, config=None):
+    """Display the result in a formatted area and keep it for later reruns."""
     st.markdown(f"### {title}")
     st.markdown(f"<div class='result-area'>{content}</div>", unsafe_allow_html=True)
+    record_result(st.session_state, title, content, prompt, config)
+
+# Flesch-Kincaid grade range expected for each Text Rewriter reading level
+READING_LEVEL_GRADES = {
+    "Elementary (Grades 1-5)": (1, 5),
+    "Middle School (Grades 6-8)": (6, 8),
+    "High School (Grades 9-12)": (9, 12),
+    "College": (13, 16),
+    "Advanced": (16, 20),
+}
+
+def verify_readability(text, ranges, language, api_key, config=None):
+    """
+    Check a generated text against readability ranges and revise it once if it is off.
+
+    The revision asks only for the specific changes needed (e.g. shorter
+    sentences), and is kept only if it lands closer to the targets. Texts that
+    are not in English are measured but not revised, since the formulas are
+    calibrated for English.
+
+    Args:
+        text (str): The generated text
+        ranges (dict): Acceptable (low, high) range by metric, from target_ranges
+        language (str): Language of the text
+        api_key (str): The API key for Gemini
+        config (types.GenerateContentConfig): Generation settings of the tool that wrote the text
+
+    Returns:
+        tuple: (text, metrics, deviations, revised)
+    """
+    metrics = analyse_text(text)
+    deviations = check_readability(metrics, ranges)
+    if not deviations or language != "English":
+        return text, metrics, deviations, False
+
+    prompt = f"""
+    Revise the following text so that it meets its target reading level. Make only these changes:
+    {describe_deviations(deviations)}
+
+    Keep the title, the content, the key vocabulary and the formatting. Return only the revised text.
+
+    ---
+    {text}
+    ---
+    """
+    revision = call_gemini_api(prompt, api_key, config)
+    if is_api_error(revision):
+        return text, metrics, deviations, False
+    revised_metrics = analyse_text(revision)
+    revised_deviations = check_readability(revised_metrics, ranges)
+    if readability_distance(revised_deviations) < readability_distance(deviations):
+        return revision, revised_metrics, revised_deviations, True
+    return text, metrics, deviations, False
+
+def show_readability(metrics, deviations, revised):
+    """Display readability scores and whether the text meets its targets."""
+    note = " (revised to meet the target reading level)" if revised else ""
+    st.info(f"Readability{note}: {format_metrics(metrics)}")
+    if deviations:
+        st.warning("Still outside the target range:\n" + describe_deviations(deviations))
 
 # Tool 1: Text Generator
 def render_text_generator():
@@ -40,10 +107,13 @@ def render_text_generator():
         else:
             with st.spinner("Generating text..."):
                 # Calculate reading level parameters based on lexile
-                readingEase = max(0, min(100, -0.0721 * lexile_score + 120))
-                avgSyllables = 1 + 0.2 * math.log(lexile_score / 100)
-                complexWordPct = min(0.4, 0.05 * math.log(lexile_score))
-                avgSentenceLength = (206.835 - readingEase - 84.6 * avgSyllables) / 1.015
+                targets = lexile_targets(lexile_score)
+                readingEase = targets["reading_ease"]
+                avgSyllables = targets["syllables_per_word"]
+                complexWordPct = targets["complex_word_pct"] / 100
+                avgSentenceLength = targets["avg_sentence_length"]
+                # Reading ease combines sentence length and word length, so it is the only score checked
+                ranges = target_ranges(targets, ["reading_ease"])
                 
                 # Format vocabulary
                 vocab_list = [word.strip() for word in vocabulary.split(",")] if vocabulary else []
@@ -65,20 +135,105 @@ def render_text_generator():
                 Ensure the content is age-appropriate and maintains a natural flow while adhering to the metrics.
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                # Reuse the text of a near-identical earlier request (e.g. the same topic, differently typed)
+                fields = {"lexile_score": lexile_score, "subject": subject, "text_type": text_type, "language": language}
+                texts = {"topic": topic, "vocabulary": vocabulary}
+                match = find_similar_result(st.session_state, "Text Generator", fields, texts)
+                config = generation_config("Text Generator")
+                result = match["result"] if match else call_gemini_api(prompt, st.session_state['api_key'], config)
                 
                 if result:
-                    display_result("Generated Text", result)
+                    metrics, deviations, revised = None, [], False
+                    if match:
+                        metrics = analyse_text(result)
+                        deviations = check_readability(metrics, ranges)
+                    elif not is_api_error(result):
+                        # Check the text against the reading metrics and revise it once if it is off
+                        result, metrics, deviations, revised = verify_readability(
+                            result, ranges, language, st.session_state['api_key'], config)
+                        remember_result("Text Generator", fields, texts, result)
+                    
+                    display_result("Generated Text", result, prompt, config)
+                    if match:
+                        st.info(describe_reuse(match))
                     
                     # Calculate approximate word count
                     word_count = len(result.split())
                     st.info(f"Approximate word count: {word_count}")
+                    if metrics:
+                        show_readability(metrics, deviations, revised)
                     
                     # Save to history
                     save_to_history(st.session_state, "Text Generator", 
                                    {"lexile_score": lexile_score, "topic": topic, 
                                     "subject": subject, "text_type": text_type, "vocabulary": vocabulary}, 
-                                   result)
+                                   result, metrics=metrics)
+
+def build_rewrite_prompt(original_text, reading_level, style, purpose, language):
+    """Build the Text Rewriter prompt for one reading level and language."""
+    return f"""
+    Rewrite the following text for {reading_level} students in a {style} style for {purpose} purposes in {language}:
+
+    ---
+    {original_text}
+    ---
+
+    Guidelines:
+    1. Maintain the core meaning and key information
+    2. Adjust vocabulary and sentence complexity to match {reading_level} level
+    3. Use {style} tone and structure
+    4. Format the text to support {purpose}
+    5. Ensure the rewritten text is clear, coherent, and effective for the target audience
+    """
+
+def render_differentiated_rewrites(original_text, reading_levels, languages, style, purpose):
+    """
+    Rewrite one text for several reading levels (and languages) at once.
+
+    The rewrites run concurrently and are shown side by side as each finishes.
+    Each one is cached on its own under (text, level, style, purpose, language),
+    so adding a level later only generates the new version.
+
+    Returns:
+        dict: Rewritten text by (reading_level, language), for successful rewrites
+    """
+    variants = [(level, language) for language in languages for level in reading_levels]
+    prompts = [build_rewrite_prompt(original_text, level, style, purpose, language) for level, language in variants]
+    text_hash = make_key(original_text)
+    cache_keys = [make_key("rewrite", MODEL_NAME, text_hash, level, style, purpose, language)
+                  for level, language in variants]
+
+    # At most three versions per row so each stays readable
+    slots = []
+    for row_start in range(0, len(variants), 3):
+        columns = st.columns(3)
+        for column, (level, language) in zip(columns, variants[row_start:row_start + 3]):
+            with column:
+                st.markdown(f"**{level}**" + (f" · {language}" if len(languages) > 1 else ""))
+                slots.append(st.empty())
+    for slot in slots:
+        slot.info("Rewriting...")
+
+    results = {}
+    with st.spinner(f"Rewriting for {len(variants)} levels..."):
+        for index, result in call_gemini_api_concurrent(
+                prompts, st.session_state['api_key'], max_workers=5, cache_keys=cache_keys,
+                config=generation_config("Text Rewriter", items=len(original_text.split()))):
+            level, language = variants[index]
+            if is_api_error(result):
+                slots[index].error(result)
+                continue
+            results[variants[index]] = result
+            record_result(st.session_state, f"{level} ({language})", result)
+            with slots[index].container():
+                st.markdown(f"<div class='result-area'>{result}</div>", unsafe_allow_html=True)
+                if language == "English":
+                    metrics = analyse_text(result)
+                    low, high = READING_LEVEL_GRADES[level]
+                    on_target = low - TOLERANCES["grade"] <= metrics["grade"] <= high + TOLERANCES["grade"]
+                    st.caption(f"Grade level {metrics['grade']} · Reading ease {metrics['reading_ease']}"
+                               + ("" if on_target else f" · outside grades {low}-{high}"))
+    return results
 
 # Tool 2: Text Rewriter
 def render_text_rewriter():
@@ -93,9 +248,7 @@ def render_text_rewriter():
         col1, col2 = st.columns(2)
         
         with col1:
-            reading_level = st.selectbox("Target Reading Level", 
-                                      options=["Elementary (Grades 1-5)", "Middle School (Grades 6-8)", 
-                                               "High School (Grades 9-12)", "College", "Advanced"])
+            reading_level = st.selectbox("Target Reading Level", options=list(READING_LEVEL_GRADES))
             language = st.selectbox("Language", options=["English", "Bahasa Melayu"])
         
         with col2:
@@ -104,32 +257,49 @@ def render_text_rewriter():
             purpose = st.selectbox("Purpose", 
                                  options=["Instruction", "Explanation", "Retention", "Engagement", "Assessment"])
         
+        with st.expander("Differentiate for a mixed-ability class"):
+            differentiate = st.checkbox("Rewrite for several reading levels at once", value=False)
+            differentiated_levels = st.multiselect("Reading Levels", options=list(READING_LEVEL_GRADES),
+                                                   default=list(READING_LEVEL_GRADES)[:3])
+            both_languages = st.checkbox("In both English and Bahasa Melayu", value=False)
+        
         submit_button = st.form_submit_button(label="Rewrite Text")
     
     if submit_button:
         if not original_text:
             st.error("Please enter text to rewrite.")
+        elif differentiate:
+            if not differentiated_levels:
+                st.error("Please choose at least one reading level.")
+            else:
+                languages = ["English", "Bahasa Melayu"] if both_languages else [language]
+                results = render_differentiated_rewrites(original_text, differentiated_levels, languages, style, purpose)
+                
+                if results:
+                    # Save to history
+                    save_to_history(st.session_state, "Text Rewriter (Differentiated)", 
+                                   {"original_text": original_text[:100] + "..." if len(original_text) > 100 else original_text, 
+                                    "reading_levels": differentiated_levels, "languages": languages,
+                                    "style": style, "purpose": purpose}, 
+                                   "\n\n".join(f"### {level} ({variant_language})\n{text}"
+                                               for (level, variant_language), text in results.items()))
         else:
             with st.spinner("Rewriting text..."):
-                prompt = f"""
-                Rewrite the following text for {reading_level} students in a {style} style for {purpose} purposes in {language}:
+                prompt = build_rewrite_prompt(original_text, reading_level, style, purpose, language)
 
-                ---
-                {original_text}
-                ---
-
-                Guidelines:
-                1. Maintain the core meaning and key information
-                2. Adjust vocabulary and sentence complexity to match {reading_level} level
-                3. Use {style} tone and structure
-                4. Format the text to support {purpose}
-                5. Ensure the rewritten text is clear, coherent, and effective for the target audience
-                """
-                
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                config = generation_config("Text Rewriter", items=len(original_text.split()))
+                result = call_gemini_api(prompt, st.session_state['api_key'], config)
                 
                 if result:
-                    display_result("Rewritten Text", result)
+                    metrics, deviations, revised = None, [], False
+                    if not is_api_error(result):
+                        # Check the rewrite reads at the target grade and revise it once if it does not
+                        low, high = READING_LEVEL_GRADES[reading_level]
+                        ranges = {"grade": (low - TOLERANCES["grade"], high + TOLERANCES["grade"])}
+                        result, metrics, deviations, revised = verify_readability(
+                            result, ranges, language, st.session_state['api_key'], config)
+                    
+                    display_result("Rewritten Text", result, prompt, config)
                     
                     # Calculate change in complexity
                     original_words = len(original_text.split())
@@ -137,13 +307,18 @@ def render_text_rewriter():
                     word_diff = ((new_words - original_words) / original_words) * 100 if original_words > 0 else 0
                     
                     st.info(f"Original: ~{original_words} words | New: ~{new_words} words | Change: {word_diff:.1f}%")
+                    if metrics:
+                        original_metrics = analyse_text(original_text)
+                        st.info(f"Grade level: {original_metrics['grade']} → {metrics['grade']} | "
+                                f"Reading ease: {original_metrics['reading_ease']} → {metrics['reading_ease']}")
+                        show_readability(metrics, deviations, revised)
                     
                     # Save to history
                     save_to_history(st.session_state, "Text Rewriter", 
                                    {"original_text": original_text[:100] + "..." if len(original_text) > 100 else original_text, 
                                     "reading_level": reading_level, 
                                     "style": style, "purpose": purpose}, 
-                                   result)
+                                   result, metrics=metrics)
 
 # Tool 3: Academic Content Generator
 def render_academic_content():
@@ -197,10 +372,20 @@ def render_academic_content():
                 Format your response with a clear title, introduction, body with appropriate sections, and conclusion.
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                fields = {"content_type": content_type, "grade_level": grade_level, "subject": subject, "language": language}
+                texts = {"topic": topic, "key_concepts": key_concepts}
+                config = generation_config("Academic Content")
+                match = find_similar_result(st.session_state, "Academic Content", fields, texts)
+                if match:
+                    result = match["result"]
+                else:
+                    result = call_gemini_api(prompt, st.session_state['api_key'], config)
+                    remember_result("Academic Content", fields, texts, result)
                 
                 if result:
-                    display_result("Generated Academic Content", result)
+                    display_result("Generated Academic Content", result, prompt, config)
+                    if match:
+                        st.info(describe_reuse(match))
                     
                     # Save to history
                     save_to_history(st.session_state, "Academic Content", 
@@ -209,6 +394,32 @@ def render_academic_content():
                                     "key_concepts": key_concepts}, 
                                    result)
 
+def build_lesson_plan_prompt(subject, duration, grade_level, lesson_objective, student_action,
+                             resources, activity_focus, strategies_text, language):
+    """Build the Lesson Plan Generator prompt (also used to expand lessons of a unit plan)."""
+    return f"""
+    You are an experienced {subject} teacher. Create a detailed {duration}-minute lesson plan for {grade_level} students with this objective:
+
+    OBJECTIVE: {lesson_objective}
+    STUDENT ACTION: {student_action}
+
+    Resources available: {", ".join(resources)}
+    Activity focus: {", ".join(activity_focus)}
+
+    Please incorporate and adapt these teaching strategies into your plan:
+    {strategies_text}
+
+    Format your lesson plan with these clear sections:
+    1. 📌 **Starter**: An engaging activity to begin the lesson (5-10 minutes)
+    2. 🧠 **Instruction**: How you'll present the main content (15-20 minutes)
+    3. 📝 **Assessment**: How you'll check understanding during the lesson
+    4. 🗣️ **Dialogic**: How students will discuss and engage with the content
+    5. ✅ **Consolidation**: How you'll summarize and conclude the lesson
+    6. 🚀 **S2S**: Suggestions for supporting struggling students and extending learning for advanced students
+
+    For each section, provide specific timings, detailed instructions, and necessary resources. The plan should be practical, easy to follow, and written in {language}.
+    """
+
 # Tool 4: Lesson Plan Generator
 def render_lesson_plan_generator():
     """Render the Lesson Plan Generator tool."""
@@ -269,33 +480,25 @@ def render_lesson_plan_generator():
                 
                 strategies_text = "\n".join(strategy_prompts)
                 
-                prompt = f"""
-                You are an experienced {subject} teacher. Create a detailed {duration}-minute lesson plan for {grade_level} students with this objective:
-
-                OBJECTIVE: {lesson_objective}
-                STUDENT ACTION: {student_action}
-
-                Resources available: {", ".join(resources)}
-                Activity focus: {", ".join(activity_focus)}
-
-                Please incorporate and adapt these teaching strategies into your plan:
-                {strategies_text}
-
-                Format your lesson plan with these clear sections:
-                1. 📌 **Starter**: An engaging activity to begin the lesson (5-10 minutes)
-                2. 🧠 **Instruction**: How you'll present the main content (15-20 minutes)
-                3. 📝 **Assessment**: How you'll check understanding during the lesson
-                4. 🗣️ **Dialogic**: How students will discuss and engage with the content
-                5. ✅ **Consolidation**: How you'll summarize and conclude the lesson
-                6. 🚀 **S2S**: Suggestions for supporting struggling students and extending learning for advanced students
-
-                For each section, provide specific timings, detailed instructions, and necessary resources. The plan should be practical, easy to follow, and written in {language}.
-                """
+                prompt = build_lesson_plan_prompt(subject, duration, grade_level, lesson_objective, student_action,
+                                                  resources, activity_focus, strategies_text, language)
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                fields = {"duration": duration, "grade_level": grade_level, "subject": subject, "language": language,
+                          "resources": resources, "activity_focus": activity_focus,
+                          "strategies": [strategy_type for strategy_type, include in include_strategies.items() if include]}
+                texts = {"lesson_objective": lesson_objective, "student_action": student_action}
+                config = generation_config("Lesson Plan Generator")
+                match = find_similar_result(st.session_state, "Lesson Plan Generator", fields, texts)
+                if match:
+                    result = match["result"]
+                else:
+                    result = call_gemini_api(prompt, st.session_state['api_key'], config)
+                    remember_result("Lesson Plan Generator", fields, texts, result)
                 
                 if result:
-                    display_result("Generated Lesson Plan", result)
+                    display_result("Generated Lesson Plan", result, prompt, config)
+                    if match:
+                        st.info(describe_reuse(match))
                     
                     # Save to history
                     save_to_history(st.session_state, "Lesson Plan Generator", 
@@ -303,6 +506,158 @@ def render_lesson_plan_generator():
                                     "duration": duration, "grade_level": grade_level, "subject": subject}, 
                                    result)
 
+# Unit plans are generated in two stages: a compact outline, then every week
+# (and optionally every lesson) expanded from it concurrently
+def build_unit_outline_prompt(params, outputs):
+    """Prompt for the structured unit outline that the weeks and lessons are expanded from."""
+    lesson_lines = "\n".join(f"    LESSON {lesson}: [Lesson title] | Objective: [Students will ...] | Student Action: [What students do]"
+                              for lesson in range(1, params['lessons_per_week'] + 1))
+    return f"""
+    Create a compact outline for a unit titled "{params['unit_title']}" in {params['subject']} for {params['grade_level']} students.
+    The unit spans exactly {params['weeks']} week(s) with exactly {params['lessons_per_week']} lesson(s) per week.
+    Write the content in {params['language']}, but keep the labels below (OVERVIEW, WEEK, LESSON, ...) in English exactly as shown.
+
+    Learning Objectives:
+    {params['learning_objectives']}
+
+    Resources Available:
+    {params['key_resources'] or "Standard classroom resources"}
+
+    Use exactly this format, one item per line, with nothing before or after it:
+    OVERVIEW: [2-3 sentences on the big ideas of the unit]
+    ESSENTIAL QUESTIONS: [2-3 essential questions separated by semicolons]
+    SUMMATIVE ASSESSMENT: [One sentence describing the end-of-unit assessment]
+    WEEK 1: [Week title]
+    FOCUS: [One sentence on what students learn this week]
+{lesson_lines}
+
+    Repeat the WEEK, FOCUS and LESSON lines for every week up to week {params['weeks']}.
+    """
+
+def build_unit_week_prompt(week, params, outputs):
+    """Prompt expanding one week of the unit outline into a weekly plan."""
+    outline_week = parse_unit_outline(outputs['outline'])["weeks"].get(week, {})
+    lessons = ", ".join(lesson["title"] for _, lesson in sorted(outline_week.get("lessons", {}).items()))
+    return f"""
+    You are planning week {week} of a {params['weeks']}-week {params['subject']} unit titled "{params['unit_title']}" for {params['grade_level']} students.
+    Write the plan in {params['language']}.
+
+    Unit outline:
+    ---
+    {outputs['outline']}
+    ---
+
+    Expand week {week}{f" ({outline_week['title']})" if outline_week.get('title') else ""} into a detailed weekly plan. Include:
+
+    1. Week focus and success criteria
+    2. A short plan for each lesson{f" ({lessons})" if lessons else ""}: key activities and how it builds on the lesson before
+    3. Formative assessment checkpoints
+    4. Differentiation strategies for struggling and advanced learners
+    5. Key vocabulary for the week
+    6. Materials and resources needed (available: {params['key_resources'] or "standard classroom resources"})
+
+    Stay consistent with the outline. Format the plan clearly with headings and bullet points.
+    """
+
+def build_unit_lesson_prompt(week, lesson, params, outputs):
+    """Prompt expanding one lesson of the unit outline into a full lesson plan (as the Lesson Plan Generator)."""
+    outline_week = parse_unit_outline(outputs['outline'])["weeks"].get(week, {})
+    outline_lesson = outline_week.get("lessons", {}).get(lesson, {})
+    objective = outline_lesson.get("objective") or outline_lesson.get("title") or \
+        f"Lesson {lesson} of week {week} of the unit \"{params['unit_title']}\""
+    student_action = outline_lesson.get("student_action") or "the activities planned for this lesson in the unit outline"
+
+    # One strategy of each type, rotated through the lessons so the unit varies but prompts stay stable
+    strategies_df, _ = load_educational_data()
+    position = (week - 1) * params['lessons_per_week'] + lesson - 1
+    strategies_text = "\n".join(f"{strategy_type}: {strategies_df[strategy_type].iloc[position % len(strategies_df)]}"
+                                for strategy_type in strategies_df.columns)
+
+    return build_lesson_plan_prompt(params['subject'], params['lesson_minutes'], params['grade_level'], objective,
+                                    student_action, [params['key_resources'] or "Standard classroom resources"],
+                                    [], strategies_text, params['language'])
+
+def build_unit_plan_pipeline(weeks, lessons_per_week, expand_lessons):
+    """
+    Build the unit plan pipeline: the outline, then each week and (optionally) each lesson.
+
+    Weeks and lessons depend only on the outline, so they are generated concurrently
+    and each can be regenerated on its own.
+
+    Args:
+        weeks (int): Number of weeks in the unit
+        lessons_per_week (int): Number of lessons per week
+        expand_lessons (bool): Whether to write a full lesson plan for every lesson
+
+    Returns:
+        Pipeline: Steps "outline", "week_<n>" and "week_<n>_lesson_<m>", in display order
+    """
+    def unit_config(params):
+        return generation_config("Unit Plan Generator")
+
+    def lesson_config(params):
+        return generation_config("Lesson Plan Generator")
+
+    steps = [PipelineStep("outline", "Unit Outline", build_unit_outline_prompt, config=unit_config)]
+    for week in range(1, weeks + 1):
+        steps.append(PipelineStep(f"week_{week}", f"Week {week}", partial(build_unit_week_prompt, week),
+                                  depends_on=["outline"], config=unit_config))
+        if expand_lessons:
+            for lesson in range(1, lessons_per_week + 1):
+                steps.append(PipelineStep(f"week_{week}_lesson_{lesson}", f"Week {week} · Lesson {lesson}",
+                                          partial(build_unit_lesson_prompt, week, lesson), depends_on=["outline"],
+                                          config=lesson_config))
+    return Pipeline("unit_plan", steps)
+
+def unit_plan_pipeline(run):
+    """Rebuild the pipeline of a unit plan run kept in session state."""
+    params = run["params"]
+    return build_unit_plan_pipeline(params["weeks"], params["lessons_per_week"], params["expand_lessons"])
+
+def show_unit_plan_step(pipeline, name, entry):
+    """Display one step of a unit plan; lesson plans are collapsed under their week."""
+    title = pipeline.steps[name].title
+    if entry["error"]:
+        st.error(f"{title}: {entry['text']}")
+    elif "_lesson_" in name:
+        with st.expander(title):
+            st.markdown(entry["text"])
+    else:
+        display_result(title, entry["text"])
+
+def run_unit_plan(run, force=(), slots=None):
+    """
+    Generate the steps of a unit plan run, reusing cached steps.
+
+    Args:
+        run (dict): The run kept in session state by render_unit_plan_generator
+        force (list): Steps to generate again (with every step that depends on them)
+        slots (dict): Optional placeholder per step, filled as each step finishes
+
+    Returns:
+        int: Number of steps reused from the cache
+    """
+    pipeline = unit_plan_pipeline(run)
+    reused = 0
+    for event in pipeline.run(run["params"], st.session_state['api_key'], force=force):
+        name = event["step"]
+        if event["status"] == "skipped":
+            run["steps"][name] = {"text": "Skipped because the outline could not be generated.", "error": True}
+        else:
+            run["steps"][name] = {"text": event["result"], "error": event["status"] == "error"}
+            reused += event["status"] == "cached"
+        if slots is not None:
+            with slots[name].container():
+                show_unit_plan_step(pipeline, name, run["steps"][name])
+    return reused
+
+def unit_plan_text(run, names=None):
+    """Join the steps of a unit plan run into one markdown document, in display order."""
+    pipeline = unit_plan_pipeline(run)
+    return "\n\n".join(f"### {pipeline.steps[name].title}\n{run['steps'][name]['text']}"
+                       for name in pipeline.order
+                       if name in run["steps"] and not run["steps"][name]["error"] and (names is None or name in names))
+
 # Tool 5: Unit Plan Generator
 def render_unit_plan_generator():
     """Render the Unit Plan Generator tool."""
@@ -319,11 +674,13 @@ def render_unit_plan_generator():
                                           "History", "Geography", "Art", "Music", "Physical Education", "Other"])
             grade_level = st.selectbox("Grade Level", 
                                      options=["Primary (1-3)", "Primary (4-6)", "Secondary (7-9)", "Secondary (10-12)"])
+            lessons_per_week = st.slider("Lessons per Week", min_value=1, max_value=5, value=3)
         
         with col2:
             duration = st.selectbox("Unit Duration", 
                                   options=["1 week", "2 weeks", "3 weeks", "4 weeks", "6 weeks"])
             language = st.selectbox("Language", options=["English", "Bahasa Melayu"])
+            lesson_minutes = st.number_input("Lesson Duration (minutes)", min_value=30, max_value=180, value=60, step=5)
         
         learning_objectives = st.text_area("Learning Objectives/Standards", 
                                         placeholder="List 3-5 key learning objectives or standards for this unit")
@@ -331,43 +688,66 @@ def render_unit_plan_generator():
         key_resources = st.text_input("Key Resources Available", 
                                     placeholder="e.g., textbooks, lab equipment, computers, field trip opportunities")
         
+        expand_lessons = st.checkbox("Write a full lesson plan for every lesson", value=False)
+        new_outline = st.checkbox("Write a new outline", value=False,
+                                  help="By default an unchanged outline is reused, and only weeks and lessons whose settings changed are regenerated")
+        
         submit_button = st.form_submit_button(label="Generate Unit Plan")
     
     if submit_button:
         if not unit_title or not learning_objectives:
             st.error("Please enter a unit title and learning objectives.")
         else:
+            run = {
+                "params": {"unit_title": unit_title, "subject": subject, "grade_level": grade_level,
+                           "weeks": int(duration.split()[0]), "lessons_per_week": lessons_per_week,
+                           "expand_lessons": expand_lessons, "lesson_minutes": lesson_minutes,
+                           "language": language, "learning_objectives": learning_objectives,
+                           "key_resources": key_resources},
+                "steps": {},
+            }
+            st.session_state['unit_plan_run'] = run
+            
+            # One slot per step in display order, filled as weeks and lessons finish in any order
+            pipeline = unit_plan_pipeline(run)
+            slots = {name: st.empty() for name in pipeline.order}
+            for name in pipeline.order:
+                slots[name].info(f"Waiting for {pipeline.steps[name].title}...")
+            
             with st.spinner("Generating unit plan..."):
-                prompt = f"""
-                Create a comprehensive unit plan for "{unit_title}" in {subject} for {grade_level} students that spans {duration}. The unit plan should be in {language}.
-                
-                Learning Objectives:
-                {learning_objectives}
-                
-                Resources Available:
-                {key_resources if key_resources else "Standard classroom resources"}
-                
-                Include in the unit plan:
-                
-                1. Unit Overview (big ideas and essential questions)
-                2. Sequence of 4-8 lesson topics with brief descriptions
-                3. Assessment Plan (formative and summative assessments)
-                4. Differentiation Strategies for diverse learners
-                5. Key vocabulary
-                6. Cross-curricular connections
-                7. Materials and resources needed
-                
-                Format the unit plan clearly with headings and bullet points for easy reference.
-                """
-                
-                result = call_gemini_api(prompt, st.session_state['api_key'])
-                
-                if result:
-                    display_result("Generated Unit Plan", result)
-                    
-                    # Save to history
-                    save_to_history(st.session_state, "Unit Plan Generator", 
-                                   {"unit_title": unit_title, "subject": subject, 
-                                    "grade_level": grade_level, "duration": duration,
-                                    "learning_objectives": learning_objectives}, 
-                                   result)
+                reused = run_unit_plan(run, force=["outline"] if new_outline else [], slots=slots)
+            if reused:
+                st.info(f"{reused} of {len(pipeline.order)} parts reused from earlier runs with the same inputs.")
+            
+            if unit_plan_text(run):
+                # Save to history
+                save_to_history(st.session_state, "Unit Plan Generator", 
+                               {"unit_title": unit_title, "subject": subject, 
+                                "grade_level": grade_level, "duration": duration,
+                                "learning_objectives": learning_objectives}, 
+                               unit_plan_text(run))
+    
+    run = st.session_state.get('unit_plan_run')
+    if run and run["steps"]:
+        pipeline = unit_plan_pipeline(run)
+        if not submit_button:
+            for name in pipeline.order:
+                if name in run["steps"]:
+                    show_unit_plan_step(pipeline, name, run["steps"][name])
+        
+        # Any week can be regenerated, or retried after an error, without touching the rest of the unit
+        if not run["steps"]["outline"]["error"]:
+            weeks = [name for name in pipeline.order if name.startswith("week_") and "_lesson_" not in name]
+            columns = st.columns(len(weeks))
+            for column, name in zip(columns, weeks):
+                with column:
+                    title = pipeline.steps[name].title
+                    label = f"Retry {title}" if run["steps"][name]["error"] else f"Regenerate {title}"
+                    if st.button(label, key=f"unit_plan_regenerate_{name}"):
+                        with st.spinner(f"Generating {title}..."):
+                            run_unit_plan(run, force=[name])
+                        if not run["steps"][name]["error"]:
+                            save_to_history(st.session_state, "Unit Plan Generator",
+                                           {"unit_title": run["params"]["unit_title"], "week": title},
+                                           unit_plan_text(run, names=[name]))
+                        st.rerun()
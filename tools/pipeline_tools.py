@@ -0,0 +1,173 @@
+# tools/pipeline_tools.py
+import streamlit as st
+from utils.api import configure_api, generation_config
+from utils.data import save_to_history
+from utils.pipeline import Pipeline, PipelineStep
+from utils.results import record_result
+
+def display_result(title, content, prompt=None, config=None):
+    """Display the result in a formatted area and keep it for later reruns."""
+    st.markdown(f"### {title}")
+    st.markdown(f"<div class='result-area'>{content}</div>", unsafe_allow_html=True)
+    record_result(st.session_state, title, content, prompt, config)
+
+# Reading pack: a passage, then questions and vocabulary work on that passage
+def build_passage_prompt(params, outputs):
+    """Prompt for the reading passage (as the Text Generator tool)."""
+    vocab_list = [word.strip() for word in params["vocabulary"].split(",") if word.strip()]
+    return f"""
+    Generate a 250-300 word {params['text_type'].lower()} text about "{params['topic']}" in {params['language']} that:
+
+    1. Is appropriate for a Lexile level of {params['lexile_score']}
+    2. Is related to {params['subject']}
+    3. Is suitable for {params['grade_level']} students
+    {f"4. Incorporates these vocabulary words: {', '.join(vocab_list)}" if vocab_list else ""}
+
+    The text should be engaging, accurate, and educational. Include a title for the text.
+    Ensure the content is age-appropriate and maintains a natural flow.
+    """
+
+def build_text_dependent_prompt(params, outputs):
+    """Prompt for text-dependent questions on the passage (as the Text Dependent Questions tool)."""
+    return f"""
+    Create {params['num_questions']} text-dependent questions in {params['language']} for the following passage, appropriate for {params['grade_level']} students.
+    Focus on these question types: Key Details, Vocabulary in Context, Inference.
+
+    Passage:
+    ---
+    {outputs['passage']}
+    ---
+
+    Format each question as follows:
+    [Question Type] Question: [The question]
+    Answer: [Correct answer]
+    Text Evidence: [Relevant quote or reference from the text]
+    Explanation: [Brief explanation]
+    """
+
+def build_vocabulary_prompt(params, outputs):
+    """Prompt for word maps of the passage's key vocabulary (as the Vocabulary Focus tool)."""
+    words = params["vocabulary"] or "the 5 most important subject-specific words in the passage"
+    return f"""
+    Create word maps in {params['language']} for {params['grade_level']} students for these vocabulary terms: {words}
+    Base the definitions and example sentences on how the words are used in this passage:
+    ---
+    {outputs['passage']}
+    ---
+
+    For each word, provide:
+    1. Word: [vocabulary word]
+    2. Definition: [simple, grade-appropriate definition]
+    3. Synonyms: [2-3 synonyms]
+    4. Example from the passage: [the sentence where it is used]
+    5. Use in a new sentence: [example sentence appropriate for {params['grade_level']}]
+
+    Format each word map clearly with headings and bullet points.
+    """
+
+def build_dok_prompt(params, outputs):
+    """Prompt for DOK questions on the passage (as the DOK Questions tool)."""
+    return f"""
+    Create Depth of Knowledge (DOK) questions in {params['language']} about the following passage for {params['grade_level']} students.
+
+    Passage:
+    ---
+    {outputs['passage']}
+    ---
+
+    Generate 1 question for each of these DOK levels: Level 1: Recall, Level 2: Skills/Concepts, Level 3: Strategic Thinking
+
+    Format each question exactly like this:
+    DOK Level: [The DOK level]
+    Question: [The question]
+    Sample Answer: [Sample answer(s) or success criteria]
+    Explanation: [Why this question reflects its DOK level]
+    """
+
+def vocabulary_count(params):
+    """Number of words the vocabulary step maps: the teacher's list, or 5 picked from the passage."""
+    return len([word for word in params["vocabulary"].split(",") if word.strip()]) or 5
+
+# Each step uses the generation profile of the tool it stands in for
+READING_PACK = Pipeline("reading_pack", [
+    PipelineStep("passage", "Reading Passage", build_passage_prompt,
+                 config=lambda params: generation_config("Text Generator")),
+    PipelineStep("questions", "Text-Dependent Questions", build_text_dependent_prompt, depends_on=["passage"],
+                 config=lambda params: generation_config("Text Dependent Questions", items=params["num_questions"])),
+    PipelineStep("vocabulary", "Vocabulary Word Maps", build_vocabulary_prompt, depends_on=["passage"],
+                 config=lambda params: generation_config("Vocabulary Focus", items=vocabulary_count(params))),
+    PipelineStep("dok", "DOK Questions", build_dok_prompt, depends_on=["passage"],
+                 config=lambda params: generation_config("DOK Questions", items=3)),
+])
+
+# Tool 1: Reading Pack
+def render_reading_pack():
+    """Render the Reading Pack tool."""
+    st.markdown("<div class='sub-header'>📦 Reading Pack</div>", unsafe_allow_html=True)
+    st.markdown("Generate a reading passage together with text-dependent questions, vocabulary word maps "
+                "and DOK questions on it, in one step.")
+
+    with st.form(key="reading_pack_form"):
+        topic = st.text_input("Topic", placeholder="e.g., Water Cycle, Brunei's Rainforests")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            subject = st.selectbox("Subject",
+                                 options=["Science", "History", "Literature", "Social Studies", "General Knowledge"])
+            text_type = st.selectbox("Text Type",
+                                   options=["Informational", "Narrative", "Persuasive", "Procedural", "Descriptive"])
+            lexile_score = st.slider("Lexile Score", min_value=200, max_value=1600, value=800, step=50)
+
+        with col2:
+            grade_level = st.selectbox("Grade Level",
+                                     options=["Primary (1-3)", "Primary (4-6)", "Secondary (7-9)", "Secondary (10-12)"])
+            language = st.selectbox("Language", options=["English", "Bahasa Melayu"])
+            num_questions = st.slider("Number of Text-Dependent Questions", min_value=3, max_value=10, value=5)
+
+        vocabulary = st.text_area("Target Vocabulary (comma-separated, optional)",
+                                placeholder="Leave blank to pick key words from the passage")
+        new_passage = st.checkbox("Write a new passage", value=False,
+                                  help="By default an unchanged passage is reused, and only the parts whose settings changed are regenerated")
+
+        submit_button = st.form_submit_button(label="Generate Reading Pack")
+
+    if submit_button:
+        if not topic:
+            st.error("Please enter a topic.")
+        elif configure_api(st.session_state['api_key']):
+            params = {"topic": topic, "subject": subject, "text_type": text_type, "lexile_score": lexile_score,
+                      "grade_level": grade_level, "language": language, "num_questions": num_questions,
+                      "vocabulary": vocabulary}
+
+            # One slot per step in pipeline order; independent steps finish in any order
+            slots = {name: st.empty() for name in READING_PACK.order}
+            for name in READING_PACK.order:
+                slots[name].info(f"Waiting for {READING_PACK.steps[name].title}...")
+
+            results = {}
+            reused = 0
+            with st.spinner("Generating reading pack..."):
+                for event in READING_PACK.run(params, st.session_state['api_key'],
+                                              force=["passage"] if new_passage else []):
+                    slot = slots[event["step"]]
+                    if event["status"] in ("cached", "generated"):
+                        results[event["step"]] = event["result"]
+                        reused += event["status"] == "cached"
+                        with slot.container():
+                            display_result(event["title"], event["result"])
+                    elif event["status"] == "error":
+                        slot.error(f"{event['title']}: {event['result']}")
+                    else:
+                        slot.warning(f"{event['title']} was skipped because an earlier step failed.")
+
+            if reused:
+                st.info(f"{reused} of {len(READING_PACK.order)} parts reused from earlier runs with the same inputs.")
+
+            if results:
+                # Save to history
+                save_to_history(st.session_state, "Reading Pack", params,
+                               "\n\n".join(f"### {READING_PACK.steps[name].title}\n{results[name]}"
+                                           for name in READING_PACK.order if name in results))
+        else:
+            st.error("Please save your Gemini API key in the sidebar first.")
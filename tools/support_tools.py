@@ -1,12 +1,240 @@
 # tools/support_tools.py
 import streamlit as st
-from utils.api import call_gemini_api
+from utils.api import (ERROR_PREFIX, MODEL_NAME, call_gemini_api, call_gemini_api_concurrent,
+                       generation_config, is_api_error, response_cache, stream_gemini_api_concurrent)
+from utils.cache import make_key
 from utils.data import save_to_history
+from utils.results import record_result, reuse_last_result
+from utils.proofreading import split_feedback, split_paragraphs
+from utils.questions import QuestionStreamParser, get_question_index, is_complete_mcq, parse_question_blocks
+from utils.semantic_cache import describe_reuse, find_similar_result, remember_result
+from utils.standards import build_unpacking_prompt, get_standards_index
+from utils.vocabulary import (WORD_HEADER_PATTERN, batch_words, normalise_word, parse_word_list,
+                              split_word_sections)
+from tools.assessment_tools import render_replacement_button, review_duplicates, show_question_preview
+from tools.communication_tools import generate_variants, render_variants
 
-def display_result(title, content):
-    """Display the result in a formatted area."""
+def display_result(title, content, prompt=None, config=None):
+    """Display the result in a formatted area and keep it for later reruns."""
     st.markdown(f"### {title}")
     st.markdown(f"<div class='result-area'>{content}</div>", unsafe_allow_html=True)
+    record_result(st.session_state, title, content, prompt, config)
+
+# Word Maps, Sentence Frames and MCQs are generated and cached per word, so a
+# longer list only costs the new words; activities are designed for the whole list
+PER_WORD_OUTPUTS = ("Vocabulary MCQs", "Word Maps", "Sentence Frames")
+VOCABULARY_BATCH_SIZE = 5
+VOCABULARY_MCQS_PER_WORD = 3
+
+def build_vocabulary_prompt(output_type, words, grade_level, language):
+    """
+    Build the Vocabulary Focus prompt for a list of words.
+
+    Per-word outputs ask for one section per word, each starting with a
+    "=== WORD: <word> ===" header, so that the sections can be cached separately.
+
+    Args:
+        output_type (str): "Vocabulary MCQs", "Word Maps", "Sentence Frames" or "Vocabulary Activities"
+        words (list): Vocabulary words
+        grade_level (str): Grade level of the students
+        language (str): Language of the output
+
+    Returns:
+        str: The prompt
+    """
+    vocabulary = ", ".join(words)
+    sections = """
+    Start the section for each word with a header line exactly like this, keeping the word exactly as given
+    (even when writing in another language), and write nothing before the first header:
+    === WORD: [word] ===
+    """
+    
+    if output_type == "Vocabulary MCQs":
+        return f"""
+        You are an MCQ generator for {grade_level} students. Create vocabulary MCQs in {language} for these words: {vocabulary}
+        1. For each word, write {VOCABULARY_MCQS_PER_WORD} questions: one on its definition, one on a synonym and one on its usage
+        2. Format response:
+           Q: [Question]
+           A: [Option A] | [Option B] | [Option C] | [Option D]
+           Correct: [Letter]
+           Explanation: [Brief rationale]
+           Concepts: [Comma-separated concepts]
+
+        Example:
+        Q: What does "photosynthesis" mean?
+        A: Plant growth | Light-to-energy | Water process | Gas exchange
+        Correct: B
+        Explanation: Photosynthesis changes light energy to chemical energy
+        Concepts: biology, energy
+        {sections}
+        """
+        
+    elif output_type == "Word Maps":
+        return f"""
+        Create detailed word maps for these vocabulary terms: {vocabulary}
+        
+        For each word in {language}, provide:
+        1. Word: [vocabulary word]
+        2. Definition: [simple, grade-appropriate definition for {grade_level}]
+        3. Synonyms: [2-3 synonyms]
+        4. Antonyms: [2-3 antonyms if applicable]
+        5. Examples: [2-3 concrete examples]
+        6. Non-examples: [1-2 non-examples to clarify meaning]
+        7. Visual cue: [brief description of an image that represents the word]
+        8. Use in a sentence: [example sentence appropriate for {grade_level}]
+        9. Word parts: [prefix, root, suffix if applicable]
+        
+        Format each word map clearly with headings and bullet points.
+        {sections}
+        """
+        
+    elif output_type == "Sentence Frames":
+        return f"""
+        Create sentence frames for {grade_level} students to practice using these vocabulary words: {vocabulary}
+        
+        For each word in {language}, provide:
+        1. Basic sentence frame (simple usage)
+        2. Intermediate sentence frame (more complex usage)
+        3. Advanced sentence frame (critical thinking)
+        4. Question frame (to prompt discussion)
+        5. Comparison frame (to compare concepts)
+        
+        Each frame should have blanks for students to fill in, but should guide them to use the vocabulary word correctly.
+        
+        Example for "ecosystem":
+        Basic: An ecosystem includes living things such as _______ and non-living things such as _______.
+        Intermediate: In the _______ ecosystem, _______ are producers because they _______.
+        Advanced: When _______ happens in an ecosystem, it affects _______ because _______.
+        Question: How might the _______ in this ecosystem be affected if _______?
+        Comparison: The _______ ecosystem is different from the _______ ecosystem because _______.
+        {sections}
+        """
+        
+    # Vocabulary Activities
+    return f"""
+    Create 5 engaging vocabulary activities for {grade_level} students to learn these words: {vocabulary}
+    
+    Each activity in {language} should:
+    1. Have a clear title and purpose
+    2. Include step-by-step instructions
+    3. Specify materials needed
+    4. Include examples of how to use the vocabulary words
+    5. Be appropriate for {grade_level} students
+    6. Take 10-15 minutes to complete
+    
+    Include a mix of individual, pair, and group activities that address different learning styles (visual, auditory, kinesthetic).
+    Each activity should deeply engage students with the meaning and usage of the vocabulary words.
+    """
+
+def stream_vocabulary_mcqs(prompts, batches, config):
+    """
+    Stream vocabulary MCQs for batches of words, showing each question as soon as it has arrived.
+
+    A batch's stream is ended once the last word in the batch has its questions,
+    so surplus output is not generated.
+
+    Args:
+        prompts (list): Vocabulary MCQ prompt per batch
+        batches (list): The words in each batch
+        config (types.GenerateContentConfig): Generation settings for every prompt
+
+    Yields:
+        tuple: (index, result) per batch, in completion order - the output up to the
+        point the stream was ended, or an error message if nothing was parsed
+    """
+    def until(last):
+        return lambda blocks: sum(normalise_word(block["section"] or "") == last
+                                  for block in blocks) >= VOCABULARY_MCQS_PER_WORD
+
+    parsers = [QuestionStreamParser(until(normalise_word(batch[-1])), WORD_HEADER_PATTERN) for batch in batches]
+    preview = st.empty()
+    stopped = set()
+    errors = {}
+    for index, chunk in stream_gemini_api_concurrent(prompts, st.session_state['api_key'], stopped, config=config):
+        parser = parsers[index]
+        if chunk is None:
+            parser.close()
+            yield index, parser.text if parser.blocks else errors.get(index, parser.text)
+        elif is_api_error(chunk):
+            errors[index] = chunk
+        else:
+            if any(is_complete_mcq(block) for block in parser.feed(chunk)):
+                show_question_preview(preview, [block for each in parsers for block in each.blocks
+                                                if is_complete_mcq(block)])
+            if parser.done:
+                stopped.add(index)
+    preview.empty()
+
+def generate_vocabulary_sections(output_type, words, grade_level, language):
+    """
+    Get per-word vocabulary output, generating only the words that are not cached.
+
+    Missing words are requested in batches of VOCABULARY_BATCH_SIZE, with the
+    batches sent concurrently. Cached MCQs for a word are not reused if this
+    session has already seen them, so asking again gives new questions. MCQs are
+    streamed and shown as they arrive; a word whose questions came back malformed
+    is regenerated on its own.
+
+    Args:
+        output_type (str): One of PER_WORD_OUTPUTS
+        words (list): Vocabulary words, in the user's order
+        grade_level (str): Grade level of the students
+        language (str): Language of the output
+
+    Returns:
+        tuple: (sections, cached, errors) - section text by word, the number of
+        words served from the cache, and error messages for words that failed
+    """
+    keys = {word: make_key("vocabulary", MODEL_NAME, output_type, grade_level, language, normalise_word(word))
+            for word in words}
+    seen = get_question_index(st.session_state)
+    sections = {}
+    for word in words:
+        section = response_cache.get(keys[word])
+        if section is None:
+            continue
+        if output_type == "Vocabulary MCQs" and any(seen.query(block["question"])
+                                                    for block in parse_question_blocks(section)):
+            continue
+        sections[word] = section
+    cached = len(sections)
+    
+    batches = batch_words([word for word in words if word not in sections], VOCABULARY_BATCH_SIZE)
+    prompts = [build_vocabulary_prompt(output_type, batch, grade_level, language) for batch in batches]
+    errors = []
+    config = generation_config("Vocabulary Focus", items=VOCABULARY_BATCH_SIZE)
+    if output_type == "Vocabulary MCQs":
+        results = stream_vocabulary_mcqs(prompts, batches, config)
+    else:
+        results = call_gemini_api_concurrent(prompts, st.session_state['api_key'], config=config)
+    malformed = {}
+    for index, result in results:
+        if is_api_error(result):
+            errors.append(result or f"{ERROR_PREFIX} no response")
+            continue
+        found = split_word_sections(result, batches[index])
+        for word, section in found.items():
+            sections[word] = section
+            if output_type == "Vocabulary MCQs" and not all(is_complete_mcq(block)
+                                                             for block in parse_question_blocks(section)):
+                malformed[word] = section
+            else:
+                response_cache.set(keys[word], section)
+        missing = [word for word in batches[index] if word not in found]
+        if missing:
+            errors.append(f"No {output_type.lower()} were returned for: {', '.join(missing)}")
+    
+    # Regenerate just the words whose questions came back malformed; if that fails
+    # too, the first attempt is shown (but not cached)
+    retry = list(malformed)
+    prompts = [build_vocabulary_prompt(output_type, [word], grade_level, language) for word in retry]
+    for index, result in call_gemini_api_concurrent(prompts, st.session_state['api_key'],
+                                                    config=generation_config("Vocabulary Focus", items=1)):
+        section = split_word_sections(result, [retry[index]]).get(retry[index]) if not is_api_error(result) else None
+        if section and all(is_complete_mcq(block) for block in parse_question_blocks(section)):
+            response_cache.set(keys[retry[index]], section)
+            sections[retry[index]] = section
+    return sections, cached, errors
 
 # Tool 1: Vocabulary Focus
 def render_vocabulary_focus():
@@ -31,90 +259,43 @@ def render_vocabulary_focus():
         submit_button = st.form_submit_button(label="Generate Vocabulary Resources")
     
     if submit_button:
-        if not vocabulary:
+        words = parse_word_list(vocabulary)
+        if not words:
             st.error("Please enter vocabulary words.")
         else:
             with st.spinner("Generating vocabulary resources..."):
-                vocab_list = [word.strip() for word in vocabulary.split(",")]
-                
-                if output_type == "Vocabulary MCQs":
-                    prompt = f"""
-                    You are an MCQ generator for {grade_level} students. Create vocabulary MCQs in {language} for these words: {vocabulary}
-                    1. Include definition, synonym, and usage questions
-                    2. Format response:
-                       Q: [Question]
-                       A: [Option A] | [Option B] | [Option C] | [Option D]
-                       Correct: [Letter]
-                       Explanation: [Brief rationale]
-                       Concepts: [Comma-separated concepts]
-
-                    Example:
-                    Q: What does "photosynthesis" mean?
-                    A: Plant growth | Light-to-energy | Water process | Gas exchange
-                    Correct: B
-                    Explanation: Photosynthesis changes light energy to chemical energy
-                    Concepts: biology, energy
-                    """
-                    
-                elif output_type == "Word Maps":
-                    prompt = f"""
-                    Create detailed word maps for these vocabulary terms: {vocabulary}
-                    
-                    For each word in {language}, provide:
-                    1. Word: [vocabulary word]
-                    2. Definition: [simple, grade-appropriate definition for {grade_level}]
-                    3. Synonyms: [2-3 synonyms]
-                    4. Antonyms: [2-3 antonyms if applicable]
-                    5. Examples: [2-3 concrete examples]
-                    6. Non-examples: [1-2 non-examples to clarify meaning]
-                    7. Visual cue: [brief description of an image that represents the word]
-                    8. Use in a sentence: [example sentence appropriate for {grade_level}]
-                    9. Word parts: [prefix, root, suffix if applicable]
-                    
-                    Format each word map clearly with headings and bullet points.
-                    """
-                    
-                elif output_type == "Sentence Frames":
-                    prompt = f"""
-                    Create sentence frames for {grade_level} students to practice using these vocabulary words: {vocabulary}
-                    
-                    For each word in {language}, provide:
-                    1. Basic sentence frame (simple usage)
-                    2. Intermediate sentence frame (more complex usage)
-                    3. Advanced sentence frame (critical thinking)
-                    4. Question frame (to prompt discussion)
-                    5. Comparison frame (to compare concepts)
-                    
-                    Each frame should have blanks for students to fill in, but should guide them to use the vocabulary word correctly.
-                    
-                    Example for "ecosystem":
-                    Basic: An ecosystem includes living things such as _______ and non-living things such as _______.
-                    Intermediate: In the _______ ecosystem, _______ are producers because they _______.
-                    Advanced: When _______ happens in an ecosystem, it affects _______ because _______.
-                    Question: How might the _______ in this ecosystem be affected if _______?
-                    Comparison: The _______ ecosystem is different from the _______ ecosystem because _______.
-                    """
-                    
-                else:  # Vocabulary Activities
-                    prompt = f"""
-                    Create 5 engaging vocabulary activities for {grade_level} students to learn these words: {vocabulary}
-                    
-                    Each activity in {language} should:
-                    1. Have a clear title and purpose
-                    2. Include step-by-step instructions
-                    3. Specify materials needed
-                    4. Include examples of how to use the vocabulary words
-                    5. Be appropriate for {grade_level} students
-                    6. Take 10-15 minutes to complete
-                    
-                    Include a mix of individual, pair, and group activities that address different learning styles (visual, auditory, kinesthetic).
-                    Each activity should deeply engage students with the meaning and usage of the vocabulary words.
-                    """
+                prompt = build_vocabulary_prompt(output_type, words, grade_level, language)
+                match = None
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                if output_type in PER_WORD_OUTPUTS:
+                    sections, cached, errors = generate_vocabulary_sections(output_type, words, grade_level, language)
+                    for error in errors:
+                        st.error(error)
+                    if cached:
+                        st.info(f"{cached} of {len(words)} words reused from earlier requests; "
+                                f"generated {len(sections) - cached}.")
+                    # Assemble in the user's order; MCQ blocks are joined as they are for duplicate review
+                    if output_type == "Vocabulary MCQs":
+                        result = "\n\n".join(sections[word] for word in words if word in sections)
+                    else:
+                        result = "\n\n".join(f"#### {word}\n{sections[word]}" for word in words if word in sections)
+                else:
+                    fields = {"grade_level": grade_level, "language": language, "output_type": output_type}
+                    texts = {"vocabulary": vocabulary}
+                    match = find_similar_result(st.session_state, "Vocabulary Focus", fields, texts)
+                    if match:
+                        result = match["result"]
+                    else:
+                        result = call_gemini_api(prompt, st.session_state['api_key'],
+                                                 generation_config("Vocabulary Focus", items=len(words)))
+                        remember_result("Vocabulary Focus", fields, texts, result)
                 
                 if result:
+                    if output_type == "Vocabulary MCQs":
+                        result = review_duplicates("Vocabulary MCQs", prompt, result)
                     display_result(f"Generated {output_type}", result)
+                    if match:
+                        st.info(describe_reuse(match))
                     
                     # Save to history
                     save_to_history(st.session_state, "Vocabulary Focus", 
@@ -122,6 +303,164 @@ def render_vocabulary_focus():
                                     "output_type": output_type, "language": language}, 
                                    result)
 
+    render_replacement_button("Vocabulary MCQs", "Replacement Vocabulary MCQs")
+
+def build_proofreading_prompt(text, settings):
+    """Prompt proofreading a whole (short) text."""
+    return f"""
+    Proofread the following text in {settings['language']} as if it were written by a {settings['grade_level']} student. 
+    Use a {settings['feedback_tone']} tone in your feedback.
+    
+    Focus particularly on these areas: {settings['focus_areas']}
+    
+    Text to proofread:
+    ---
+    {text}
+    ---
+    
+    Please provide:
+    
+    1. An overall assessment of the writing (2-3 sentences)
+    2. Specific corrections for errors (clearly mark what needs to be changed)
+    3. Positive feedback on strengths (at least 2 points)
+    4. Suggestions for improvement (2-3 specific, actionable suggestions)
+    5. A revised/corrected version of the text
+    
+    Format your response clearly with sections for each type of feedback.
+    """
+
+def build_paragraph_proofreading_prompt(paragraph, settings):
+    """Prompt proofreading one paragraph of a longer text; it does not depend on the paragraph's position."""
+    return f"""
+    Proofread the following paragraph in {settings['language']} from a text written by a {settings['grade_level']} student.
+    Use a {settings['feedback_tone']} tone. Focus particularly on these areas: {settings['focus_areas']}
+
+    Paragraph:
+    ---
+    {paragraph}
+    ---
+
+    Respond in exactly this format:
+    Corrections:
+    - [Each error, quoted, with its correction and a brief reason; write "None" if there are no errors]
+    Revised:
+    [The corrected paragraph]
+    """
+
+def build_proofreading_summary_prompt(corrections, settings):
+    """Prompt for overall feedback on a text, built from its paragraph corrections rather than the text itself."""
+    return f"""
+    These are the paragraph-by-paragraph corrections from proofreading a text written by a {settings['grade_level']} student
+    (focus areas: {settings['focus_areas']}). Write in {settings['language']} with a {settings['feedback_tone']} tone.
+
+    {corrections}
+
+    Please provide:
+    1. An overall assessment of the writing (2-3 sentences)
+    2. Positive feedback on strengths (at least 2 points)
+    3. Suggestions for improvement (2-3 specific, actionable suggestions based on the patterns in the corrections)
+    """
+
+# Proofreading feedback kept per session, oldest dropped first. Student writing is
+# never put in the shared disk cache, so it stays with the session that sent it.
+MAX_SESSION_PROOFREADS = 200
+
+def recall_proofreading(key):
+    """Return this session's feedback for a proofreading request, unless the teacher asked for fresh output."""
+    if st.session_state.get('fresh_output'):
+        return None
+    return st.session_state.get('proofread_feedback', {}).get(key)
+
+def remember_proofreading(key, feedback):
+    """Keep proofreading feedback in session memory; errors are never kept."""
+    if is_api_error(feedback):
+        return
+    memory = st.session_state.setdefault('proofread_feedback', {})
+    memory.pop(key, None)
+    memory[key] = feedback
+    while len(memory) > MAX_SESSION_PROOFREADS:
+        memory.pop(next(iter(memory)))
+
+def render_incremental_proofreading(paragraphs, settings):
+    """
+    Proofread a long text paragraph by paragraph, reusing feedback for unchanged paragraphs.
+
+    Feedback is kept in the session under a fingerprint of each paragraph and the
+    proofreading settings, so after an edit only new or changed paragraphs are sent,
+    several at a time. The overall feedback is kept the same way, under the
+    corrections it summarises. Feedback is shown in document order as it arrives, followed by overall
+    feedback and the revised text.
+
+    Args:
+        paragraphs (list): Paragraphs from split_paragraphs
+        settings (dict): "grade_level", "focus_areas", "feedback_tone" and "language"
+
+    Returns:
+        str: The stitched feedback, or "" if no paragraph could be proofread
+    """
+    api_key = st.session_state['api_key']
+    prompts = [build_paragraph_proofreading_prompt(paragraph, settings) for paragraph in paragraphs]
+    keys = [make_key("proofread_paragraph", MODEL_NAME, settings, paragraph) for paragraph in paragraphs]
+    feedback = {i: recall_proofreading(key) for i, key in enumerate(keys)}
+    feedback = {i: text for i, text in feedback.items() if text is not None}
+    pending = [i for i in range(len(paragraphs)) if i not in feedback]
+    
+    st.markdown("### Proofreading Results")
+    if feedback:
+        st.info(f"{len(feedback)} of {len(paragraphs)} paragraphs unchanged since they were last proofread; "
+                f"checking {len(pending)}.")
+    summary_slot = st.empty()
+    slots = [st.empty() for _ in paragraphs]
+    
+    def show_paragraph(i):
+        with slots[i].container():
+            st.markdown(f"**Paragraph {i + 1}**")
+            if is_api_error(feedback[i]):
+                st.error(feedback[i])
+            else:
+                st.markdown(f"<div class='result-area'>{split_feedback(feedback[i])[0]}</div>", unsafe_allow_html=True)
+    
+    for i in sorted(feedback):
+        show_paragraph(i)
+    for i in pending:
+        slots[i].info(f"Checking paragraph {i + 1}...")
+    
+    with st.spinner(f"Proofreading {len(pending)} paragraphs..."):
+        longest = max((len(paragraphs[i].split()) for i in pending), default=0)
+        config = generation_config("Text Proofreader", items=longest)
+        for index, result in call_gemini_api_concurrent([prompts[i] for i in pending], api_key, max_workers=6,
+                                                        config=config):
+            feedback[pending[index]] = result or f"{ERROR_PREFIX} no response"
+            remember_proofreading(keys[pending[index]], result)
+            show_paragraph(pending[index])
+    
+    proofread = [i for i in range(len(paragraphs)) if not is_api_error(feedback[i])]
+    if not proofread:
+        summary_slot.empty()
+        return ""
+    
+    corrections = "\n\n".join(f"Paragraph {i + 1}:\n{split_feedback(feedback[i])[0]}" for i in proofread)
+    # The overall feedback only changes when the corrections do
+    summary_key = make_key("proofread_summary", MODEL_NAME, corrections, settings)
+    summary = recall_proofreading(summary_key)
+    if summary is None:
+        with st.spinner("Writing overall feedback..."):
+            summary = call_gemini_api(build_proofreading_summary_prompt(corrections, settings), api_key)
+        remember_proofreading(summary_key, summary)
+    if not is_api_error(summary):
+        with summary_slot.container():
+            display_result("Overall Feedback", summary)
+    else:
+        summary = ""
+    record_result(st.session_state, "Corrections", corrections)
+    
+    # Paragraphs that could not be proofread are kept as written
+    revised = "\n\n".join((split_feedback(feedback[i])[1] or paragraphs[i]) if i in proofread else paragraphs[i]
+                           for i in range(len(paragraphs)))
+    display_result("Revised Text", revised)
+    
+    return "\n\n".join(part for part in [summary, "### Corrections\n" + corrections, "### Revised Text\n" + revised] if part)
+
 # Tool 2: Text Proofreader
 def render_text_proofreader():
     """Render the Text Proofreader tool."""
@@ -153,43 +492,31 @@ def render_text_proofreader():
         if not original_text:
             st.error("Please enter text to proofread.")
         else:
-            with st.spinner("Proofreading text..."):
-                # Join focus areas with commas
-                focus_str = ", ".join(focus_areas)
-                
-                prompt = f"""
-                Proofread the following text in {language} as if it were written by a {grade_level} student. 
-                Use a {feedback_tone} tone in your feedback.
-                
-                Focus particularly on these areas: {focus_str}
-                
-                Text to proofread:
-                ---
-                {original_text}
-                ---
-                
-                Please provide:
-                
-                1. An overall assessment of the writing (2-3 sentences)
-                2. Specific corrections for errors (clearly mark what needs to be changed)
-                3. Positive feedback on strengths (at least 2 points)
-                4. Suggestions for improvement (2-3 specific, actionable suggestions)
-                5. A revised/corrected version of the text
-                
-                Format your response clearly with sections for each type of feedback.
-                """
-                
-                result = call_gemini_api(prompt, st.session_state['api_key'])
-                
+            settings = {"grade_level": grade_level, "focus_areas": ", ".join(focus_areas),
+                        "feedback_tone": feedback_tone, "language": language}
+            paragraphs = split_paragraphs(original_text)
+            
+            if len(paragraphs) > 1:
+                result = render_incremental_proofreading(paragraphs, settings)
+            else:
+                with st.spinner("Proofreading text..."):
+                    prompt = build_proofreading_prompt(original_text, settings)
+                    key = make_key("proofread", MODEL_NAME, prompt)
+                    result = recall_proofreading(key)
+                    if result is None:
+                        result = call_gemini_api(prompt, st.session_state['api_key'],
+                                                 generation_config("Text Proofreader", items=len(original_text.split())))
+                        remember_proofreading(key, result)
                 if result:
                     display_result("Proofreading Results", result)
-                    
-                    # Save to history
-                    save_to_history(st.session_state, "Text Proofreader", 
-                                   {"original_text": original_text[:100] + "..." if len(original_text) > 100 else original_text, 
-                                    "grade_level": grade_level, "focus_areas": focus_str,
-                                    "feedback_tone": feedback_tone}, 
-                                   result)
+            
+            if result:
+                # Save to history
+                save_to_history(st.session_state, "Text Proofreader", 
+                               {"original_text": original_text[:100] + "..." if len(original_text) > 100 else original_text, 
+                                "grade_level": grade_level, "focus_areas": settings["focus_areas"],
+                                "feedback_tone": feedback_tone}, 
+                               result)
 
 # Tool 3: IEP Goal Responder
 def render_iep_goal_responder():
@@ -229,6 +556,8 @@ def render_iep_goal_responder():
             with st.spinner("Generating IEP goals..."):
                 # Join subject areas with commas
                 subjects_str = ", ".join(subject_areas)
+                # Built outside the f-string: backslashes in f-string expressions need Python 3.12+
+                current_levels_text = f"Current Performance Levels:\n{current_levels}" if current_levels else ""
                 
                 prompt = f"""
                 Create Individualized Education Program (IEP) goals in {language} for a {grade_level} student with the following needs:
@@ -236,7 +565,7 @@ def render_iep_goal_responder():
                 Student Needs/Challenges:
                 {student_needs}
                 
-                {f"Current Performance Levels:\n{current_levels}" if current_levels else ""}
+                {current_levels_text}
                 
                 Generate 1-2 SMART goals for each of these areas: {subjects_str}
                 Each goal should be designed for a {time_frame} time frame.
@@ -252,10 +581,12 @@ def render_iep_goal_responder():
                 Format each goal clearly with headings and bullet points.
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                config = generation_config("IEP Goal Responder")
+                result = reuse_last_result(st.session_state, prompt) or call_gemini_api(
+                    prompt, st.session_state['api_key'], config)
                 
                 if result:
-                    display_result("Generated IEP Goals", result)
+                    display_result("Generated IEP Goals", result, prompt, config)
                     
                     # Save to history
                     save_to_history(st.session_state, "IEP Goal Responder", 
@@ -269,23 +600,43 @@ def render_standards_unpacker():
     """Render the Standards Unpacker tool."""
     st.markdown("<div class='sub-header'>📋 Standards Unpacker</div>", unsafe_allow_html=True)
     
+    index = get_standards_index()
+    subjects = ["Mathematics", "English Language Arts", "Science", "Social Studies", 
+                "Arts", "Physical Education", "Technology", "Other"]
+    grades = ["Primary (1-3)", "Primary (4-6)", "Secondary (7-9)", "Secondary (10-12)"]
+    frameworks = ["General", "Common Core", "NGSS", "IGCSE", "IB", "National Curriculum", "Other"]
+    
+    # Pick a standard from the local library instead of pasting it; the select box filters as you type
+    with st.expander("🔎 Find a standard in the library"):
+        query = st.text_input("Search by code or keyword", placeholder="e.g., 3.NF, photosynthesis, main idea")
+        matches = {standard["code"]: standard for standard in index.search(query, limit=200)}
+        chosen = st.selectbox("Standard", options=list(matches), index=None,
+                              format_func=lambda code: f"{code} — {matches[code]['text'][:100]}",
+                              placeholder="Type a code or keyword to filter...")
+        if chosen and st.button("Use this standard"):
+            standard = matches[chosen]
+            st.session_state['standard_text'] = standard["text"]
+            for key, value, options in (("standard_subject", standard["subject"], subjects),
+                                        ("standard_grade", standard["grade"], grades),
+                                        ("standard_framework", standard["framework"], frameworks)):
+                if value in options:
+                    st.session_state[key] = value
+            st.rerun()
+    
     with st.form(key="standards_unpacker_form"):
         standard_text = st.text_area("Standard Text", 
                                    placeholder="Paste the educational standard or learning objective here...",
-                                   height=100)
+                                   height=100, key="standard_text")
         
         col1, col2 = st.columns(2)
         
         with col1:
-            subject = st.selectbox("Subject Area", 
-                                 options=["Mathematics", "English Language Arts", "Science", "Social Studies", 
-                                          "Arts", "Physical Education", "Technology", "Other"])
-            grade_level = st.selectbox("Grade Level", 
-                                     options=["Primary (1-3)", "Primary (4-6)", "Secondary (7-9)", "Secondary (10-12)"])
+            subject = st.selectbox("Subject Area", options=subjects, key="standard_subject")
+            grade_level = st.selectbox("Grade Level", options=grades, key="standard_grade")
         
         with col2:
-            curriculum_framework = st.selectbox("Curriculum Framework (if applicable)", 
-                                             options=["General", "Common Core", "NGSS", "IGCSE", "IB", "National Curriculum", "Other"])
+            curriculum_framework = st.selectbox("Curriculum Framework (if applicable)", options=frameworks,
+                                             key="standard_framework")
             language = st.selectbox("Language", options=["English", "Bahasa Melayu"])
         
         submit_button = st.form_submit_button(label="Unpack Standard")
@@ -295,30 +646,23 @@ def render_standards_unpacker():
             st.error("Please enter a standard to unpack.")
         else:
             with st.spinner("Unpacking standard..."):
-                prompt = f"""
-                Unpack the following {subject} educational standard for {grade_level} students from the {curriculum_framework} framework. Provide your analysis in {language}.
-                
-                Standard:
-                {standard_text}
-                
-                Please provide:
-                
-                1. A simplified explanation of what this standard means (teacher-friendly language)
-                2. A breakdown of the key skills and knowledge students need to demonstrate
-                3. The prerequisite knowledge/skills students should have before addressing this standard
-                4. 3-4 clear "I can" statements that students could use to understand the standard
-                5. 2-3 ways to assess mastery of this standard
-                6. At least 3 specific instructional strategies or activities that would help teach this standard
-                7. Potential challenges students might face in mastering this standard and how to address them
-                8. How this standard connects to previous and future learning in the curriculum
-                
-                Format your response in clear sections with headings for easy reference.
-                """
-                
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                # Standards are unpacked once per framework, grade and language, then served from the library
+                stored = None
+                if not st.session_state.get('fresh_output'):
+                    stored = index.get_unpacking(standard_text, curriculum_framework, subject, grade_level, language)
+                if stored:
+                    result = stored
+                else:
+                    prompt = build_unpacking_prompt(standard_text, subject, grade_level, curriculum_framework, language)
+                    result = call_gemini_api(prompt, st.session_state['api_key'], generation_config("Standards Unpacker"))
+                    if not is_api_error(result):
+                        index.save_unpacking(standard_text, curriculum_framework, subject, grade_level, language, result)
                 
                 if result:
                     display_result("Unpacked Standard", result)
+                    if stored:
+                        st.info("Served from the standards library, where this standard was already unpacked for "
+                                f"{curriculum_framework}. Turn on 'Always generate fresh output' in the sidebar for a new unpacking.")
                     
                     # Save to history
                     save_to_history(st.session_state, "Standards Unpacker", 
@@ -360,6 +704,9 @@ def render_image_generator():
         specific_elements = st.text_area("Specific Elements to Include", 
                                        placeholder="e.g., labels, arrows, specific parts or steps")
         
+        variant_count = st.slider("Prompts to Compare", min_value=1, max_value=4, value=1,
+                                  help="Generate several prompts in one request and pick the best one")
+        
         submit_button = st.form_submit_button(label="Generate Image Prompt")
     
     if submit_button:
@@ -384,13 +731,24 @@ def render_image_generator():
                 3. A list of 3-5 suggestions for how to use this image in teaching
                 """
                 
-                result = call_gemini_api(prompt, st.session_state['api_key'])
+                inputs = {"subject": subject, "image_type": image_type, 
+                          "style": style, "audience": audience, "purpose": purpose}
                 
-                if result:
-                    display_result("Image Generation Prompt", result)
+                if variant_count > 1:
+                    results = generate_variants("Image Generator", prompt, variant_count, inputs,
+                                                config=generation_config("Image Generator"))
+                    if results and is_api_error(results[0]):
+                        st.error(results[0])
+                else:
+                    st.session_state.get('variants', {}).pop("Image Generator", None)
+                    config = generation_config("Image Generator")
+                    result = reuse_last_result(st.session_state, prompt) or call_gemini_api(
+                        prompt, st.session_state['api_key'], config)
                     
-                    # Save to history
-                    save_to_history(st.session_state, "Image Generator", 
-                                   {"subject": subject, "image_type": image_type, 
-                                    "style": style, "audience": audience, "purpose": purpose}, 
-                                   result)
+                    if result:
+                        display_result("Image Generation Prompt", result, prompt, config)
+                        
+                        # Save to history
+                        save_to_history(st.session_state, "Image Generator", inputs, result)
+    
+    render_variants("Image Generator", "Image Prompt Options")
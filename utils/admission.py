@@ -0,0 +1,289 @@
+# utils/admission.py
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from utils.cache import make_key
+
+# Model calls allowed in flight across the whole app, and the longest a call may
+# wait for one of them before it is turned away
+MAX_CONCURRENT_CALLS = int(os.environ.get("TEACHER_MAGIC_MAX_CONCURRENT_CALLS", "8"))
+MAX_QUEUE_WAIT = float(os.environ.get("TEACHER_MAGIC_MAX_QUEUE_WAIT", "60"))
+# How often a waiting call reports its place in the queue (seconds)
+REPORT_INTERVAL = 0.5
+# Assumed length of a model call until some have been timed (seconds)
+DEFAULT_CALL_SECONDS = 5.0
+
+# The user (session) making model calls in the current context, and the callback
+# that shows their place in the queue; set by the app at the start of each run
+_session = ContextVar("admission_session", default=None)
+
+_controller = None
+_controller_lock = threading.Lock()
+
+class QueueFull(Exception):
+    """Raised when a model call is turned away because the queue would not clear in time."""
+
+class _Ticket:
+    """A model call waiting for a slot."""
+    __slots__ = ("granted",)
+
+    def __init__(self):
+        self.granted = False
+
+class AdmissionController:
+    """
+    Process-wide limit on concurrent model calls, with a queue that is fair per user.
+
+    Calls beyond the limit wait in line. Each user has their own queue and users
+    are served in turn, so one teacher's burst of requests (e.g. a batch of
+    parallel calls) cannot hold everybody else up. A call that would wait longer
+    than max_wait is turned away with QueueFull instead of piling up.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_CALLS, max_wait=MAX_QUEUE_WAIT):
+        """
+        Args:
+            max_concurrent (int): Model calls allowed in flight at once
+            max_wait (float): Longest a call may wait for a slot, in seconds
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._active = 0
+        self._waiting = OrderedDict()  # Tickets by user, users in the order they will next be served
+        self._call_seconds = None
+        self._counts = {"admitted": 0, "queued": 0, "shed": 0}
+        self._total_wait = 0.0
+        self._peak_waiting = 0
+
+    def _waiting_count(self):
+        return sum(len(tickets) for tickets in self._waiting.values())
+
+    def _position(self, user, ticket):
+        """Place of a waiting ticket in line (1 = next), serving users in turn."""
+        tickets = self._waiting[user]
+        turn = tickets.index(ticket)
+        position = 1
+        earlier_user = True
+        for other, queued in self._waiting.items():
+            if other == user:
+                earlier_user = False
+                position += min(len(queued), turn)
+            else:
+                position += min(len(queued), turn + earlier_user)
+        return position
+
+    def _estimate(self, position):
+        """Expected wait, in seconds, for the call at this place in line."""
+        call_seconds = self._call_seconds or DEFAULT_CALL_SECONDS
+        return math.ceil(position / self.max_concurrent) * call_seconds
+
+    def _grant(self):
+        """Hand free slots to waiting calls, one user at a time."""
+        while self._active < self.max_concurrent and self._waiting:
+            user, tickets = next(iter(self._waiting.items()))
+            tickets.popleft().granted = True
+            self._active += 1
+            if tickets:
+                self._waiting.move_to_end(user)
+            else:
+                del self._waiting[user]
+        self._changed.notify_all()
+
+    def _withdraw(self, user, ticket):
+        """Take a ticket out of line, or give back its slot if it was just granted."""
+        if ticket.granted:
+            self._active -= 1
+            self._grant()
+            return
+        tickets = self._waiting.get(user)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._waiting[user]
+
+    def acquire(self, user, report=None):
+        """
+        Wait for a slot for a model call.
+
+        Args:
+            user (str): Who the call is for; users are served in turn
+            report (callable): Called as report(position, seconds) while waiting,
+                and as report(None, None) once the wait is over
+
+        Returns:
+            float: Seconds waited
+
+        Raises:
+            QueueFull: If the call could not be started within max_wait seconds
+        """
+        start = time.monotonic()
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                self._counts["admitted"] += 1
+                return 0.0
+            # Turn the call away at once if calls timed so far say it could not start in time
+            if self._call_seconds is not None and self._estimate(self._waiting_count() + 1) > self.max_wait:
+                self._counts["shed"] += 1
+                raise QueueFull(self._busy_message())
+            ticket = _Ticket()
+            self._waiting.setdefault(user, deque()).append(ticket)
+            self._counts["queued"] += 1
+            self._peak_waiting = max(self._peak_waiting, self._waiting_count())
+
+        try:
+            while True:
+                with self._lock:
+                    waited = time.monotonic() - start
+                    if ticket.granted:
+                        self._counts["admitted"] += 1
+                        self._total_wait += waited
+                        break
+                    if waited >= self.max_wait:
+                        self._withdraw(user, ticket)
+                        self._counts["shed"] += 1
+                        raise QueueFull(self._busy_message())
+                    position = self._position(user, ticket)
+                if report:
+                    report(position, self._estimate(position))
+                with self._lock:
+                    if not ticket.granted:
+                        self._changed.wait(min(REPORT_INTERVAL, self.max_wait - waited))
+            if report:
+                report(None, None)
+        except BaseException as error:
+            with self._lock:
+                self._withdraw(user, ticket)
+            if report and isinstance(error, QueueFull):
+                report(None, None)
+            raise
+        return waited
+
+    def release(self, seconds):
+        """
+        Give back a slot once a model call has finished.
+
+        Args:
+            seconds (float): How long the call held the slot, for wait estimates
+        """
+        with self._lock:
+            self._active -= 1
+            self._call_seconds = seconds if self._call_seconds is None else 0.8 * self._call_seconds + 0.2 * seconds
+            self._grant()
+
+    @contextmanager
+    def slot(self, user, report=None):
+        """Hold a slot for the duration of a model call; arguments as for acquire."""
+        self.acquire(user, report)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def position(self, user):
+        """
+        Get the place in line of a user's next waiting call.
+
+        Returns:
+            tuple: (position, seconds), or None if the user has no call waiting
+        """
+        with self._lock:
+            tickets = self._waiting.get(user)
+            if not tickets:
+                return None
+            position = self._position(user, tickets[0])
+            return position, self._estimate(position)
+
+    def _busy_message(self):
+        return (f"Teacher Magic is very busy right now and your request could not be started within "
+                f"{self.max_wait:.0f} seconds. Please try again in a minute.")
+
+    def stats(self):
+        """
+        Get the queue's current state and counters since start-up.
+
+        Returns:
+            dict: Slots in use and allowed, calls and users waiting, calls admitted,
+            queued and turned away, the average and peak queue, and the average call time
+        """
+        with self._lock:
+            return {
+                "active": self._active,
+                "max_concurrent": self.max_concurrent,
+                "waiting": self._waiting_count(),
+                "users_waiting": len(self._waiting),
+                "peak_waiting": self._peak_waiting,
+                "admitted": self._counts["admitted"],
+                "queued": self._counts["queued"],
+                "shed": self._counts["shed"],
+                "avg_wait_s": round(self._total_wait / self._counts["queued"], 2) if self._counts["queued"] else 0.0,
+                "avg_call_s": round(self._call_seconds, 2) if self._call_seconds is not None else None,
+            }
+
+def get_admission_controller():
+    """Get the process-wide admission controller, creating it on first use."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
+
+def set_session(user, report=None):
+    """
+    Identify the user of the current script run and how to show them their place in line.
+
+    Model calls made from this context (including worker threads started through
+    contextvars.copy_context) queue as this user. The report callback is only
+    called from the thread that set it.
+
+    Args:
+        user (str): Session identifier
+        report (callable): Called as report(position, seconds) while a call waits,
+            and as report(None, None) once it no longer does
+    """
+    _session.set({"user": user, "report": report, "thread": threading.get_ident()})
+
+def current_user(api_key):
+    """Return the user for the current context; calls outside a session queue by API key."""
+    session = _session.get()
+    return session["user"] if session else make_key("admission", api_key)
+
+def _reporter():
+    """The current session's report callback, if this is the thread that may use it."""
+    session = _session.get()
+    if session and session["thread"] == threading.get_ident():
+        return session["report"]
+    return None
+
+@contextmanager
+def model_call_slot(api_key):
+    """
+    Hold one of the app's model call slots, waiting in line for it if need be.
+
+    Args:
+        api_key (str): The API key of the call, identifying the user outside a session
+
+    Raises:
+        QueueFull: If the call could not be started within the maximum wait
+    """
+    with get_admission_controller().slot(current_user(api_key), _reporter()):
+        yield
+
+def report_waiting(api_key):
+    """
+    Show the current user their place in line while worker threads wait for slots.
+
+    Args:
+        api_key (str): The API key of the calls, as for model_call_slot
+    """
+    report = _reporter()
+    if report:
+        waiting = get_admission_controller().position(current_user(api_key))
+        report(*(waiting or (None, None)))
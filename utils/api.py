@@ -1,35 +1,336 @@
 # utils/api.py
+import os
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
 from google import genai
+from google.genai import types
+from utils.admission import REPORT_INTERVAL, QueueFull, model_call_slot, report_waiting
+from utils.cache import get_cache, make_key
+from utils.key_pool import NoKeyAvailable, classify_error, get_key_pool, lease_api_key
+
+MODEL_NAME = "gemini-2.0-flash"
+ERROR_PREFIX = "Error calling Gemini API:"
+
+# Model responses shared across sessions, for callers that opt in to caching
+response_cache = get_cache("responses", ttl=30 * 24 * 3600, max_bytes=500 * 1024 * 1024)
+
+# Sampling and length settings per tool, applied by generation_config. The output cap
+# (max_output_tokens) is either fixed, looked up by the tool's size option, or
+# base_tokens plus tokens_per_item for each question, word or paragraph requested.
+# Caps allow about twice the length the prompt asks for, so only runaway output is cut.
+GENERATION_PROFILES = {
+    "Text Generator": {"temperature": 0.8, "max_output_tokens": 900},
+    "Text Rewriter": {"temperature": 0.5, "base_tokens": 200, "tokens_per_item": 3},
+    "Academic Content": {"temperature": 0.5, "max_output_tokens": 3000},
+    "Lesson Plan Generator": {"temperature": 0.7, "max_output_tokens": 3000},
+    "Unit Plan Generator": {"temperature": 0.6, "max_output_tokens": 4000},
+    "MCQ Generator": {"temperature": 0.4, "base_tokens": 100, "tokens_per_item": 200},
+    "HOT Questions": {"temperature": 0.7, "base_tokens": 100, "tokens_per_item": 1100},  # Per question, with stems and guidance
+    "Text Dependent Questions": {"temperature": 0.5, "base_tokens": 200, "tokens_per_item": 250},
+    "DOK Questions": {"temperature": 0.5, "base_tokens": 100, "tokens_per_item": 300},
+    "YouTube Video Questions": {"temperature": 0.4, "base_tokens": 200, "tokens_per_item": 250},
+    "Vocabulary Focus": {"temperature": 0.5, "base_tokens": 300, "tokens_per_item": 350},
+    "Text Proofreader": {"temperature": 0.2, "base_tokens": 300, "tokens_per_item": 3},
+    "IEP Goal Responder": {"temperature": 0.5, "max_output_tokens": 2500},
+    "Standards Unpacker": {"temperature": 0.3, "max_output_tokens": 2500},
+    "Image Generator": {"temperature": 0.9, "max_output_tokens": 800},
+    "Email Responder": {"temperature": 0.7, "max_output_tokens": {
+        "Brief (1-2 paragraphs)": 400, "Standard (3-4 paragraphs)": 800, "Detailed (5+ paragraphs)": 1500}},
+    "Email Template Maker": {"temperature": 0.7, "max_output_tokens": 1200},
+    "Song Generator": {"temperature": 1.0, "max_output_tokens": {
+        "Short (1 verse + chorus)": 700, "Medium (2 verses + chorus)": 1000, "Full Song (3+ verses + chorus)": 1500}},
+}
+
+def generation_config(tool, size=None, items=None):
+    """
+    Build the generation settings for a tool's request from its profile.
+
+    Args:
+        tool (str): Tool name, as in GENERATION_PROFILES
+        size (str): The tool's size option (e.g. the Email Responder's response length)
+        items (int): Number of questions, words or input words requested, for
+            profiles that scale with it
+
+    Returns:
+        types.GenerateContentConfig: The settings, or None for tools without a profile
+    """
+    profile = GENERATION_PROFILES.get(tool)
+    if not profile:
+        return None
+    max_tokens = profile.get("max_output_tokens")
+    if isinstance(max_tokens, dict):
+        max_tokens = max_tokens.get(size)
+    if max_tokens is None and items and "tokens_per_item" in profile:
+        max_tokens = profile.get("base_tokens", 0) + profile["tokens_per_item"] * items
+    return types.GenerateContentConfig(temperature=profile.get("temperature"), max_output_tokens=max_tokens,
+                                       stop_sequences=profile.get("stop_sequences"))
 
 def configure_api(api_key):
-    """Configure the Gemini API with the provided key."""
-    return api_key is not None and api_key != ""
+    """Return True if model calls can be made: with the teacher's own key, or else with a school key."""
+    return bool(api_key) or len(get_key_pool()) > 0
 
-def call_gemini_api(prompt, api_key):
+def create_client(api_key):
+    """
+    Create a Gemini client for the given key.
+
+    Set the GEMINI_API_BASE_URL environment variable to point the app at a
+    different endpoint (e.g. the stub model server used for load testing).
+
+    Args:
+        api_key (str): The API key for Gemini
+
+    Returns:
+        genai.Client: A configured client
+    """
+    base_url = os.environ.get("GEMINI_API_BASE_URL")
+    if base_url:
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=base_url))
+    return genai.Client(api_key=api_key)
+
+def call_gemini_api(prompt, api_key, config=None):
     """
     Call the Gemini 2.0 Flash model with the given prompt.
-    
+
     Args:
         prompt (str): The prompt to send to the model
-        api_key (str): The API key for Gemini
-        
+        api_key (str): The teacher's API key for Gemini, or "" to use a school key
+        config (types.GenerateContentConfig): Generation settings, from generation_config
+
     Returns:
         str: The generated text response
     """
     if not configure_api(api_key):
         return None
-    
+
     try:
         # Create a client with the user's API key
-        client = genai.Client(api_key=api_key)
-        
-        # Call the Gemini 2.0 Flash model specifically
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
-        )
-        
+        # Call the Gemini 2.0 Flash model specifically, once one of the app's call slots is free,
+        # with the teacher's own key or else the school key with most quota left
+        with model_call_slot(api_key):
+            for attempt in range(2):
+                try:
+                    with lease_api_key(api_key) as key:
+                        client = create_client(key)
+                        response = client.models.generate_content(
+                            model=MODEL_NAME,
+                            contents=prompt,
+                            config=config
+                        )
+                    break
+                except Exception as e:
+                    # A school key that was rate-limited or rejected is now left out; try another once
+                    if api_key or attempt or not classify_error(e):
+                        raise
+
         # Return the text response
         return response.text
     except Exception as e:
-        return f"Error calling Gemini API: {e}"
+        return f"{ERROR_PREFIX} {e}"
+
+def is_api_error(result):
+    """Return True if a call_gemini_api result is missing or an error message."""
+    return not result or result.startswith(ERROR_PREFIX)
+
+def call_gemini_api_cached(prompt, api_key, cache_key=None, config=None):
+    """
+    Call the model, reusing a shared cached response when one exists.
+
+    Error responses are never cached.
+
+    Args:
+        prompt (str): The prompt to send to the model
+        api_key (str): The API key for Gemini
+        cache_key (str): Key to cache under; defaults to a hash of the model, prompt
+            and generation settings
+        config (types.GenerateContentConfig): Generation settings, from generation_config
+
+    Returns:
+        str: The generated text response
+    """
+    if cache_key:
+        key = cache_key
+    elif config is None:
+        key = make_key("prompt", MODEL_NAME, prompt)
+    else:
+        key = make_key("prompt", MODEL_NAME, prompt, config.model_dump(mode="json", exclude_none=True))
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    result = call_gemini_api(prompt, api_key, config)
+    if not is_api_error(result):
+        response_cache.set(key, result)
+    return result
+
+def call_gemini_api_concurrent(prompts, api_key, max_workers=4, cache_keys=None, config=None):
+    """
+    Send several prompts in parallel with bounded concurrency.
+
+    Results are yielded as they complete so the caller can render them as they
+    arrive. Only the calling thread should touch Streamlit elements.
+
+    Args:
+        prompts (list): Prompts to send
+        api_key (str): The API key for Gemini
+        max_workers (int): Maximum number of requests in flight
+        cache_keys (list): Optional cache key per prompt; when given, responses
+            are read from and written to the shared response cache
+        config (types.GenerateContentConfig): Generation settings for every prompt
+
+    Yields:
+        tuple: (index, result) for each prompt, in completion order
+    """
+    if not prompts:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as executor:
+        if cache_keys is None:
+            futures = {executor.submit(copy_context().run, call_gemini_api, prompt, api_key, config): i
+                       for i, prompt in enumerate(prompts)}
+        else:
+            futures = {executor.submit(copy_context().run, call_gemini_api_cached, prompt, api_key, cache_keys[i],
+                                       config): i
+                       for i, prompt in enumerate(prompts)}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=REPORT_INTERVAL, return_when=FIRST_COMPLETED)
+            report_waiting(api_key)
+            for future in done:
+                yield futures[future], future.result()
+
+def stream_gemini_api(prompt, api_key, config=None):
+    """
+    Stream the model's response to a prompt.
+
+    Closing the generator ends the request, so output that is no longer needed
+    is not generated (or paid for).
+
+    Args:
+        prompt (str): The prompt to send to the model
+        api_key (str): The API key for Gemini
+        config (types.GenerateContentConfig): Generation settings, from generation_config
+
+    Yields:
+        str: Text chunks as they arrive; if the request fails, an error message last
+    """
+    if not configure_api(api_key):
+        return
+    stream = None
+    try:
+        # The call slot is held until the stream ends or is closed
+        with model_call_slot(api_key), lease_api_key(api_key) as key:
+            stream = create_client(key).models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=prompt,
+                config=config
+            )
+            for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+    except Exception as e:
+        yield f"{ERROR_PREFIX} {e}"
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+
+def stream_gemini_api_concurrent(prompts, api_key, stopped, max_workers=4, config=None):
+    """
+    Stream several prompts in parallel with bounded concurrency.
+
+    Chunks from all the streams are yielded in arrival order, in the calling
+    thread, so the caller can parse and render them as they come in.
+
+    Args:
+        prompts (list): Prompts to send
+        api_key (str): The API key for Gemini
+        stopped (set): Indexes of streams to end early; the caller adds to it while
+            consuming, and a stream ends before its next chunk
+        max_workers (int): Maximum number of requests in flight
+        config (types.GenerateContentConfig): Generation settings for every prompt
+
+    Yields:
+        tuple: (index, chunk) per chunk, as from stream_gemini_api, and (index, None)
+        when a stream has ended
+    """
+    if not prompts:
+        return
+    chunks = queue.Queue()
+
+    def run(index):
+        if index in stopped:
+            chunks.put((index, None))
+            return
+        stream = stream_gemini_api(prompts[index], api_key, config)
+        try:
+            for chunk in stream:
+                if index in stopped:
+                    break
+                chunks.put((index, chunk))
+        finally:
+            stream.close()
+            chunks.put((index, None))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as executor:
+        for index in range(len(prompts)):
+            executor.submit(copy_context().run, run, index)
+        try:
+            remaining = len(prompts)
+            while remaining:
+                try:
+                    index, chunk = chunks.get(timeout=REPORT_INTERVAL)
+                except queue.Empty:
+                    report_waiting(api_key)
+                    continue
+                remaining -= chunk is None
+                yield index, chunk
+        finally:
+            stopped.update(range(len(prompts)))
+
+def _candidate_text(candidate):
+    """Join the text parts of a response candidate."""
+    content = getattr(candidate, "content", None)
+    parts = getattr(content, "parts", None) or []
+    return "".join(getattr(part, "text", None) or "" for part in parts)
+
+def call_gemini_api_variants(prompt, api_key, count, config=None):
+    """
+    Generate several alternative responses to one prompt.
+
+    The candidates are requested in a single call (candidate_count), so they arrive
+    for the latency of one request. If the model returns fewer candidates than asked
+    for, or rejects candidate_count, the rest are generated by parallel calls.
+
+    Args:
+        prompt (str): The prompt to send to the model
+        api_key (str): The API key for Gemini
+        count (int): Number of variants wanted
+        config (types.GenerateContentConfig): Generation settings, from generation_config
+
+    Returns:
+        list: Up to count distinct responses; a single error message if none could be generated
+    """
+    if not configure_api(api_key):
+        return []
+    if count <= 1:
+        return [call_gemini_api(prompt, api_key, config)]
+
+    variants = []
+    try:
+        with model_call_slot(api_key), lease_api_key(api_key) as key:
+            response = create_client(key).models.generate_content(
+                model=MODEL_NAME,
+                contents=prompt,
+                config=(config or types.GenerateContentConfig()).model_copy(update={"candidate_count": count})
+            )
+        variants = [text for text in (_candidate_text(c) for c in response.candidates or []) if text]
+    except (QueueFull, NoKeyAvailable) as e:
+        return [f"{ERROR_PREFIX} {e}"]
+    except Exception:
+        variants = []
+
+    missing = count - len(variants)
+    errors = []
+    if missing > 0:
+        for _, result in call_gemini_api_concurrent([prompt] * missing, api_key, max_workers=missing, config=config):
+            (errors if is_api_error(result) else variants).append(result)
+    variants = list(dict.fromkeys(variants))[:count]
+    return variants or errors[:1]
@@ -0,0 +1,448 @@
+# utils/batch.py
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from google.genai import types
+from utils.api import ERROR_PREFIX, MODEL_NAME, call_gemini_api_concurrent, create_client, is_api_error
+from utils.cache import DEFAULT_CACHE_DIR, make_key
+from utils.question_bank import get_question_bank
+from utils.questions import is_complete_mcq, parse_dok_blocks, parse_question_blocks
+
+_queue = None
+_queue_lock = threading.Lock()
+
+# Provider job states after which a job's results (or its failure) are final
+FINISHED_STATES = ("JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED", "JOB_STATE_FAILED",
+                   "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED")
+SUCCEEDED_STATES = ("JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED")
+
+def batch_owner(api_key):
+    """Identify a teacher's queued requests by a hash of their API key (the key itself is never stored)."""
+    return make_key("batch_owner", api_key)
+
+def batch_directory():
+    """Directory for batch job files."""
+    return os.path.join(os.environ.get("TEACHER_MAGIC_CACHE_DIR", DEFAULT_CACHE_DIR), "batches")
+
+def write_job_file(requests, path):
+    """
+    Write queued requests as a batch job file: one JSON request per line, keyed by request id.
+
+    Args:
+        requests (list): Dicts with "id" and "prompt"
+        path (str): File to write
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            line = {"key": str(request["id"]),
+                    "request": {"contents": [{"role": "user", "parts": [{"text": request["prompt"]}]}]}}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+def read_job_file(path):
+    """Return (key, prompt) pairs from a batch job file."""
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return [(line["key"], "".join(part.get("text", "") for content in line["request"]["contents"]
+                                  for part in content.get("parts", []))) for line in lines]
+
+def parse_result_lines(data):
+    """
+    Read a batch results file.
+
+    Args:
+        data (bytes or str): JSON lines with "key" and either "response" or "error"
+
+    Returns:
+        dict: Response text (or an error message) by key
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    results = {}
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if item.get("error"):
+            results[item["key"]] = f"{ERROR_PREFIX} {item['error']}"
+            continue
+        candidates = (item.get("response") or {}).get("candidates") or []
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        text = "".join(part.get("text", "") for part in parts)
+        results[item["key"]] = text or f"{ERROR_PREFIX} empty response"
+    return results
+
+class GeminiBatchBackend:
+    """Submits job files to the Gemini Batch API, which is billed at a discount and has its own quota."""
+
+    name = "gemini"
+
+    def submit(self, path, api_key, display_name):
+        """Upload a job file and start a batch job; returns the job name."""
+        client = create_client(api_key)
+        uploaded = client.files.upload(file=path, config=types.UploadFileConfig(display_name=display_name,
+                                                                                mime_type="jsonl"))
+        job = client.batches.create(model=MODEL_NAME, src=uploaded.name,
+                                    config=types.CreateBatchJobConfig(display_name=display_name))
+        return job.name
+
+    def poll(self, job_name, api_key):
+        """
+        Check on a batch job.
+
+        Returns:
+            tuple: (state, results, error); results is a dict of text by key once the
+            job has succeeded, otherwise None
+        """
+        client = create_client(api_key)
+        job = client.batches.get(name=job_name)
+        state = getattr(job.state, "name", str(job.state))
+        if state not in SUCCEEDED_STATES:
+            error = getattr(job.error, "message", None) or (state if state in FINISHED_STATES else None)
+            return state, None, error
+        dest = job.dest
+        if getattr(dest, "file_name", None):
+            return state, parse_result_lines(client.files.download(file=dest.file_name)), None
+        results = {}
+        for i, item in enumerate(getattr(dest, "inlined_responses", None) or []):
+            key = (item.metadata or {}).get("key", str(i)) if getattr(item, "metadata", None) else str(i)
+            results[key] = item.response.text if item.response and item.response.text else \
+                f"{ERROR_PREFIX} {getattr(item.error, 'message', 'empty response')}"
+        return state, results, None
+
+class LocalBatchBackend:
+    """
+    Stand-in for the Batch API that answers a job file with ordinary calls.
+
+    The job runs when it is submitted and its results are written next to the job
+    file, so the queue, polling and delivery can be exercised offline (e.g. with the
+    fake model backend in benchmarks/).
+    """
+
+    name = "local"
+
+    def submit(self, path, api_key, display_name):
+        requests = read_job_file(path)
+        results = {}
+        for index, result in call_gemini_api_concurrent([prompt for _, prompt in requests], api_key):
+            results[requests[index][0]] = result
+        with open(path + ".results", "w", encoding="utf-8") as f:
+            for key, _ in requests:
+                text = results.get(key)
+                line = {"key": key, "error": text or "no response"} if is_api_error(text) else \
+                    {"key": key, "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]}}
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        return path
+
+    def poll(self, job_name, api_key):
+        if not os.path.exists(job_name + ".results"):
+            return "JOB_STATE_FAILED", None, "results file missing"
+        with open(job_name + ".results", encoding="utf-8") as f:
+            return "JOB_STATE_SUCCEEDED", parse_result_lines(f.read()), None
+
+def get_batch_backend(name=None):
+    """
+    Get the batch backend: the Gemini Batch API, or the local stand-in when the
+    TEACHER_MAGIC_BATCH_BACKEND environment variable (or name) is "local".
+    """
+    name = name or os.environ.get("TEACHER_MAGIC_BATCH_BACKEND", "gemini")
+    return LocalBatchBackend() if name == "local" else GeminiBatchBackend()
+
+def apply_target(target, result):
+    """
+    Store a finished batch result where its request asked for it.
+
+    Args:
+        target (dict): None, or {"question_bank": "mcq" or "dok", "topic", "language"}
+            plus the optional "reading_age", "grade", "subject" and "level"
+        result (str): The model's response
+
+    Returns:
+        int: Number of questions added to the question bank
+    """
+    if not target or is_api_error(result):
+        return 0
+    kind = target.get("question_bank")
+    if kind == "mcq":
+        questions = [{"question": block["question"], "block": block["raw"], "concepts": block["concepts"]}
+                     for block in parse_question_blocks(result) if is_complete_mcq(block)]
+    elif kind == "dok":
+        questions = [{"question": block["question"], "block": block["raw"], "concepts": block["concepts"],
+                      "level": target.get("level")} for block in parse_dok_blocks(result)]
+    else:
+        return 0
+    return get_question_bank().add_questions(kind, questions, target["topic"], target["language"],
+                                             reading_age=target.get("reading_age"), grade=target.get("grade"),
+                                             subject=target.get("subject"))
+
+class BatchQueue:
+    """
+    Requests deferred to a batch job, shared by all sessions.
+
+    Teachers queue requests from the tool forms ("queue for tonight"); the batch
+    CLI submits everything queued as one job file, polls the job, stores the
+    results (in the question bank, if the request asked for it) and each teacher's
+    results are added to their history the next time they open the app.
+    """
+
+    def __init__(self, path=None, backend=None):
+        """
+        Args:
+            path (str): Database file; defaults to batch_queue.sqlite3 in the cache directory
+            backend: Batch backend; defaults to get_batch_backend()
+        """
+        self._path = path
+        self.backend = backend or get_batch_backend()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path:
+            return self._path
+        directory = os.environ.get("TEACHER_MAGIC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        return os.path.join(directory, "batch_queue.sqlite3")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS requests (
+                    id INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    tool TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    inputs TEXT NOT NULL,
+                    target TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    job TEXT,
+                    result TEXT,
+                    delivered INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    completed REAL
+                );
+                CREATE INDEX IF NOT EXISTS requests_status ON requests (status, job);
+                CREATE INDEX IF NOT EXISTS requests_owner ON requests (owner, delivered);
+                CREATE TABLE IF NOT EXISTS jobs (
+                    name TEXT PRIMARY KEY,
+                    backend TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    requests INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    completed REAL
+                );
+            """)
+            self._local.conn = conn
+        return conn
+
+    def add(self, owner, tool, prompt, inputs, target=None):
+        """
+        Queue a request for the next batch job.
+
+        Args:
+            owner (str): batch_owner() of the teacher whose history gets the result
+            tool (str): Tool name, for the history entry
+            prompt (str): The prompt
+            inputs (dict): Inputs for the history entry
+            target (dict): Where else to store the result, as for apply_target
+
+        Returns:
+            int: The request id
+        """
+        with self._write_lock:
+            return self._connection().execute(
+                "INSERT INTO requests (owner, tool, prompt, inputs, target, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (owner, tool, prompt, json.dumps(inputs), json.dumps(target) if target else None,
+                 time.time())).lastrowid
+
+    def submit(self, api_key, limit=10000):
+        """
+        Submit queued requests as one batch job.
+
+        Args:
+            api_key (str): API key the job is billed to
+            limit (int): Maximum number of requests in the job
+
+        Returns:
+            tuple: (job name, number of requests); (None, 0) if nothing is queued
+        """
+        conn = self._connection()
+        requests = [dict(row) for row in conn.execute(
+            "SELECT id, prompt FROM requests WHERE status = 'queued' ORDER BY id LIMIT ?", (limit,))]
+        if not requests:
+            return None, 0
+        display_name = f"teacher-magic-{time.strftime('%Y%m%d-%H%M%S')}-{requests[0]['id']}"
+        path = os.path.join(batch_directory(), display_name + ".jsonl")
+        write_job_file(requests, path)
+        job = self.backend.submit(path, api_key, display_name)
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT INTO jobs (name, backend, state, requests, created) VALUES (?, ?, ?, ?, ?)",
+                             (job, self.backend.name, "JOB_STATE_PENDING", len(requests), time.time()))
+                conn.executemany("UPDATE requests SET status = 'submitted', job = ? WHERE id = ?",
+                                 [(job, request["id"]) for request in requests])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job, len(requests)
+
+    def poll(self, api_key):
+        """
+        Check every unfinished job and store the results of those that have finished.
+
+        Returns:
+            dict: Counts of "finished" jobs, "done" and "failed" requests, questions
+            "banked", and jobs still "running"
+        """
+        conn = self._connection()
+        summary = {"finished": 0, "done": 0, "failed": 0, "banked": 0, "running": 0}
+        for job in conn.execute(f"SELECT name FROM jobs WHERE state NOT IN ({', '.join('?' for _ in FINISHED_STATES)})",
+                                FINISHED_STATES).fetchall():
+            state, results, error = self.backend.poll(job["name"], api_key)
+            if state not in FINISHED_STATES:
+                summary["running"] += 1
+                with self._write_lock:
+                    conn.execute("UPDATE jobs SET state = ? WHERE name = ?", (state, job["name"]))
+                continue
+            summary["finished"] += 1
+            requests = conn.execute("SELECT id, target FROM requests WHERE job = ? AND status = 'submitted'",
+                                    (job["name"],)).fetchall()
+            updates = []
+            for request in requests:
+                result = (results or {}).get(str(request["id"])) or f"{ERROR_PREFIX} batch job {error or state}"
+                failed = is_api_error(result)
+                summary["failed" if failed else "done"] += 1
+                if not failed:
+                    summary["banked"] += apply_target(json.loads(request["target"]) if request["target"] else None,
+                                                      result)
+                updates.append(("failed" if failed else "done", result, time.time(), request["id"]))
+            with self._write_lock:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany("UPDATE requests SET status = ?, result = ?, completed = ? WHERE id = ?", updates)
+                    conn.execute("UPDATE jobs SET state = ?, completed = ? WHERE name = ?",
+                                 (state, time.time(), job["name"]))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        return summary
+
+    def take_results(self, owner):
+        """
+        Return a teacher's finished requests that have not been delivered yet, marking them delivered.
+
+        Returns:
+            list: Dicts with "tool", "inputs", "result" and "status" ("done" or "failed")
+        """
+        conn = self._connection()
+        with self._write_lock:
+            rows = conn.execute("SELECT id, tool, inputs, result, status FROM requests "
+                                "WHERE owner = ? AND delivered = 0 AND status IN ('done', 'failed') ORDER BY id",
+                                (owner,)).fetchall()
+            conn.executemany("UPDATE requests SET delivered = 1 WHERE id = ?", [(row["id"],) for row in rows])
+        return [{"tool": row["tool"], "inputs": json.loads(row["inputs"]), "result": row["result"],
+                 "status": row["status"]} for row in rows]
+
+    def stats(self, owner=None):
+        """Return request counts by status, for one teacher or everyone."""
+        query = "SELECT status, COUNT(*) FROM requests" + (" WHERE owner = ?" if owner else "") + " GROUP BY status"
+        counts = {"queued": 0, "submitted": 0, "done": 0, "failed": 0}
+        counts.update(dict(self._connection().execute(query, (owner,) if owner else ()).fetchall()))
+        return counts
+
+def get_batch_queue(path=None):
+    """
+    Get the process-wide batch queue, creating it on first use.
+
+    Args:
+        path (str): Database file, used only when the queue is created
+
+    Returns:
+        BatchQueue: The shared queue
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = BatchQueue(path)
+        return _queue
+
+def deliver_batch_results(session_state):
+    """
+    Add this teacher's finished batch results to the session history.
+
+    Args:
+        session_state: The Streamlit session state
+
+    Returns:
+        int: Number of results added
+    """
+    from utils.data import save_to_history
+
+    if not session_state.get('api_key'):
+        return 0
+    results = get_batch_queue().take_results(batch_owner(session_state['api_key']))
+    for item in results:
+        save_to_history(session_state, f"{item['tool']} (queued)", item["inputs"], item["result"])
+    return len(results)
+
+def main(argv=None):
+    """Batch CLI: python -m utils.batch {submit,poll,run,status,queue}"""
+    parser = argparse.ArgumentParser(description="Run Teacher Magic's deferred (batch) requests.")
+    parser.add_argument("--backend", choices=["gemini", "local"], help="Batch backend (default: gemini, or "
+                        "the TEACHER_MAGIC_BATCH_BACKEND environment variable)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit = commands.add_parser("submit", help="Submit all queued requests as one batch job")
+    submit.add_argument("--limit", type=int, default=10000, help="Maximum requests per job")
+    poll = commands.add_parser("poll", help="Collect the results of finished jobs")
+    poll.add_argument("--wait", action="store_true", help="Keep polling until every job has finished")
+    poll.add_argument("--interval", type=float, default=60, help="Seconds between polls with --wait")
+    run = commands.add_parser("run", help="Submit queued requests, then wait for and collect the results")
+    run.add_argument("--limit", type=int, default=10000, help="Maximum requests per job")
+    run.add_argument("--interval", type=float, default=60, help="Seconds between polls")
+    commands.add_parser("status", help="Show request counts")
+    queue = commands.add_parser("queue", help="Queue requests from a JSON lines file")
+    queue.add_argument("file", help='One request per line: {"tool", "prompt", "inputs", "target"}')
+    args = parser.parse_args(argv)
+
+    queue_store = BatchQueue(backend=get_batch_backend(args.backend))
+    if args.command == "status":
+        print(", ".join(f"{status}: {count}" for status, count in queue_store.stats().items()))
+        return 0
+    if args.command == "queue":
+        with open(args.file, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        for line in lines:
+            queue_store.add("cli", line.get("tool", "Batch"), line["prompt"], line.get("inputs", {}), line.get("target"))
+        print(f"{len(lines)} requests queued.")
+        return 0
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        parser.error("set GEMINI_API_KEY to submit or poll batch jobs")
+    if args.command in ("submit", "run"):
+        job, count = queue_store.submit(api_key, args.limit)
+        print(f"Submitted {count} requests as {job}." if job else "Nothing queued.")
+    if args.command in ("poll", "run"):
+        wait = args.command == "run" or args.wait
+        while True:
+            summary = queue_store.poll(api_key)
+            print(f"{summary['finished']} jobs finished ({summary['done']} results, {summary['failed']} failed, "
+                  f"{summary['banked']} questions banked); {summary['running']} still running.")
+            if not wait or not summary["running"]:
+                break
+            time.sleep(args.interval)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
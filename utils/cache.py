@@ -0,0 +1,156 @@
+# utils/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def make_key(*parts):
+    """
+    Build a stable cache key from any JSON-serialisable values.
+
+    Args:
+        *parts: Values identifying the cached item (strings, numbers, lists, dicts)
+
+    Returns:
+        str: A hex SHA-256 digest of the parts
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """
+    A compressed key/value cache stored in SQLite, shared by all sessions and processes.
+
+    Values must be JSON-serialisable. Entries expire after their TTL, and the least
+    recently used entries are evicted once the cache grows beyond ``max_bytes``.
+    """
+
+    def __init__(self, name, ttl=None, max_bytes=100 * 1024 * 1024, directory=None):
+        """
+        Args:
+            name (str): Name of the cache; used as the database file name
+            ttl (float): Default time-to-live in seconds, None for no expiry
+            max_bytes (int): Size cap for the stored (compressed) values
+            directory (str): Where to store the database; defaults to the
+                TEACHER_MAGIC_CACHE_DIR environment variable or ./.cache
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._directory = directory
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    @property
+    def path(self):
+        directory = self._directory or os.environ.get("TEACHER_MAGIC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        return os.path.join(directory, f"{self.name}.sqlite3")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires REAL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key``, or ``default`` if it is missing or expired."""
+        conn = self._connection()
+        row = conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        now = time.time()
+        if row[1] is not None and row[1] < now:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return default
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value.
+
+        Args:
+            key (str): Cache key, usually built with make_key
+            value: JSON-serialisable value
+            ttl (float): Time-to-live in seconds, overriding the cache default
+        """
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires = now + ttl if ttl else None
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                         (key, blob, len(blob), expires, now))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until the cache is back under 90% of the cap
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def delete(self, key):
+        """Remove a single entry."""
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        """Remove every entry."""
+        self._connection().execute("DELETE FROM entries")
+
+    def stats(self):
+        """
+        Get the number of entries and their compressed size.
+
+        Returns:
+            dict: {"entries": int, "bytes": int}
+        """
+        count, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": size}
+
+def get_cache(name, **kwargs):
+    """
+    Get the process-wide cache with the given name, creating it on first use.
+
+    Args:
+        name (str): Name of the cache
+        **kwargs: DiskCache options, used only when the cache is created
+
+    Returns:
+        DiskCache: The shared cache instance
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = DiskCache(name, **kwargs)
+        return _caches[name]
@@ -78,7 +78,7 @@ def load_educational_data():
     
     return strategies_df, blooms_df
 
-def save_to_history(session_state, tool_name, inputs, result):
+def save_to_history(session_state, tool_name, inputs, result, metrics=None):
     """
     Save a tool usage to the history in session state.
     
@@ -87,15 +87,21 @@ def save_to_history(session_state, tool_name, inputs, result):
         tool_name (str): Name of the tool used
         inputs (dict): Dictionary of user inputs
         result (str): Result generated by the tool
+        metrics (dict): Optional measurements of the result (e.g. readability scores)
     """
     from datetime import datetime
     
+    if session_state.get('result_run', {}).get('reused'):
+        return  # An unchanged request redrew its earlier result, which is already in the history
+    
     history_item = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "tool": tool_name,
         "inputs": inputs,
         "result": result
     }
+    if metrics:
+        history_item["metrics"] = metrics
     session_state['history'].insert(0, history_item)  # Add to the beginning
 
 def get_history_json(session_state):
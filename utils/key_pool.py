@@ -0,0 +1,232 @@
+# utils/key_pool.py
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from utils.cache import make_key
+
+# School API keys, used for teachers who have not entered their own: a comma-separated
+# list in TEACHER_MAGIC_API_KEYS, or a file named by TEACHER_MAGIC_API_KEYS_FILE with
+# one key per line, optionally followed by its requests-per-minute quota
+KEYS_ENV = "TEACHER_MAGIC_API_KEYS"
+KEYS_FILE_ENV = "TEACHER_MAGIC_API_KEYS_FILE"
+# Requests per minute allowed per key when the file does not say (the free-tier limit)
+DEFAULT_KEY_RPM = int(os.environ.get("TEACHER_MAGIC_KEY_RPM", "15"))
+# How long a key is left out after the API rate-limits or rejects it (seconds)
+RATE_LIMIT_COOLDOWN = 60
+AUTH_COOLDOWN = 3600
+# Longest a call waits for a key to have quota again once every key's minute is used up (seconds)
+MAX_KEY_WAIT = float(os.environ.get("TEACHER_MAGIC_MAX_KEY_WAIT", "10"))
+RETRY_DELAY_PATTERN = re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class NoKeyAvailable(Exception):
+    """Raised when every school key is out of use (rate-limited or rejected)."""
+
+def classify_error(error):
+    """
+    Tell whether a failed call says something about the key it used.
+
+    Args:
+        error (Exception): The error raised by the Gemini client
+
+    Returns:
+        str: "rate_limited" (HTTP 429 / quota exhausted), "auth" (invalid or
+        unauthorised key) or None for errors unrelated to the key
+    """
+    code = getattr(error, "code", None)
+    text = str(error)
+    if code == 429 or "RESOURCE_EXHAUSTED" in text:
+        return "rate_limited"
+    if code in (401, 403) or "API_KEY_INVALID" in text or "API key not valid" in text or "PERMISSION_DENIED" in text:
+        return "auth"
+    return None
+
+def load_keys():
+    """
+    Read the school keys from the environment.
+
+    Returns:
+        list: (key, requests_per_minute) pairs, without repeats
+    """
+    keys = {}
+    path = os.environ.get(KEYS_FILE_ENV)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                fields = line.split("#")[0].split()
+                if fields:
+                    keys.setdefault(fields[0], int(fields[1]) if len(fields) > 1 else DEFAULT_KEY_RPM)
+    for key in os.environ.get(KEYS_ENV, "").split(","):
+        if key.strip():
+            keys.setdefault(key.strip(), DEFAULT_KEY_RPM)
+    return list(keys.items())
+
+class KeyPool:
+    """
+    A pool of API keys that spreads calls by each key's remaining quota.
+
+    Each call takes the healthy key with the most requests left in the current
+    minute (ties go to the key with fewest calls in flight, then the least recently
+    used). When every key has used its quota, the call waits for the first one to
+    have quota again, up to max_wait. A key that is rate-limited is left out until
+    the API says it may be retried; a key that is rejected is left out for an hour.
+    """
+
+    def __init__(self, keys, max_wait=MAX_KEY_WAIT):
+        """
+        Args:
+            keys (list): (key, requests_per_minute) pairs
+            max_wait (float): Longest a call waits for a key with quota left, in seconds
+        """
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._keys = {key: {"id": make_key("api_key", key)[:8], "rpm": rpm, "recent": deque(), "in_flight": 0,
+                            "last_used": 0.0, "disabled_until": 0.0, "disabled_reason": None,
+                            "requests": 0, "errors": 0, "rate_limited": 0, "rejected": 0}
+                      for key, rpm in keys}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _remaining(self, entry, now):
+        """Requests the key has left in the last minute's window."""
+        while entry["recent"] and entry["recent"][0] <= now - 60:
+            entry["recent"].popleft()
+        return entry["rpm"] - len(entry["recent"])
+
+    def acquire(self):
+        """
+        Take the best key for a call; release it with release() when the call is over.
+
+        Returns:
+            str: The API key
+
+        Raises:
+            NoKeyAvailable: If every key is out of use, or has used its quota for the
+                minute and none will have quota again within max_wait
+        """
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                healthy = [(key, entry) for key, entry in self._keys.items() if entry["disabled_until"] <= now]
+                if not healthy:
+                    if not self._keys:
+                        raise NoKeyAvailable("No API key is set up. Please enter your Gemini API key in the sidebar.")
+                    wait = min(entry["disabled_until"] for entry in self._keys.values()) - now
+                    raise NoKeyAvailable(f"All school API keys are busy or unavailable; please try again in "
+                                         f"{wait:.0f} seconds, or enter your own Gemini API key in the sidebar.")
+                key, entry = max(healthy, key=lambda item: (self._remaining(item[1], now), -item[1]["in_flight"],
+                                                           -item[1]["last_used"]))
+                if self._remaining(entry, now) > 0:
+                    entry["recent"].append(now)
+                    entry["in_flight"] += 1
+                    entry["last_used"] = now
+                    entry["requests"] += 1
+                    return key
+                # Every key has used its quota: wait for the oldest call in a window to leave it
+                wait = min((entry["recent"][0] + 60 for _, entry in healthy if entry["recent"]), default=now + 60) - now
+                if now + wait > deadline:
+                    raise NoKeyAvailable(f"All school API keys have used their quota for this minute; please try "
+                                         f"again in {wait:.0f} seconds, or enter your own Gemini API key in the sidebar.")
+            time.sleep(max(0.0, wait) + 0.01)
+
+    def release(self, key, error=None):
+        """
+        Give a key back after a call, leaving it out for a while if the API refused it.
+
+        Args:
+            key (str): The key, as returned by acquire
+            error (Exception): The error the call raised, if any
+        """
+        with self._lock:
+            entry = self._keys[key]
+            entry["in_flight"] -= 1
+            if error is None:
+                return
+            entry["errors"] += 1
+            problem = classify_error(error)
+            if problem == "rate_limited":
+                entry["rate_limited"] += 1
+                delay = RETRY_DELAY_PATTERN.search(str(error))
+                cooldown = float(delay.group(1)) if delay else RATE_LIMIT_COOLDOWN
+            elif problem == "auth":
+                entry["rejected"] += 1
+                cooldown = AUTH_COOLDOWN
+            else:
+                return
+            entry["disabled_until"] = time.monotonic() + cooldown
+            entry["disabled_reason"] = problem
+
+    @contextmanager
+    def lease(self):
+        """Hold the best key for the duration of a call, reporting how the call went."""
+        key = self.acquire()
+        error = None
+        try:
+            yield key
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(key, error)
+
+    def stats(self):
+        """
+        Get usage per key (keys are identified by a short hash, never shown in full).
+
+        Returns:
+            list: Dicts with "key" (hash), "rpm", "used_last_minute", "in_flight",
+            "requests", "errors", "rate_limited", "rejected" and "unavailable_for_s"
+            (with "reason") for keys that are left out
+        """
+        with self._lock:
+            now = time.monotonic()
+            rows = []
+            for entry in self._keys.values():
+                rows.append({
+                    "key": entry["id"],
+                    "rpm": entry["rpm"],
+                    "used_last_minute": entry["rpm"] - self._remaining(entry, now),
+                    "in_flight": entry["in_flight"],
+                    "requests": entry["requests"],
+                    "errors": entry["errors"],
+                    "rate_limited": entry["rate_limited"],
+                    "rejected": entry["rejected"],
+                    "unavailable_for_s": max(0, round(entry["disabled_until"] - now)),
+                    "reason": entry["disabled_reason"] if entry["disabled_until"] > now else None,
+                })
+            return rows
+
+def get_key_pool():
+    """Get the process-wide pool of school keys, loading it on first use (it may be empty)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KeyPool(load_keys())
+        return _pool
+
+@contextmanager
+def lease_api_key(api_key):
+    """
+    Choose the key for a model call.
+
+    A teacher's own key always takes precedence; without one, a school key is
+    taken from the pool for the duration of the call.
+
+    Args:
+        api_key (str): The teacher's own key, or "" to use the school pool
+
+    Raises:
+        NoKeyAvailable: If there is no own key and no school key can be used
+    """
+    if api_key:
+        yield api_key
+        return
+    with get_key_pool().lease() as key:
+        yield key
@@ -0,0 +1,201 @@
+# utils/mail_merge.py
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+
+# Typed placeholders in a mail-merge template, e.g. {{student_name}}, {{mark:number}}, {{due_date:date}}
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_]\w*)\s*(?::\s*([A-Za-z]+)\s*)?\}\}")
+PLACEHOLDER_TYPES = ("text", "number", "date")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y")
+SUBJECT_PATTERN = re.compile(r"^\W*(?:subject|subjek|tajuk)\s*\**\s*[:：]\s*\**\s*(.*?)\s*\**\s*$", re.IGNORECASE)
+# Roster column whose (non-empty) value asks for that row's email to be reworded by the model
+CUSTOM_WORDING_COLUMN = "custom_wording"
+
+def normalise_column(name):
+    """Turn a roster column heading into a placeholder name, e.g. "Student Name" -> "student_name"."""
+    return re.sub(r"\W+", "_", (name or "").strip().lower()).strip("_")
+
+def parse_number(value):
+    """Return value as a float, or None if it is not a number."""
+    try:
+        return float(str(value).strip().replace(",", ""))
+    except ValueError:
+        return None
+
+def parse_date(value):
+    """Return value as a datetime, or None if it is not a date in a recognised format."""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format)
+        except ValueError:
+            continue
+    return None
+
+def format_value(value, value_type):
+    """Format a roster value for a placeholder of the given type."""
+    value = (value or "").strip()
+    if value_type == "number":
+        number = parse_number(value)
+        if number is not None:
+            return f"{number:g}" if number == int(number) else f"{number:.2f}".rstrip("0")
+    elif value_type == "date":
+        date = parse_date(value)
+        if date is not None:
+            return f"{date.day} {date:%B %Y}"
+    return value
+
+def read_roster(data):
+    """
+    Read a class roster CSV.
+
+    Args:
+        data (bytes or str): The CSV file contents, with a heading row
+
+    Returns:
+        tuple: (columns, rows) where columns maps each placeholder name to its inferred
+        type ("text", "number" or "date") and rows are dicts keyed by placeholder name
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    reader = csv.reader(io.StringIO(data))
+    headings = [normalise_column(heading) for heading in next(reader, [])]
+    rows = []
+    for values in reader:
+        if any(value.strip() for value in values):
+            rows.append({heading: (values[i].strip() if i < len(values) else "")
+                         for i, heading in enumerate(headings) if heading})
+
+    columns = {}
+    for heading in headings:
+        if not heading or heading in columns:
+            continue
+        values = [row[heading] for row in rows if row.get(heading)]
+        if values and all(parse_number(value) is not None for value in values):
+            columns[heading] = "number"
+        elif values and all(parse_date(value) is not None for value in values):
+            columns[heading] = "date"
+        else:
+            columns[heading] = "text"
+    return columns, rows
+
+def parse_placeholders(template):
+    """
+    List the placeholders used in a template.
+
+    Args:
+        template (str): Template text
+
+    Returns:
+        dict: Type by placeholder name, in order of first use ("text" when untyped)
+    """
+    placeholders = {}
+    for match in PLACEHOLDER_PATTERN.finditer(template or ""):
+        placeholders.setdefault(match.group(1).lower(), (match.group(2) or "text").lower())
+    return placeholders
+
+def validate_template(template, columns):
+    """
+    Check a template's placeholders against the roster.
+
+    Args:
+        template (str): Template text
+        columns (dict): Placeholder type by roster column, from read_roster
+
+    Returns:
+        list: Problems found, as sentences; empty if the template can be merged
+    """
+    problems = []
+    placeholders = parse_placeholders(template)
+    if not placeholders:
+        problems.append("The template has no placeholders.")
+    for name, value_type in placeholders.items():
+        if value_type not in PLACEHOLDER_TYPES:
+            problems.append(f"{{{{{name}:{value_type}}}}} has an unknown type; use one of {', '.join(PLACEHOLDER_TYPES)}.")
+        elif name not in columns or name == CUSTOM_WORDING_COLUMN:
+            problems.append(f"{{{{{name}}}}} is not a roster column.")
+        elif value_type != "text" and columns[name] != value_type:
+            problems.append(f"{{{{{name}:{value_type}}}}} expects a {value_type}, but the roster column holds {columns[name]}s.")
+    leftover = PLACEHOLDER_PATTERN.sub("", template or "")
+    if "{{" in leftover or "}}" in leftover or re.search(r"\[[A-Z][A-Za-z ]*\]", leftover):
+        problems.append("The template has malformed or unfilled placeholders (e.g. unmatched braces or [Name]).")
+    return problems
+
+def compile_template(template):
+    """
+    Compile a template into a fast renderer.
+
+    The template is split once into literal text and placeholders, so rendering a
+    row is a single join.
+
+    Args:
+        template (str): Template text
+
+    Returns:
+        callable: Function of a roster row that returns the filled-in text
+    """
+    parts = PLACEHOLDER_PATTERN.split(template or "")
+    literals = parts[0::3]
+    fields = [(name.lower(), (value_type or "text").lower()) for name, value_type in zip(parts[1::3], parts[2::3])]
+
+    def render(row):
+        pieces = [literals[0]]
+        for (name, value_type), literal in zip(fields, literals[1:]):
+            pieces.append(format_value(row.get(name, ""), value_type))
+            pieces.append(literal)
+        return "".join(pieces)
+    return render
+
+def split_subject(email):
+    """
+    Separate a "Subject:" line from the rest of an email.
+
+    Returns:
+        tuple: (subject, body); subject is "" if the email has no Subject: line
+    """
+    lines = (email or "").strip().splitlines()
+    for i, line in enumerate(lines[:3]):
+        match = SUBJECT_PATTERN.match(line)
+        if match:
+            return match.group(1), "\n".join(lines[:i] + lines[i + 1:]).strip()
+    return "", (email or "").strip()
+
+def merge_rows(template, rows):
+    """
+    Fill in the template for every roster row.
+
+    Returns:
+        list: One email per row
+    """
+    render = compile_template(template)
+    return [render(row) for row in rows]
+
+def build_bundle(rows, emails, label_column=None):
+    """
+    Package merged emails for download.
+
+    The zip holds emails.csv (the roster with subject and body columns added, for
+    mail clients that import CSV) and one text file per email.
+
+    Args:
+        rows (list): Roster rows
+        emails (list): Email per row
+        label_column (str): Roster column used to name the text files
+
+    Returns:
+        bytes: The zip file
+    """
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    table = io.StringIO()
+    writer = csv.writer(table)
+    writer.writerow(columns + ["subject", "body"])
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for i, (row, email) in enumerate(zip(rows, emails), 1):
+            subject, body = split_subject(email)
+            writer.writerow([row.get(column, "") for column in columns] + [subject, body])
+            label = normalise_column(row.get(label_column, "")) if label_column else ""
+            bundle.writestr(f"emails/{i:03d}{'_' + label if label else ''}.txt", email)
+        bundle.writestr("emails.csv", table.getvalue())
+    return buffer.getvalue()
@@ -0,0 +1,152 @@
+# utils/pipeline.py
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from utils.api import MODEL_NAME, call_gemini_api, is_api_error, response_cache
+from utils.cache import make_key
+
+class PipelineStep:
+    """One tool call in a pipeline."""
+
+    def __init__(self, name, title, build_prompt, depends_on=(), config=None):
+        """
+        Args:
+            name (str): Identifier of the step, used to wire outputs into later steps
+            title (str): Heading shown for the step's result
+            build_prompt (callable): Called as build_prompt(params, outputs) with the
+                pipeline parameters and a dict of upstream outputs by step name
+            depends_on (list): Names of the steps whose outputs this step uses
+            config (callable): Called as config(params) for the step's generation settings
+                (e.g. from utils.api.generation_config); None for the model's defaults
+        """
+        self.name = name
+        self.title = title
+        self.build_prompt = build_prompt
+        self.depends_on = tuple(depends_on)
+        self.config = config
+
+class Pipeline:
+    """
+    A directed acyclic graph of tool steps with outputs wired into inputs.
+
+    Each step's result is cached under a hash of its prompt, which contains all
+    of its inputs (parameters and upstream outputs), and its generation settings. When an input changes, only
+    the steps it reaches are generated again. Independent branches run concurrently.
+    """
+
+    def __init__(self, name, steps):
+        """
+        Args:
+            name (str): Name of the pipeline, part of every cache key
+            steps (list): PipelineStep objects
+
+        Raises:
+            ValueError: If a dependency is unknown, a name is repeated, or the steps form a cycle
+        """
+        self.name = name
+        self.steps = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Duplicate pipeline step '{step.name}'")
+            self.steps[step.name] = step
+        for step in steps:
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{dependency}'")
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline '{self.name}' has a cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.steps[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.steps:
+            visit(name)
+        return order
+
+    def downstream(self, names):
+        """Return the given steps and every step that depends on them, directly or not."""
+        reached = set(names)
+        for name in self.order:
+            if any(dependency in reached for dependency in self.steps[name].depends_on):
+                reached.add(name)
+        return reached
+
+    def run(self, params, api_key, max_workers=4, force=()):
+        """
+        Run the pipeline, yielding each step's result as soon as it is known.
+
+        Model calls run on worker threads; events are yielded on the calling thread,
+        so the caller can render them with Streamlit.
+
+        Args:
+            params (dict): Pipeline parameters passed to every step's prompt builder
+            api_key (str): The API key for Gemini
+            max_workers (int): Maximum number of model calls in flight
+            force (list): Steps to generate again even if cached; steps downstream
+                of them are regenerated too
+
+        Yields:
+            dict: {"step", "title", "status", "result"} where status is "cached",
+            "generated", "error" or "skipped" (an upstream step failed)
+        """
+        stale = self.downstream(force)
+        outputs = {}
+        finished = set()
+        failed = set()
+        waiting = list(self.order)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+            while waiting or running:
+                # Start every step whose inputs are ready, answering from the cache where possible
+                for name in list(waiting):
+                    step = self.steps[name]
+                    if any(dependency in failed for dependency in step.depends_on):
+                        waiting.remove(name)
+                        failed.add(name)
+                        yield {"step": name, "title": step.title, "status": "skipped", "result": None}
+                        continue
+                    if not all(dependency in finished for dependency in step.depends_on):
+                        continue
+                    waiting.remove(name)
+                    prompt = step.build_prompt(params, outputs)
+                    config = step.config(params) if step.config else None
+                    key = make_key("pipeline", self.name, name, MODEL_NAME, prompt,
+                                   config.model_dump(mode="json", exclude_none=True) if config else None)
+                    cached = None if name in stale else response_cache.get(key)
+                    if cached is not None:
+                        outputs[name] = cached
+                        finished.add(name)
+                        yield {"step": name, "title": step.title, "status": "cached", "result": cached}
+                    else:
+                        running[executor.submit(copy_context().run, call_gemini_api, prompt, api_key,
+                                                config)] = (name, key)
+
+                if not running:
+                    # Steps are visited in topological order, so steps unblocked by cached
+                    # results have already started; nothing running means nothing is waiting
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    step = self.steps[name]
+                    result = future.result()
+                    if is_api_error(result):
+                        failed.add(name)
+                        yield {"step": name, "title": step.title, "status": "error", "result": result}
+                    else:
+                        response_cache.set(key, result)
+                        outputs[name] = result
+                        finished.add(name)
+                        yield {"step": name, "title": step.title, "status": "generated", "result": result}
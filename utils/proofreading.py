@@ -0,0 +1,54 @@
+# utils/proofreading.py
+import re
+
+PARAGRAPH_BREAK_PATTERN = re.compile(r"\n\s*\n")
+# The "Corrections:/Revised:" format asked for by the paragraph proofreading prompt
+REVISED_LABEL_PATTERN = re.compile(r"^\W*(?:revised(?: paragraph)?|versi semakan)\s*\**\s*[:：]\s*\**\s*", re.IGNORECASE | re.MULTILINE)
+
+def split_paragraphs(text, min_words=20):
+    """
+    Split a document into the paragraphs that are proofread separately.
+
+    Paragraphs are separated by blank lines. A paragraph shorter than min_words
+    (a title or heading) is joined to the paragraph after it, so it is proofread
+    in context; this only depends on the paragraphs themselves, so an edit never
+    changes how the rest of the document is split.
+
+    Args:
+        text (str): The document
+        min_words (int): Paragraphs with fewer words are joined to the next one
+
+    Returns:
+        list: Paragraph texts in document order
+    """
+    paragraphs = []
+    pending = []
+    for paragraph in PARAGRAPH_BREAK_PATTERN.split((text or "").strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pending.append(paragraph)
+        if len(paragraph.split()) >= min_words:
+            paragraphs.append("\n\n".join(pending))
+            pending = []
+    if pending:
+        if paragraphs and len(" ".join(pending).split()) < min_words:
+            paragraphs[-1] = "\n\n".join([paragraphs[-1]] + pending)
+        else:
+            paragraphs.append("\n\n".join(pending))
+    return paragraphs
+
+def split_feedback(feedback):
+    """
+    Separate paragraph feedback into its corrections and the revised paragraph.
+
+    Args:
+        feedback (str): Model output in the Corrections:/Revised: format
+
+    Returns:
+        tuple: (corrections, revised); revised is "" if the output has no Revised: section
+    """
+    match = REVISED_LABEL_PATTERN.search(feedback or "")
+    if not match:
+        return (feedback or "").strip(), ""
+    return feedback[:match.start()].strip(), feedback[match.end():].strip()
@@ -0,0 +1,214 @@
+# utils/question_bank.py
+import os
+import sqlite3
+import threading
+import time
+from utils.cache import DEFAULT_CACHE_DIR, make_key
+from utils.transcripts import tokenize
+
+_bank = None
+_bank_lock = threading.Lock()
+
+def normalise_topic(text):
+    """Lowercase content words of a topic or concept, for exact matching."""
+    return " ".join(tokenize(text or ""))
+
+class QuestionBank:
+    """
+    A local store of generated questions, shared by all sessions.
+
+    Questions are filtered by tool, language, reading age, grade, subject and DOK
+    level, and matched to a requested topic three ways, best first: the same topic,
+    a concept tagged on the question (an inverted concept index), or all topic words
+    appearing in the question's topic or concepts (SQLite FTS5).
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Database file; defaults to the TEACHER_MAGIC_QUESTION_BANK
+                environment variable or question_bank.sqlite3 in the cache directory
+        """
+        self._path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path:
+            return self._path
+        if os.environ.get("TEACHER_MAGIC_QUESTION_BANK"):
+            return os.environ["TEACHER_MAGIC_QUESTION_BANK"]
+        directory = os.environ.get("TEACHER_MAGIC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        return os.path.join(directory, "question_bank.sqlite3")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY,
+                    fingerprint TEXT UNIQUE NOT NULL,
+                    kind TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    topic_key TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    reading_age INTEGER,
+                    grade TEXT,
+                    subject TEXT,
+                    level TEXT,
+                    question TEXT NOT NULL,
+                    block TEXT NOT NULL,
+                    uses INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS questions_lookup ON questions (kind, language, topic_key);
+                CREATE TABLE IF NOT EXISTS question_concepts (
+                    concept TEXT NOT NULL,
+                    question_id INTEGER NOT NULL,
+                    PRIMARY KEY (concept, question_id)
+                ) WITHOUT ROWID;
+                CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(topic, concepts, question);
+            """)
+            self._local.conn = conn
+        return conn
+
+    def add_questions(self, kind, questions, topic, language, reading_age=None, grade=None, subject=None):
+        """
+        Store generated questions; questions already in the bank are skipped.
+
+        Args:
+            kind (str): The generating tool, e.g. "mcq" or "dok"
+            questions (list): Dicts with "question", "block" (the formatted text),
+                "concepts" (list) and optionally "level"
+            topic (str): The topic the questions were generated for
+            language (str): Language of the questions
+            reading_age (int): Target reading age, if the tool has one
+            grade (str): Target grade level, if the tool has one
+            subject (str): Subject, if the tool has one
+
+        Returns:
+            int: Number of questions added
+        """
+        conn = self._connection()
+        added = 0
+        now = time.time()
+        with self._write_lock:
+            conn.execute("BEGIN")
+            try:
+                for item in questions:
+                    fingerprint = make_key(kind, language, item.get("level"), normalise_topic(item["question"]))
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO questions (fingerprint, kind, topic, topic_key, language, reading_age, "
+                        "grade, subject, level, question, block, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (fingerprint, kind, topic, normalise_topic(topic), language, reading_age, grade, subject,
+                         item.get("level"), item["question"], item["block"], now))
+                    if not cursor.rowcount:
+                        continue
+                    question_id = cursor.lastrowid
+                    concepts = {normalise_topic(concept) for concept in item.get("concepts", [])} - {""}
+                    conn.executemany("INSERT OR IGNORE INTO question_concepts (concept, question_id) VALUES (?, ?)",
+                                     [(concept, question_id) for concept in concepts])
+                    conn.execute("INSERT INTO questions_fts (rowid, topic, concepts, question) VALUES (?, ?, ?, ?)",
+                                 (question_id, topic, ", ".join(item.get("concepts", [])), item["question"]))
+                    added += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def find_questions(self, kind, topic, count, language, reading_age=None, grade=None, subject=None,
+                       level=None, keywords=(), exclude=None):
+        """
+        Find stored questions for a request, least used first.
+
+        Args:
+            kind (str): The generating tool, e.g. "mcq" or "dok"
+            topic (str): The requested topic
+            count (int): Maximum number of questions to return
+            language (str): Language of the questions
+            reading_age (int): Accept questions within one year of this reading age
+            grade (str): Required grade level
+            subject (str): Required subject
+            level (str): Required DOK level
+            keywords (list): Extra concepts that also count as a match
+            exclude (callable): Predicate on a question's text; matching questions are skipped
+
+        Returns:
+            list: Dicts with "id", "question", "block" and "level"
+        """
+        topic_key = normalise_topic(topic)
+        if not topic_key or count <= 0:
+            return []
+        conn = self._connection()
+
+        filters = ["q.kind = ?", "q.language = ?"]
+        params = [kind, language]
+        for column, value in (("grade", grade), ("subject", subject), ("level", level)):
+            if value is not None:
+                filters.append(f"q.{column} = ?")
+                params.append(value)
+        if reading_age is not None:
+            filters.append("q.reading_age BETWEEN ? AND ?")
+            params.extend([reading_age - 1, reading_age + 1])
+        where = " AND ".join(filters)
+
+        concepts = list({topic_key, *(normalise_topic(keyword) for keyword in keywords)} - {""})
+        fts_query = "{topic concepts} : (" + " AND ".join(f'"{token}"' for token in topic_key.split()) + ")"
+        rows = conn.execute(f"""
+            SELECT q.id, q.question, q.block, q.level, MIN(m.tier) AS tier, q.uses
+            FROM (
+                SELECT id, 0 AS tier FROM questions WHERE topic_key = ?
+                UNION ALL
+                SELECT question_id, 1 FROM question_concepts WHERE concept IN ({", ".join("?" * len(concepts))})
+                UNION ALL
+                SELECT rowid, 2 FROM questions_fts WHERE questions_fts MATCH ?
+            ) AS m JOIN questions AS q ON q.id = m.id
+            WHERE {where}
+            GROUP BY q.id
+            ORDER BY tier, q.uses, q.created DESC
+        """, [topic_key, *concepts, fts_query, *params])
+
+        found = []
+        for question_id, question, block, question_level, _, _ in rows:
+            if exclude is not None and exclude(question):
+                continue
+            found.append({"id": question_id, "question": question, "block": block, "level": question_level})
+            if len(found) >= count:
+                break
+        return found
+
+    def mark_used(self, question_ids):
+        """Record that questions were served, so less used ones are preferred next time."""
+        with self._write_lock:
+            self._connection().executemany("UPDATE questions SET uses = uses + 1 WHERE id = ?",
+                                           [(question_id,) for question_id in question_ids])
+
+    def stats(self):
+        """
+        Get the number of stored questions per tool.
+
+        Returns:
+            dict: {kind: count}
+        """
+        return dict(self._connection().execute("SELECT kind, COUNT(*) FROM questions GROUP BY kind").fetchall())
+
+def get_question_bank(path=None):
+    """
+    Get the process-wide question bank, creating it on first use.
+
+    Args:
+        path (str): Database file, used only when the bank is created
+
+    Returns:
+        QuestionBank: The shared bank
+    """
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuestionBank(path)
+        return _bank
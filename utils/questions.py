@@ -0,0 +1,337 @@
+# utils/questions.py
+import os
+import re
+from utils.cache import make_key
+from utils.similarity import QuestionSimilarityIndex
+
+# The "Q:/A:/Correct:/Explanation:/Concepts:" block format used by the MCQ prompts
+# (markdown bold around the labels is tolerated)
+FIELD_PATTERN = re.compile(r"^\s*\**\s*(Q|A|Correct|Explanation|Concepts|Stems)\s*\**\s*[:：]\s*\**\s*(.*)$", re.IGNORECASE)
+QUESTION_LABEL_PATTERN = re.compile(r"^\W*(?:\d+[.)]\s*)?\**\s*(?:question|soalan)\b[^:：]*[:：]\s*\**\s*(.*)$", re.IGNORECASE)
+# The "DOK Level:/Question:/Sample Answer:/Explanation:/Concepts:" format used by the DOK prompt
+DOK_FIELD_PATTERN = re.compile(r"^\W*(DOK Level|Question|Sample Answer|Explanation|Concepts)\s*\**\s*[:：]\s*\**\s*(.*)$", re.IGNORECASE)
+DOK_LEVEL_NUMBER_PATTERN = re.compile(r"([1-4])")
+
+# Set to a directory to keep each teacher's question index across restarts, in one
+# file per API key (sessions without a key of their own keep theirs in memory only)
+QUESTION_INDEX_DIR = os.environ.get("TEACHER_MAGIC_QUESTION_INDEX")
+
+def parse_question_blocks(text):
+    """
+    Parse question blocks in the Q:/A:/Correct:/Explanation:/Concepts: format.
+
+    Args:
+        text (str): Model output
+
+    Returns:
+        list: Dicts with "question", "options", "correct", "explanation", "concepts"
+        and "raw" (the block's original text), in output order
+    """
+    blocks = []
+    current = None
+    for line in (text or "").splitlines():
+        match = FIELD_PATTERN.match(line)
+        field = match.group(1).lower() if match else None
+        if field == "q":
+            current = _new_block(match.group(2), line)
+            blocks.append(current)
+            continue
+        if current is None:
+            continue
+        current["raw"].append(line)
+        if field:
+            _apply_field(current, field, match.group(2))
+
+    for block in blocks:
+        block["raw"] = "\n".join(block["raw"]).strip()
+    return blocks
+
+def _new_block(question, line):
+    """Start a parsed Q: block."""
+    return {"question": question.strip(), "options": [], "correct": "", "explanation": "", "concepts": [],
+            "raw": [line]}
+
+def _apply_field(block, field, value):
+    """Fill in a block's field from an A:/Correct:/Explanation:/Concepts: line."""
+    if field == "a":
+        block["options"] = [option.strip() for option in value.split("|") if option.strip()]
+    elif field == "correct":
+        block["correct"] = value.strip().strip("*").strip()[:1].upper()
+    elif field == "explanation":
+        block["explanation"] = value.strip()
+    elif field == "concepts":
+        block["concepts"] = [concept.strip() for concept in value.split(",") if concept.strip()]
+
+class QuestionStreamParser:
+    """
+    Parse Q: blocks incrementally from streamed model output.
+
+    A block is complete when its Concepts: line ends or the next Q: line starts, so
+    each question can be shown as soon as it has arrived. Once the until condition
+    holds, the parser stops consuming and the caller can end the stream; text holds
+    the output up to that point.
+    """
+
+    def __init__(self, until=None, section_pattern=None):
+        """
+        Args:
+            until (callable): Function of the blocks parsed so far that returns True
+                once no more are needed
+            section_pattern (re.Pattern): Header lines (e.g. vocabulary word headers)
+                whose first group is recorded as the "section" of the blocks after them
+        """
+        self.until = until
+        self.section_pattern = section_pattern
+        self.blocks = []
+        self.done = False
+        self._lines = []
+        self._partial = ""
+        self._current = None
+        self._section = None
+
+    @property
+    def text(self):
+        """The output consumed so far."""
+        return "\n".join(self._lines).strip()
+
+    def feed(self, chunk):
+        """
+        Consume a chunk of streamed output.
+
+        Args:
+            chunk (str): The next piece of the output
+
+        Returns:
+            list: Blocks completed by this chunk, parsed as by parse_question_blocks
+        """
+        if self.done:
+            return []
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        completed = []
+        for line in lines:
+            completed.extend(self._consume(line))
+            if self.done:
+                break
+        return completed
+
+    def close(self):
+        """Consume the rest of the output once the stream has ended; returns the last block, if any."""
+        if self.done:
+            return []
+        completed = self._consume(self._partial) if self._partial else []
+        self._partial = ""
+        if self._current is not None:
+            completed.extend(self._finish())
+        return completed
+
+    def _consume(self, line):
+        """Parse one whole line; returns the blocks it completed."""
+        self._lines.append(line)
+        match = FIELD_PATTERN.match(line)
+        field = match.group(1).lower() if match else None
+        completed = []
+        if field == "q":
+            if self._current is not None:
+                completed.extend(self._finish())
+                if self.done:
+                    self._lines.pop()
+                    return completed
+            self._current = _new_block(match.group(2), line)
+            self._current["section"] = self._section
+            return completed
+        if field is None and self.section_pattern is not None:
+            header = self.section_pattern.match(line)
+            if header:
+                if self._current is not None:
+                    completed.extend(self._finish())
+                    if self.done:
+                        self._lines.pop()
+                        return completed
+                self._section = header.group(1)
+                return completed
+        if self._current is None:
+            return completed
+        self._current["raw"].append(line)
+        if field:
+            _apply_field(self._current, field, match.group(2))
+        if field == "concepts":
+            completed.extend(self._finish())
+        return completed
+
+    def _finish(self):
+        """Complete the current block."""
+        block, self._current = self._current, None
+        block["raw"] = "\n".join(block["raw"]).strip()
+        self.blocks.append(block)
+        if self.until is not None and self.until(self.blocks):
+            self.done = True
+        return [block]
+
+def parse_dok_blocks(text):
+    """
+    Parse DOK questions in the DOK Level:/Question:/Sample Answer:/Explanation:/Concepts: format.
+
+    A question without its own "DOK Level:" line takes the level of the one before it.
+
+    Args:
+        text (str): Model output
+
+    Returns:
+        list: Dicts with "level" (1-4 or None), "question", "concepts" and "raw"
+        (the block's text, always starting with its DOK Level line), in output order
+    """
+    blocks = []
+    current = None
+    level_line, level = None, None
+    for line in (text or "").splitlines():
+        match = DOK_FIELD_PATTERN.match(line)
+        field = match.group(1).lower() if match else None
+        if field == "dok level":
+            number = DOK_LEVEL_NUMBER_PATTERN.search(match.group(2))
+            level_line, level = line, int(number.group(1)) if number else None
+            current = None
+            continue
+        if field == "question":
+            current = {"level": level, "question": match.group(2).strip().strip("*"), "concepts": [],
+                       "raw": [level_line, line] if level_line else [line]}
+            blocks.append(current)
+            continue
+        if current is None:
+            continue
+        current["raw"].append(line)
+        if field == "concepts":
+            current["concepts"] = [concept.strip() for concept in match.group(2).split(",") if concept.strip()]
+
+    for block in blocks:
+        block["raw"] = "\n".join(block["raw"]).strip()
+    return [block for block in blocks if block["question"]]
+
+def is_complete_mcq(block):
+    """Return True if a parsed block has a question, four options and a valid answer letter."""
+    return bool(block["question"]) and len(block["options"]) == 4 and block["correct"] in ("A", "B", "C", "D")
+
+def split_question_items(text):
+    """
+    Split model output into individual questions for comparison.
+
+    Output in the Q: block format is split into whole blocks; MCQ blocks can be
+    removed from the text cleanly, other Q: output (e.g. a HOT question with its
+    sentence stems) cannot. Free-form output (e.g. DOK questions) falls back to lines
+    labelled "Question:", or to lines ending in a question mark.
+
+    Args:
+        text (str): Model output
+
+    Returns:
+        tuple: (items, removable) where items is a list of {"text", "raw"} dicts and
+        removable is True if the raw blocks together make up the question content
+    """
+    blocks = parse_question_blocks(text)
+    if blocks:
+        return ([{"text": block["question"], "raw": block["raw"]} for block in blocks],
+                all(block["options"] for block in blocks))
+
+    items = []
+    for line in (text or "").splitlines():
+        match = QUESTION_LABEL_PATTERN.match(line)
+        if match and match.group(1).strip():
+            items.append({"text": match.group(1).strip().strip("*"), "raw": line})
+    if not items:
+        for line in (text or "").splitlines():
+            stripped = line.strip().strip("*#-").strip()
+            if stripped.endswith("?") and len(stripped.split()) >= 4:
+                items.append({"text": stripped, "raw": line})
+    return items, False
+
+
+def question_index_path(session_state):
+    """
+    Return the file that keeps this teacher's question index, if it is kept on disk.
+
+    Args:
+        session_state: Streamlit session state
+
+    Returns:
+        str: Path under TEACHER_MAGIC_QUESTION_INDEX named by a hash of the teacher's
+        API key, or None if the setting is off or the session uses the school key pool
+    """
+    api_key = session_state.get("api_key")
+    if not QUESTION_INDEX_DIR or not api_key:
+        return None
+    return os.path.join(QUESTION_INDEX_DIR, f"{make_key('question_index', api_key)[:32]}.json")
+
+def get_question_index(session_state):
+    """
+    Return the session's near-duplicate question index, creating it on first use.
+
+    The index is loaded from the teacher's file (see question_index_path) when there
+    is one, and again if the session's API key changes.
+
+    Args:
+        session_state: Streamlit session state
+
+    Returns:
+        QuestionSimilarityIndex: The index shared by the session's question tools
+    """
+    path = question_index_path(session_state)
+    if "question_index" not in session_state or session_state.get("question_index_path") != path:
+        if path and os.path.exists(path):
+            session_state["question_index"] = QuestionSimilarityIndex.load(path)
+        else:
+            session_state["question_index"] = QuestionSimilarityIndex()
+        session_state["question_index_path"] = path
+    return session_state["question_index"]
+
+def collapse_near_duplicates(index, text, path=None):
+    """
+    Check generated questions against the index and drop or flag near-duplicates.
+
+    Unique questions are added to the index. Duplicate MCQ blocks are removed from
+    the text, unless every question is a duplicate; other duplicates are only
+    reported, so the text is never emptied.
+
+    Args:
+        index (QuestionSimilarityIndex): The session's question index
+        text (str): Model output
+        path (str): File to save the index to when questions are added, if any
+
+    Returns:
+        dict: "text" (output with duplicate blocks removed where possible),
+        "duplicates" (list of (question, earlier_question) pairs), "removed" (bool)
+        and "questions" (texts of every question in the output)
+    """
+    items, removable = split_question_items(text)
+    verdicts = index.partition([item["text"] for item in items])
+    duplicates = [(item["text"], earlier) for item, earlier in zip(items, verdicts) if earlier is not None]
+
+    removed = removable and bool(duplicates) and len(duplicates) < len(items)
+    if removed:
+        for item, earlier in zip(items, verdicts):
+            if earlier is not None:
+                text = text.replace(item["raw"], "", 1)
+        text = re.sub(r"\n{3,}", "\n\n", text).strip()
+    if path and len(duplicates) < len(items):
+        index.save(path)
+    return {"text": text, "duplicates": duplicates, "removed": removed,
+            "questions": [item["text"] for item in items]}
+
+def build_replacement_prompt(prompt, count, avoid):
+    """
+    Ask for only the questions that were dropped as duplicates.
+
+    Args:
+        prompt (str): The original generation prompt
+        count (int): Number of replacement questions needed
+        avoid (list): Question texts the replacements must differ from
+
+    Returns:
+        str: The replacement prompt
+    """
+    avoid_list = "\n".join(f"- {question}" for question in avoid)
+    return f"""{prompt}
+
+Generate ONLY {count} new question{"s" if count != 1 else ""} in exactly the format above.
+Each new question must test something clearly different from these existing questions:
+{avoid_list}
+"""
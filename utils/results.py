@@ -0,0 +1,82 @@
+# utils/results.py
+from utils.api import is_api_error
+from utils.cache import make_key
+
+def begin_tool_run(session_state, tool):
+    """
+    Start a script run of a tool, before the tool is rendered.
+
+    Results a tool shows during the run replace its slot; if it shows none (the rerun
+    came from some other widget), the slot is redrawn instead by the app.
+
+    Args:
+        session_state: The Streamlit session state
+        tool (str): Name of the tool being rendered
+    """
+    session_state['result_run'] = {"tool": tool, "shown": False, "reused": False}
+    session_state.setdefault('result_slots', {})
+
+def record_result(session_state, title, content, prompt=None, config=None):
+    """
+    Keep a result shown by the current tool in its result slot.
+
+    The first result shown in a run replaces whatever the slot held; later ones in
+    the same run are added to it.
+
+    Args:
+        session_state: The Streamlit session state
+        title (str): Heading the result was shown under
+        content (str): The result
+        prompt (str): The single prompt the result is the model's answer to, if any;
+            it fingerprints the request and allows the result to be regenerated
+        config (types.GenerateContentConfig): Generation settings the prompt was sent with
+    """
+    run = session_state.get('result_run')
+    if not run:
+        return
+    slots = session_state.setdefault('result_slots', {})
+    if not run["shown"]:
+        slots[run["tool"]] = {"items": []}
+        run["shown"] = True
+    if is_api_error(content):
+        prompt = None  # An error is shown again on redraw, but never reused or regenerated as is
+    slots[run["tool"]]["items"].append({"title": title, "content": content, "prompt": prompt, "config": config,
+                                        "fingerprint": make_key("result", prompt) if prompt else None})
+
+def clear_result(session_state, tool):
+    """Empty a tool's result slot (e.g. when the tool keeps its own state for the new result)."""
+    session_state.get('result_slots', {}).pop(tool, None)
+
+def get_result(session_state, tool):
+    """Return a tool's result slot ({"items": [...]}) or None."""
+    return session_state.get('result_slots', {}).get(tool)
+
+def result_shown(session_state):
+    """Return True if the current tool showed a result during this run."""
+    return bool(session_state.get('result_run', {}).get("shown"))
+
+def result_reused(session_state):
+    """Return True if the current tool's result was redrawn for an unchanged request during this run."""
+    return bool(session_state.get('result_run', {}).get("reused"))
+
+def reuse_last_result(session_state, prompt):
+    """
+    Return the current tool's last result if it answered exactly this prompt.
+
+    Pressing Generate again without changing the inputs then redraws the result
+    instead of paying for another model call; Regenerate asks for a new one, as
+    does turning on 'Always generate fresh output'.
+
+    Args:
+        session_state: The Streamlit session state
+        prompt (str): The prompt about to be sent
+
+    Returns:
+        str: The earlier result, or None if the request is new
+    """
+    run = session_state.get('result_run')
+    slot = get_result(session_state, run["tool"]) if run and not session_state.get('fresh_output') else None
+    if not slot or len(slot["items"]) != 1 or slot["items"][0]["fingerprint"] != make_key("result", prompt):
+        return None
+    run["reused"] = True
+    return slot["items"][0]["content"]
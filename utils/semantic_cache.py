@@ -0,0 +1,293 @@
+# utils/semantic_cache.py
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from utils.api import is_api_error
+from utils.cache import DEFAULT_CACHE_DIR, make_key
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+# Minimum cosine similarity of the free-text inputs for a cached result to be reused.
+# Tools whose free text carries most of the request need a closer match.
+SIMILARITY_THRESHOLDS = {
+    "Text Generator": 0.9,
+    "Academic Content": 0.9,
+    "Lesson Plan Generator": 0.85,
+    "Vocabulary Focus": 0.95,
+    "Song Generator": 0.9,
+}
+DEFAULT_THRESHOLD = 0.92
+FEATURE_BITS = 20
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Words that do not change what a request asks for. Question words (how, why, what,
+# when, which, who) and negation are kept: "why plants need light" and "how plants
+# need light" are different requests.
+STOPWORDS = frozenset('''
+a an and are as at be but by can do for from has have i in is it its of on or that the their there
+these this to was we will with you your yang dan di ke dari untuk ini itu dengan
+adalah pada akan atau juga kita kami mereka ia
+'''.split())
+
+def normalise_value(value):
+    """Normalise a structured form input: case, surrounding and repeated whitespace, list order."""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, (list, tuple, set)):
+        return sorted(normalise_value(item) for item in value)
+    return value
+
+def tokenize(text):
+    """Lowercase word tokens of a request's free text, without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def vectorise(texts):
+    """
+    Embed free-text inputs with a hashing vectorizer.
+
+    Each field is a bag of stemmed content words, so case, spacing, punctuation and
+    word order do not matter. Terms are hashed into 2**FEATURE_BITS buckets per field
+    with sublinear term frequency, each field is L2-normalised, and the fields are
+    weighted equally.
+
+    Args:
+        texts (dict): Free text by field name
+
+    Returns:
+        dict: Weight by feature number, with unit L2 norm (empty if there is no text)
+    """
+    fields = {}
+    for field, text in texts.items():
+        counts = {}
+        for token in tokenize(text or ""):
+            # Light stemming so "plants" matches "plant"
+            if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+                token = token[:-1]
+            feature = zlib.crc32(f"{field}:{token}".encode("utf-8")) & ((1 << FEATURE_BITS) - 1)
+            counts[feature] = counts.get(feature, 0) + 1
+        if counts:
+            fields[field] = {feature: 1 + math.log(count) for feature, count in counts.items()}
+
+    vector = {}
+    for weights in fields.values():
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) * math.sqrt(len(fields))
+        for feature, weight in weights.items():
+            vector[feature] = vector.get(feature, 0.0) + weight / norm
+    return vector
+
+class SemanticCache:
+    """
+    Tool results reused for near-identical requests, shared by all sessions.
+
+    A request is split into structured inputs (select boxes, sliders), which must
+    match exactly after normalisation, and free-text inputs, which are compared by
+    cosine similarity of their hashed bag-of-words vectors. Features are stored in an
+    inverted index keyed by (structured inputs, feature), so a lookup only scores
+    entries that share a word with the request and stays fast at 100k+ entries.
+    """
+
+    def __init__(self, path=None, ttl=30 * 24 * 3600, max_entries=100_000):
+        """
+        Args:
+            path (str): Database file; defaults to semantic_cache.sqlite3 in the cache directory
+            ttl (float): Age in seconds after which entries are no longer reused, and are
+                deleted at the next write
+            max_entries (int): Size cap; the oldest entries are deleted beyond it
+        """
+        self._path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path:
+            return self._path
+        directory = os.environ.get("TEACHER_MAGIC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        return os.path.join(directory, "semantic_cache.sqlite3")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    bucket TEXT NOT NULL,
+                    tool TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_bucket ON entries (bucket, created);
+                CREATE INDEX IF NOT EXISTS entries_created ON entries (created);
+                CREATE TABLE IF NOT EXISTS features (
+                    bucket TEXT NOT NULL,
+                    feature INTEGER NOT NULL,
+                    entry_id INTEGER NOT NULL,
+                    weight REAL NOT NULL,
+                    PRIMARY KEY (bucket, feature, entry_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS features_entry ON features (entry_id);
+            """)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _bucket(tool, fields):
+        return make_key("semantic", tool, {name: normalise_value(value) for name, value in fields.items()})
+
+    def lookup(self, tool, fields, texts, threshold=None):
+        """
+        Find the cached result of the most similar earlier request.
+
+        Args:
+            tool (str): Tool name
+            fields (dict): Structured inputs, matched exactly after normalisation
+            texts (dict): Free-text inputs, matched by similarity
+            threshold (float): Minimum similarity; defaults to the tool's entry in
+                SIMILARITY_THRESHOLDS
+
+        Returns:
+            dict: {"id", "result", "score"} or None if nothing is similar enough
+        """
+        if threshold is None:
+            threshold = SIMILARITY_THRESHOLDS.get(tool, DEFAULT_THRESHOLD)
+        bucket = self._bucket(tool, fields)
+        oldest = time.time() - self.ttl
+        conn = self._connection()
+        vector = vectorise(texts)
+
+        if not vector:
+            # No free text: the structured inputs are the whole request
+            row = conn.execute("SELECT id, result FROM entries WHERE bucket = ? AND created >= ? "
+                               "AND id NOT IN (SELECT entry_id FROM features WHERE bucket = ?) "
+                               "ORDER BY created DESC LIMIT 1", (bucket, oldest, bucket)).fetchone()
+            return {"id": row[0], "result": row[1], "score": 1.0} if row else None
+
+        # Dot product over the inverted index; both vectors have unit norm, so this is the cosine
+        features = list(vector.items())
+        values = ", ".join("(?, ?)" for _ in features)
+        row = conn.execute(f"""
+            WITH query(feature, weight) AS (VALUES {values})
+            SELECT entries.id, entries.result, SUM(features.weight * query.weight) AS score
+            FROM query
+            JOIN features ON features.bucket = ? AND features.feature = query.feature
+            JOIN entries ON entries.id = features.entry_id
+            WHERE entries.created >= ?
+            GROUP BY entries.id
+            ORDER BY score DESC, entries.created DESC
+            LIMIT 1
+        """, [value for feature in features for value in feature] + [bucket, oldest]).fetchone()
+        if row is None or row[2] < threshold:
+            return None
+        return {"id": row[0], "result": row[1], "score": min(row[2], 1.0)}
+
+    def add(self, tool, fields, texts, result):
+        """
+        Cache a tool result for its request.
+
+        Args:
+            tool (str): Tool name
+            fields (dict): Structured inputs
+            texts (dict): Free-text inputs
+            result (str): The tool's result
+
+        Returns:
+            int: The new entry's id
+        """
+        bucket = self._bucket(tool, fields)
+        vector = vectorise(texts)
+        conn = self._connection()
+        now = time.time()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                entry_id = conn.execute("INSERT INTO entries (bucket, tool, result, created) VALUES (?, ?, ?, ?)",
+                                        (bucket, tool, result, now)).lastrowid
+                conn.executemany("INSERT INTO features (bucket, feature, entry_id, weight) VALUES (?, ?, ?, ?)",
+                                 [(bucket, feature, entry_id, weight) for feature, weight in vector.items()])
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return entry_id
+
+    def _evict(self, conn, now):
+        """Delete expired entries, then the oldest ones while the cache is over max_entries."""
+        expired = "SELECT id FROM entries WHERE created < ?"
+        conn.execute(f"DELETE FROM features WHERE entry_id IN ({expired})", (now - self.ttl,))
+        conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if total <= self.max_entries:
+            return
+        # Drop the oldest entries until the cache is back under 90% of the cap
+        oldest = "SELECT id FROM entries ORDER BY created, id LIMIT ?"
+        excess = total - int(self.max_entries * 0.9)
+        conn.execute(f"DELETE FROM features WHERE entry_id IN ({oldest})", (excess,))
+        conn.execute(f"DELETE FROM entries WHERE id IN ({oldest})", (excess,))
+
+    def mark_used(self, entry_id):
+        """Count a reuse of a cached entry."""
+        with self._write_lock:
+            self._connection().execute("UPDATE entries SET hits = hits + 1 WHERE id = ?", (entry_id,))
+
+    def stats(self):
+        """Return {"entries", "hits"} for the cache."""
+        entries, hits = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM entries").fetchone()
+        return {"entries": entries, "hits": hits}
+
+def get_semantic_cache(path=None):
+    """
+    Get the process-wide semantic cache, creating it on first use.
+
+    Args:
+        path (str): Database file, used only when the cache is created
+
+    Returns:
+        SemanticCache: The shared cache
+    """
+    global _semantic_cache
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(path)
+        return _semantic_cache
+
+def find_similar_result(session_state, tool, fields, texts):
+    """
+    Look up a cached result for a near-identical request, unless the teacher asked for fresh output.
+
+    Args:
+        session_state: The Streamlit session state
+        tool (str): Tool name
+        fields (dict): Structured inputs
+        texts (dict): Free-text inputs
+
+    Returns:
+        dict: {"id", "result", "score"} or None
+    """
+    if session_state.get('fresh_output'):
+        return None
+    match = get_semantic_cache().lookup(tool, fields, texts)
+    if match:
+        get_semantic_cache().mark_used(match["id"])
+    return match
+
+def describe_reuse(match):
+    """Explain to the teacher that a result was reused, and how to get a fresh one."""
+    return (f"Reused a saved result for a near-identical request ({match['score']:.0%} match). "
+            "Turn on 'Always generate fresh output' in the sidebar to generate a new one.")
+
+def remember_result(tool, fields, texts, result):
+    """Cache a tool result for reuse by similar requests; errors are never cached."""
+    if not is_api_error(result):
+        get_semantic_cache().add(tool, fields, texts, result)
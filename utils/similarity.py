@@ -0,0 +1,187 @@
+# utils/similarity.py
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+import numpy as np
+
+# Universal hashing modulo a prime just above 2**32: with 32-bit shingle hashes and
+# 32-bit coefficients, a * h + b always fits in an unsigned 64-bit integer
+MERSENNE_PRIME = np.uint64(4294967311)
+NORMALISE_PATTERN = re.compile(r"[^\w]+", re.UNICODE)
+# Serialises save() so that sessions sharing an index file merge rather than overwrite
+_save_lock = threading.Lock()
+
+def shingles(text, size=4):
+    """
+    Character shingles of a normalised text, hashed to 32-bit integers.
+
+    Args:
+        text (str): The question text
+        size (int): Shingle length in characters
+
+    Returns:
+        numpy.ndarray: Unique shingle hashes (uint64)
+    """
+    normalised = NORMALISE_PATTERN.sub(" ", text.lower()).strip()
+    if len(normalised) <= size:
+        grams = {normalised}
+    else:
+        grams = {normalised[i:i + size] for i in range(len(normalised) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+class QuestionSimilarityIndex:
+    """
+    Near-duplicate index over generated questions using MinHash with LSH banding.
+
+    Signatures are compared only within LSH buckets, so lookups stay fast as the
+    index grows. The index lives in memory; save() and load() persist it as JSON.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.6, seed=7):
+        """
+        Args:
+            num_perm (int): Number of MinHash permutations (signature length)
+            bands (int): Number of LSH bands; num_perm must be divisible by it
+            threshold (float): Estimated Jaccard similarity at which items count as duplicates
+            seed (int): Seed for the hash permutations; must match for persisted indexes
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint64)
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = {}
+        self._texts = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, text):
+        """MinHash signature of a text."""
+        hashes = shingles(text)
+        if not len(hashes):
+            return np.zeros(self.num_perm, dtype=np.uint64)
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, text, signature=None):
+        """
+        Find indexed questions similar to a text.
+
+        Args:
+            text (str): The question text
+            signature (numpy.ndarray): Precomputed signature, optional
+
+        Returns:
+            list: (item_id, estimated_similarity) pairs above the threshold, best first
+        """
+        signature = self.signature(text) if signature is None else signature
+        candidates = set()
+        with self._lock:
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            matches = []
+            for item_id in candidates:
+                similarity = float(np.mean(self._signatures[item_id] == signature))
+                if similarity >= self.threshold:
+                    matches.append((item_id, similarity))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def add(self, text, signature=None):
+        """
+        Add a question to the index.
+
+        Returns:
+            int: The new item's ID
+        """
+        signature = self.signature(text) if signature is None else signature
+        with self._lock:
+            item_id = self._next_id
+            self._next_id += 1
+            self._signatures[item_id] = signature
+            self._texts[item_id] = text
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(item_id)
+        return item_id
+
+    def text(self, item_id):
+        """The original text of an indexed question."""
+        return self._texts.get(item_id)
+
+    def partition(self, texts):
+        """
+        Split new questions into unique ones and near-duplicates, adding the unique ones.
+
+        Questions are checked against the index and against each other, so repeats
+        within one result are caught as well.
+
+        Args:
+            texts (list): Question texts in output order
+
+        Returns:
+            list: For each text, None if it is unique or the text of the question it duplicates
+        """
+        verdicts = []
+        for text in texts:
+            signature = self.signature(text)
+            matches = self.query(text, signature)
+            if matches:
+                verdicts.append(self.text(matches[0][0]))
+            else:
+                self.add(text, signature)
+                verdicts.append(None)
+        return verdicts
+
+    def save(self, path):
+        """
+        Write the index to a JSON file, keeping the questions already saved there.
+
+        Questions in the file that this index does not have are added to it first,
+        so sessions sharing a file (e.g. one teacher in two tabs) do not drop each
+        other's questions. The file is replaced atomically from a unique temporary file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        with _save_lock:
+            try:
+                with open(path) as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = None
+            if stored and (stored["num_perm"], stored["bands"], stored["seed"]) == (self.num_perm, self.bands, self.seed):
+                with self._lock:
+                    known = set(self._texts.values())
+                for text, signature in stored["items"]:
+                    if text not in known:
+                        self.add(text, np.array(signature, dtype=np.uint64))
+            with self._lock:
+                payload = {
+                    "num_perm": self.num_perm, "bands": self.bands, "threshold": self.threshold, "seed": self.seed,
+                    "items": [[self._texts[item_id], self._signatures[item_id].tolist()] for item_id in self._signatures],
+                }
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+                json.dump(payload, f)
+            os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save()."""
+        with open(path) as f:
+            payload = json.load(f)
+        index = cls(payload["num_perm"], payload["bands"], payload["threshold"], payload["seed"])
+        for text, signature in payload["items"]:
+            index.add(text, np.array(signature, dtype=np.uint64))
+        return index
@@ -0,0 +1,292 @@
+# utils/standards.py
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from utils.cache import DEFAULT_CACHE_DIR, make_key
+
+_index = None
+_index_lock = threading.Lock()
+
+# Bundled standards: code, framework, subject, grade and text per row
+STANDARDS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "standards.csv")
+SEARCH_TOKEN_PATTERN = re.compile(r"\w+")
+
+def normalise_standard(text):
+    """Lowercase a standard's text and collapse its whitespace, for exact matching."""
+    return " ".join((text or "").lower().split())
+
+def build_unpacking_prompt(standard_text, subject, grade_level, framework, language):
+    """Build the Standards Unpacker prompt."""
+    return f"""
+    Unpack the following {subject} educational standard for {grade_level} students from the {framework} framework. Provide your analysis in {language}.
+
+    Standard:
+    {standard_text}
+
+    Please provide:
+
+    1. A simplified explanation of what this standard means (teacher-friendly language)
+    2. A breakdown of the key skills and knowledge students need to demonstrate
+    3. The prerequisite knowledge/skills students should have before addressing this standard
+    4. 3-4 clear "I can" statements that students could use to understand the standard
+    5. 2-3 ways to assess mastery of this standard
+    6. At least 3 specific instructional strategies or activities that would help teach this standard
+    7. Potential challenges students might face in mastering this standard and how to address them
+    8. How this standard connects to previous and future learning in the curriculum
+
+    Format your response in clear sections with headings for easy reference.
+    """
+
+class StandardsIndex:
+    """
+    A local, searchable index of curriculum standards and their stored unpackings.
+
+    Standards are loaded from a bundled CSV file into SQLite, with an FTS5 table for
+    keyword search; the index is rebuilt when the file changes. Unpackings are stored
+    per standard, framework, subject, grade and language, so a standard unpacked (or
+    precomputed) once is served to every teacher without an API call.
+    """
+
+    def __init__(self, path=None, source=None):
+        """
+        Args:
+            path (str): Database file; defaults to standards.sqlite3 in the cache directory
+            source (str): Standards CSV; defaults to the TEACHER_MAGIC_STANDARDS_FILE
+                environment variable or data/standards.csv
+        """
+        self._path = path
+        self.source = source or os.environ.get("TEACHER_MAGIC_STANDARDS_FILE", STANDARDS_FILE)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path:
+            return self._path
+        directory = os.environ.get("TEACHER_MAGIC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        return os.path.join(directory, "standards.sqlite3")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS standards (
+                    id INTEGER PRIMARY KEY,
+                    code TEXT UNIQUE NOT NULL,
+                    framework TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    grade TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    text_key TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS standards_text ON standards (text_key);
+                CREATE VIRTUAL TABLE IF NOT EXISTS standards_fts USING fts5(code, text);
+                CREATE TABLE IF NOT EXISTS unpackings (
+                    standard_key TEXT NOT NULL,
+                    framework TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    grade TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (standard_key, framework, subject, grade, language)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """)
+            self._local.conn = conn
+            self._load(conn)
+        return conn
+
+    def _load(self, conn):
+        """(Re)load the standards from the source file if it changed since the last load."""
+        if not os.path.exists(self.source):
+            return
+        stat = os.stat(self.source)
+        signature = make_key(os.path.abspath(self.source), stat.st_size, stat.st_mtime)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        if row and row[0] == signature:
+            return
+
+        with open(self.source, newline="", encoding="utf-8") as f:
+            rows = [(row["code"].strip(), row["framework"].strip(), row["subject"].strip(), row["grade"].strip(),
+                     row["text"].strip(), normalise_standard(row["text"]))
+                    for row in csv.DictReader(f) if row.get("code") and row.get("text")]
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM standards")
+                conn.execute("DELETE FROM standards_fts")
+                conn.executemany("INSERT OR REPLACE INTO standards (code, framework, subject, grade, text, text_key) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT INTO standards_fts (rowid, code, text) SELECT id, code, text FROM standards")
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (signature,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def search(self, query="", subject=None, grade=None, framework=None, limit=20):
+        """
+        Search standards by code or keywords, for autocomplete.
+
+        Codes containing the query come first, then standards whose text has every
+        query word (the last word as a prefix, since it may still be being typed),
+        best match first.
+
+        Args:
+            query (str): Part of a code (e.g. "3.NF") or keywords (e.g. "photosynth")
+            subject (str): Only standards of this subject
+            grade (str): Only standards of this grade level
+            framework (str): Only standards of this framework
+            limit (int): Maximum number of results
+
+        Returns:
+            list: Dicts with "code", "framework", "subject", "grade" and "text"
+        """
+        conn = self._connection()
+        filters, params = [], []
+        for column, value in (("subject", subject), ("grade", grade), ("framework", framework)):
+            if value:
+                filters.append(f"standards.{column} = ?")
+                params.append(value)
+        where = "".join(f" AND {condition}" for condition in filters)
+        columns = "standards.code, standards.framework, standards.subject, standards.grade, standards.text"
+
+        query = (query or "").strip()
+        if not query:
+            rows = conn.execute(f"SELECT {columns} FROM standards WHERE 1 = 1{where} ORDER BY standards.code LIMIT ?",
+                                params + [limit]).fetchall()
+            return [dict(row) for row in rows]
+
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        results = {}
+        for row in conn.execute(f"SELECT {columns} FROM standards WHERE standards.code LIKE ? ESCAPE '\\'{where} "
+                                "ORDER BY length(standards.code), standards.code LIMIT ?", [pattern] + params + [limit]):
+            results[row["code"]] = dict(row)
+
+        tokens = SEARCH_TOKEN_PATTERN.findall(query.lower())
+        if tokens and len(results) < limit:
+            match = " AND ".join(f'"{token}"' for token in tokens[:-1]) + (" AND " if len(tokens) > 1 else "") \
+                + f'"{tokens[-1]}"*'
+            for row in conn.execute(f"SELECT {columns} FROM standards_fts JOIN standards ON standards.id = standards_fts.rowid "
+                                    f"WHERE standards_fts MATCH ?{where} ORDER BY bm25(standards_fts) LIMIT ?",
+                                    [match] + params + [limit]):
+                results.setdefault(row["code"], dict(row))
+        return list(results.values())[:limit]
+
+    def get(self, code):
+        """Return the standard with this code, or None."""
+        row = self._connection().execute("SELECT code, framework, subject, grade, text FROM standards WHERE code = ?",
+                                         (code,)).fetchone()
+        return dict(row) if row else None
+
+    def find_by_text(self, text):
+        """Return the indexed standard whose text matches (ignoring case and spacing), or None."""
+        row = self._connection().execute("SELECT code, framework, subject, grade, text FROM standards WHERE text_key = ?",
+                                         (normalise_standard(text),)).fetchone()
+        return dict(row) if row else None
+
+    def standard_key(self, text):
+        """
+        Key under which a standard's unpackings are stored.
+
+        Args:
+            text (str): The standard's text, indexed or pasted
+
+        Returns:
+            str: The standard's code if it is in the index, otherwise a hash of the normalised text
+        """
+        standard = self.find_by_text(text)
+        return standard["code"] if standard else "text:" + make_key(normalise_standard(text))
+
+    def get_unpacking(self, text, framework, subject, grade, language):
+        """Return the stored unpacking of a standard, or None."""
+        row = self._connection().execute(
+            "SELECT result FROM unpackings WHERE standard_key = ? AND framework = ? AND subject = ? AND grade = ? "
+            "AND language = ?", (self.standard_key(text), framework, subject, grade, language)).fetchone()
+        return row[0] if row else None
+
+    def save_unpacking(self, text, framework, subject, grade, language, result):
+        """Store (or replace) the unpacking of a standard."""
+        with self._write_lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO unpackings (standard_key, framework, subject, grade, language, result, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (self.standard_key(text), framework, subject, grade, language, result,
+                                                 time.time()))
+
+    def stats(self):
+        """Return {"standards", "unpackings"} counts."""
+        conn = self._connection()
+        return {"standards": conn.execute("SELECT COUNT(*) FROM standards").fetchone()[0],
+                "unpackings": conn.execute("SELECT COUNT(*) FROM unpackings").fetchone()[0]}
+
+def get_standards_index(path=None):
+    """
+    Get the process-wide standards index, creating it on first use.
+
+    Args:
+        path (str): Database file, used only when the index is created
+
+    Returns:
+        StandardsIndex: The shared index
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = StandardsIndex(path)
+        return _index
+
+def main(argv=None):
+    """Precompute unpackings for the indexed standards: python -m utils.standards --language English"""
+    from utils.api import call_gemini_api_concurrent, configure_api, generation_config, is_api_error
+
+    parser = argparse.ArgumentParser(description="Precompute Standards Unpacker results for the bundled standards.")
+    parser.add_argument("--language", action="append", choices=["English", "Bahasa Melayu"],
+                        help="Language(s) to unpack in (repeatable; default English)")
+    parser.add_argument("--framework", help="Framework to unpack for; default each standard's own framework")
+    parser.add_argument("--subject", help="Only standards of this subject")
+    parser.add_argument("--grade", help="Only standards of this grade level")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent API calls")
+    parser.add_argument("--force", action="store_true", help="Replace unpackings that are already stored")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("GEMINI_API_KEY", "")
+    if not configure_api(api_key):
+        parser.error("set GEMINI_API_KEY (or TEACHER_MAGIC_API_KEYS) to precompute unpackings")
+
+    index = get_standards_index()
+    jobs = []
+    for standard in index.search(subject=args.subject, grade=args.grade, limit=1000000):
+        for language in args.language or ["English"]:
+            framework = args.framework or standard["framework"]
+            job = (standard, framework, language)
+            if args.force or index.get_unpacking(standard["text"], framework, standard["subject"], standard["grade"],
+                                                 language) is None:
+                jobs.append(job)
+
+    prompts = [build_unpacking_prompt(standard["text"], standard["subject"], standard["grade"], framework, language)
+               for standard, framework, language in jobs]
+    config = generation_config("Standards Unpacker")
+    failed = 0
+    for done, (i, result) in enumerate(call_gemini_api_concurrent(prompts, api_key, args.workers, config=config), 1):
+        standard, framework, language = jobs[i]
+        if is_api_error(result):
+            failed += 1
+            print(f"[{done}/{len(jobs)}] {standard['code']} ({language}): {result}", file=sys.stderr)
+            continue
+        index.save_unpacking(standard["text"], framework, standard["subject"], standard["grade"], language, result)
+        print(f"[{done}/{len(jobs)}] {standard['code']} ({language})")
+    print(f"{len(jobs) - failed} unpackings stored, {failed} failed; {index.stats()['unpackings']} in total.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# utils/transcripts.py
+import math
+import re
+from array import array
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Common English and Malay function words that carry no relevance signal
+STOPWORDS = frozenset('''
+a an and are as at be but by can do for from has have how i in is it its of on or that the their there
+these this to was we what when which who why will with you your yang dan di ke dari untuk ini itu dengan
+adalah pada akan tidak atau juga kita kami mereka ia
+'''.split())
+
+def format_timestamp(seconds):
+    """
+    Format a position in a video as m:ss or h:mm:ss.
+
+    Args:
+        seconds (float): Offset from the start of the video
+
+    Returns:
+        str: The formatted timestamp
+    """
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+def split_into_chunks(segments, chunk_chars=12000, overlap_chars=800):
+    """
+    Split timed transcript segments into overlapping chunks of roughly equal size.
+
+    Chunks break only at segment boundaries, and each chunk repeats the last
+    ``overlap_chars`` characters of the previous one so that ideas spanning a
+    boundary are not lost.
+
+    Args:
+        segments (list): [start, duration, text] lists as returned by get_transcript_segments
+        chunk_chars (int): Target size of each chunk in characters
+        overlap_chars (int): Characters of context carried over from the previous chunk
+
+    Returns:
+        list: Dicts with "start", "end" (seconds) and "text" for each chunk
+    """
+    chunks = []
+    first = 0
+    while first < len(segments):
+        size = 0
+        last = first
+        while last < len(segments) and (size == 0 or size + len(segments[last][2]) + 1 <= chunk_chars):
+            size += len(segments[last][2]) + 1
+            last += 1
+
+        start, _, _ = segments[first]
+        end_start, end_duration, _ = segments[last - 1]
+        chunks.append({
+            "start": start,
+            "end": end_start + end_duration,
+            "text": " ".join(segment[2] for segment in segments[first:last]),
+        })
+        if last >= len(segments):
+            break
+
+        # Step back over the final segments so the next chunk overlaps this one
+        next_first = last
+        carried = 0
+        while next_first - 1 > first and carried + len(segments[next_first - 1][2]) + 1 <= overlap_chars:
+            next_first -= 1
+            carried += len(segments[next_first][2]) + 1
+        first = next_first
+    return chunks
+
+def tokenize(text):
+    """Lowercase word tokens of a text, without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class SegmentIndex:
+    """
+    A compact, timestamped transcript.
+
+    Segment texts are stored in one string with parallel arrays of start times
+    and character offsets, rather than as a list of per-segment objects.
+    """
+
+    def __init__(self, segments):
+        """
+        Args:
+            segments (list): [start, duration, text] lists as returned by get_transcript_segments
+        """
+        self.starts = array("d")
+        self.offsets = array("q", [0])
+        parts = []
+        position = 0
+        for start, _, text in segments:
+            text = " ".join(text.split())  # Captions often contain line breaks
+            parts.append(text)
+            position += len(text) + 1
+            self.starts.append(start)
+            self.offsets.append(position)
+        self.text = " ".join(parts)
+        self.end = segments[-1][0] + segments[-1][1] if segments else 0.0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def span_text(self, first, last):
+        """Text of segments first..last-1."""
+        return self.text[self.offsets[first]:self.offsets[last] - 1]
+
+    def passages(self, target_chars=600):
+        """
+        Group consecutive segments into passages of roughly ``target_chars`` characters.
+
+        Returns:
+            array: Segment boundaries; passage i covers segments bounds[i]..bounds[i+1]-1
+        """
+        bounds = array("q", [0])
+        for i in range(1, len(self)):
+            if self.offsets[i] - self.offsets[bounds[-1]] >= target_chars:
+                bounds.append(i)
+        if len(self):
+            bounds.append(len(self))
+        return bounds
+
+    def format_passage(self, bounds, passage_id):
+        """Render one passage as a "[m:ss] text" line."""
+        first, last = bounds[passage_id], bounds[passage_id + 1]
+        return f"[{format_timestamp(self.starts[first])}] {self.span_text(first, last)}"
+
+    def format_passages(self, bounds, passage_ids=None):
+        """
+        Render passages as "[m:ss] text" lines.
+
+        Args:
+            bounds (array): Passage boundaries from passages()
+            passage_ids (list): Passages to include, in the order given; all passages if omitted
+
+        Returns:
+            str: One line per passage
+        """
+        if passage_ids is None:
+            passage_ids = range(len(bounds) - 1)
+        return "\n".join(self.format_passage(bounds, p) for p in passage_ids)
+
+def bm25_scores(query_tokens, documents, k1=1.5, b=0.75):
+    """
+    Score tokenized documents against a query with Okapi BM25.
+
+    Args:
+        query_tokens (list): Tokens of the query
+        documents (list): A list of token lists
+        k1 (float): Term frequency saturation
+        b (float): Length normalisation
+
+    Returns:
+        list: One score per document
+    """
+    if not documents:
+        return []
+    counts = [Counter(document) for document in documents]
+    avg_length = sum(len(document) for document in documents) / len(documents) or 1.0
+    document_frequency = Counter()
+    for count in counts:
+        document_frequency.update(count.keys())
+
+    query_terms = set(query_tokens)
+    idf = {
+        term: math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in query_terms if document_frequency[term]
+    }
+    scores = []
+    for document, count in zip(documents, counts):
+        length_norm = k1 * (1 - b + b * len(document) / avg_length)
+        score = 0.0
+        for term, weight in idf.items():
+            frequency = count.get(term)
+            if frequency:
+                score += weight * frequency * (k1 + 1) / (frequency + length_norm)
+        scores.append(score)
+    return scores
+
+def select_relevant_passages(index, query, budget_chars, passage_chars=600):
+    """
+    Pick the transcript passages most relevant to a query within a character budget.
+
+    The budget applies to the passages as format_passages renders them, timestamps
+    and line breaks included.
+
+    Args:
+        index (SegmentIndex): The transcript
+        query (str): Learning objectives and question focus
+        budget_chars (int): Maximum characters of transcript to keep (about 4 characters per token)
+        passage_chars (int): Target passage size in characters
+
+    Returns:
+        tuple: (bounds, passage_ids) with the selected passages in video order; passage_ids
+        is empty if no passage matches the query
+    """
+    bounds = index.passages(passage_chars)
+    passage_count = len(bounds) - 1
+    # Each rendered line, plus the line break that joins it to the previous one
+    sizes = [len(index.format_passage(bounds, p)) + 1 for p in range(passage_count)]
+    if sum(sizes) - 1 <= budget_chars:
+        return bounds, list(range(passage_count))
+
+    scores = bm25_scores(tokenize(query), [tokenize(index.span_text(bounds[p], bounds[p + 1]))
+                                           for p in range(passage_count)])
+    # Only passages that match the query are kept; ties go to the earlier passage
+    ranked = sorted((p for p in range(passage_count) if scores[p] > 0), key=lambda p: (-scores[p], p))
+    selected = []
+    used = -1  # The first line has no line break before it
+    for p in ranked:
+        if used + sizes[p] > budget_chars:
+            continue
+        selected.append(p)
+        used += sizes[p]
+    return bounds, sorted(selected)
@@ -0,0 +1,61 @@
+# utils/unit_plan.py
+import re
+
+# The compact outline format asked for by the Unit Plan Generator's first stage
+# (markdown bold and list markers around the labels are tolerated)
+OUTLINE_WEEK_PATTERN = re.compile(r"^\W*(?:week|minggu)\s*(\d+)\s*\**\s*[:：\-–]\s*\**\s*(.*)$", re.IGNORECASE)
+OUTLINE_FIELD_PATTERN = re.compile(r"^\W*(overview|essential questions|summative assessment|focus)\s*\**\s*[:：]\s*\**\s*(.*)$", re.IGNORECASE)
+OUTLINE_LESSON_PATTERN = re.compile(r"^\W*lesson\s*(\d+)\s*\**\s*[:：\-–]\s*\**\s*(.*)$", re.IGNORECASE)
+LESSON_PART_PATTERN = re.compile(r"\|\s*\**\s*(objective|student action)\s*\**\s*[:：]\s*", re.IGNORECASE)
+
+def parse_lesson_line(text):
+    """
+    Split an outline lesson line into its parts.
+
+    Args:
+        text (str): e.g. "Food chains | Objective: ... | Student Action: ..."
+
+    Returns:
+        dict: "title", "objective" and "student_action" ("" when missing)
+    """
+    parts = LESSON_PART_PATTERN.split(text)
+    lesson = {"title": parts[0].strip().strip("*").strip(), "objective": "", "student_action": ""}
+    for label, value in zip(parts[1::2], parts[2::2]):
+        lesson[label.lower().replace(" ", "_")] = value.strip().strip("*").strip()
+    return lesson
+
+def parse_unit_outline(text):
+    """
+    Parse a unit outline in the OVERVIEW:/ESSENTIAL QUESTIONS:/SUMMATIVE ASSESSMENT:/
+    WEEK n:/FOCUS:/LESSON n: format.
+
+    Args:
+        text (str): Model output
+
+    Returns:
+        dict: "overview", "essential_questions", "summative_assessment" and "weeks",
+        a dict of week number to {"title", "focus", "lessons"} where lessons is a
+        dict of lesson number to a parse_lesson_line result
+    """
+    outline = {"overview": "", "essential_questions": "", "summative_assessment": "", "weeks": {}}
+    week = None
+    for line in (text or "").splitlines():
+        match = OUTLINE_WEEK_PATTERN.match(line)
+        if match:
+            week = {"title": match.group(2).strip().strip("*").strip(), "focus": "", "lessons": {}}
+            outline["weeks"][int(match.group(1))] = week
+            continue
+        match = OUTLINE_LESSON_PATTERN.match(line)
+        if match and week is not None:
+            week["lessons"][int(match.group(1))] = parse_lesson_line(match.group(2))
+            continue
+        match = OUTLINE_FIELD_PATTERN.match(line)
+        if match:
+            field = match.group(1).lower().replace(" ", "_")
+            value = match.group(2).strip()
+            if field == "focus":
+                if week is not None:
+                    week["focus"] = value
+            else:
+                outline[field] = value
+    return outline
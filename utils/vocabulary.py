@@ -0,0 +1,58 @@
+# utils/vocabulary.py
+import re
+
+# Header line that starts each word's section in batched vocabulary output
+WORD_HEADER_PATTERN = re.compile(r"^\W*===\s*(?:word|perkataan)\s*[:：]\s*(.*?)\s*===\W*$", re.IGNORECASE | re.MULTILINE)
+
+def normalise_word(word):
+    """Lowercase a vocabulary word and collapse its whitespace, for matching and cache keys."""
+    return " ".join(word.lower().split())
+
+def parse_word_list(text):
+    """
+    Split a comma-separated word list, dropping blanks and repeats.
+
+    Args:
+        text (str): e.g. "photosynthesis, ecosystem, Habitat, habitat"
+
+    Returns:
+        list: Words in the order given, as typed (first occurrence wins)
+    """
+    words = {}
+    for word in (text or "").split(","):
+        word = " ".join(word.split())
+        if word and normalise_word(word) not in words:
+            words[normalise_word(word)] = word
+    return list(words.values())
+
+def batch_words(words, batch_size):
+    """Split words into consecutive batches of at most batch_size."""
+    return [words[i:i + batch_size] for i in range(0, len(words), batch_size)]
+
+def split_word_sections(text, words):
+    """
+    Split batched vocabulary output into one section per requested word.
+
+    Sections start with a "=== WORD: <word> ===" header. Headers are matched to the
+    requested words by name; if the model renamed words (e.g. translated them) but
+    returned one section per word, sections are matched by position instead.
+
+    Args:
+        text (str): Model output
+        words (list): The words requested, in order
+
+    Returns:
+        dict: Section text (without its header) by requested word; words without
+        a section are missing
+    """
+    headers = list(WORD_HEADER_PATTERN.finditer(text or ""))
+    sections = []
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        sections.append((normalise_word(header.group(1)), text[header.end():end].strip()))
+
+    by_name = {normalise_word(word): word for word in words}
+    found = {by_name[name]: section for name, section in sections if name in by_name and section}
+    if len(found) < len(words) and len(sections) == len(words):
+        found = {word: section for word, (_, section) in zip(words, sections) if section}
+    return found